@@ -0,0 +1,536 @@
+"""
+Approximate nearest-neighbour retrieval for complementary matching.
+
+Brute-force scoring is O(N * dim) per request. For large rosters the
+``ComplementaryANN`` matcher instead retrieves candidates for each direction
+of the complementary score from an ANN index:
+
+- profiles whose *weaknesses* are closest to the target's strengths
+- profiles whose *strengths* are closest to the target's weaknesses
+
+then unions both candidate sets and re-ranks them exactly with the
+complementary score. The candidate count grows with the store
+(``candidate_fraction``): clustered rosters need roughly a fixed share of the
+profiles per direction to keep recall@10 at 0.95 or above.
+
+Indexes are built in a worker thread and swapped in when ready; until then
+(and for stores below ``min_profiles``) requests are scored exactly. Changes
+made while a build runs are replayed onto the new indexes.
+
+Two index backends are available:
+
+- ``ivf``: IVF-flat (k-means coarse quantizer + exact scan of the probed
+  lists), implemented in NumPy and always available
+- ``hnsw``: HNSW graph via the optional ``hnswlib`` package
+
+Run this module directly for a recall@k vs. brute-force report::
+
+    python ann_index.py --profiles 100000 --k 10 --nprobe 4 8 16 32
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from embedding_store import EmbeddingStore, normalize_rows
+from matcher import complementary_scores, find_best_matches_vectorized, top_k_rows
+
+# hnswlib is optional; the IVF backend works without it
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+
+class IVFFlatIndex:
+    """
+    Inverted-file index with exact (flat) scoring inside each probed list.
+
+    Vectors must be L2-normalized; similarity is the inner product. Each list
+    keeps its own contiguous vector block, so the index is independent of the
+    row layout of the ``EmbeddingStore``. Blocks have spare capacity that
+    doubles when full, so adds are amortized O(dim); removals move the list's
+    last vector into the freed slot.
+    """
+
+    def __init__(self, dim: int, nlist: Optional[int] = None, nprobe: int = 8,
+                 train_iterations: int = 10, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self._rng = np.random.default_rng(seed)
+        self._centroids = np.zeros((0, dim), dtype=np.float32)
+        # Per list: vector block (rows beyond len(ids) are spare) and ids
+        self._list_vectors: List[np.ndarray] = []
+        self._list_ids: List[List[str]] = []
+        # id -> (list number, position in the list)
+        self._where: Dict[str, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def _train(self, vectors: np.ndarray):
+        """Spherical k-means on (a sample of) the vectors"""
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        sample_size = min(len(vectors), nlist * 64)
+        sample = vectors[self._rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~np.bincount(assignment, minlength=nlist).astype(bool)
+            # Re-seed empty clusters with random sample points
+            sums[empty] = sample[self._rng.choice(sample_size, int(empty.sum()))]
+            centroids = normalize_rows(sums)
+        self._centroids = centroids
+
+    def build(self, ids: List[str], vectors: np.ndarray):
+        """Train the coarse quantizer and bulk-assign all vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._where = {}
+        if len(ids) == 0:
+            self._centroids = np.zeros((0, self.dim), dtype=np.float32)
+            self._list_vectors, self._list_ids = [], []
+            return
+
+        self._train(vectors)
+        assignment = np.argmax(vectors @ self._centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(len(self._centroids) + 1))
+
+        self._list_vectors, self._list_ids = [], []
+        for list_no in range(len(self._centroids)):
+            rows = order[bounds[list_no]:bounds[list_no + 1]]
+            self._list_vectors.append(vectors[rows])
+            self._list_ids.append([ids[row] for row in rows])
+            for position, row in enumerate(rows):
+                self._where[ids[row]] = (list_no, position)
+
+    def add(self, item_id: str, vector: np.ndarray):
+        """Add or replace a single vector (assigned to its nearest centroid)"""
+        if item_id in self._where:
+            self.remove(item_id)
+        if len(self._centroids) == 0:
+            self.build([item_id], vector.reshape(1, -1))
+            return
+        list_no = int(np.argmax(self._centroids @ vector))
+        block, list_ids = self._list_vectors[list_no], self._list_ids[list_no]
+        position = len(list_ids)
+        if position == len(block):
+            grown = np.empty((max(2 * len(block), 16), self.dim), dtype=np.float32)
+            grown[:position] = block
+            block = self._list_vectors[list_no] = grown
+        block[position] = vector
+        list_ids.append(item_id)
+        self._where[item_id] = (list_no, position)
+
+    def remove(self, item_id: str):
+        where = self._where.pop(item_id, None)
+        if where is None:
+            return
+        list_no, position = where
+        block, list_ids = self._list_vectors[list_no], self._list_ids[list_no]
+        last = len(list_ids) - 1
+        if position != last:
+            block[position] = block[last]
+            list_ids[position] = list_ids[last]
+            self._where[list_ids[position]] = (list_no, position)
+        list_ids.pop()
+
+    def search(self, query: np.ndarray, k: int) -> List[str]:
+        """Return up to k ids with the highest inner product to the query"""
+        if len(self._centroids) == 0 or k <= 0:
+            return []
+        nprobe = min(self.nprobe, len(self._centroids))
+        probed = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+
+        scores, ids = [], []
+        for list_no in probed:
+            list_ids = self._list_ids[list_no]
+            if list_ids:
+                scores.append(self._list_vectors[list_no][:len(list_ids)] @ query)
+                ids.extend(list_ids)
+        if not ids:
+            return []
+        scores = np.concatenate(scores)
+        k = min(k, len(ids))
+        best = np.argpartition(-scores, k - 1)[:k]
+        return [ids[i] for i in best]
+
+
+class HNSWIndex:
+    """HNSW graph index backed by the optional ``hnswlib`` package."""
+
+    def __init__(self, dim: int, ef_search: int = 64, m: int = 16,
+                 ef_construction: int = 200):
+        if hnswlib is None:
+            raise RuntimeError("ANN backend 'hnsw' requires the hnswlib package (pip install hnswlib)")
+        self.dim = dim
+        self.ef_search = ef_search
+        self.m = m
+        self.ef_construction = ef_construction
+        self._labels: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._next_label = 0
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def _new_index(self, capacity: int):
+        self._index = hnswlib.Index(space="ip", dim=self.dim)
+        self._index.init_index(max_elements=max(capacity, 16), M=self.m,
+                               ef_construction=self.ef_construction,
+                               allow_replace_deleted=True)
+        self._index.set_ef(self.ef_search)
+
+    def build(self, ids: List[str], vectors: np.ndarray):
+        self._new_index(2 * len(ids))
+        self._labels = {item_id: label for label, item_id in enumerate(ids)}
+        self._ids = dict(enumerate(ids))
+        self._next_label = len(ids)
+        if ids:
+            self._index.add_items(np.asarray(vectors, dtype=np.float32), np.arange(len(ids)))
+
+    def add(self, item_id: str, vector: np.ndarray):
+        if self._index is None:
+            self._new_index(16)
+        if item_id in self._labels:
+            self.remove(item_id)
+        if self._index.get_current_count() >= self._index.get_max_elements():
+            self._index.resize_index(2 * self._index.get_max_elements())
+        label = self._next_label
+        self._next_label += 1
+        self._index.add_items(vector.reshape(1, -1), np.array([label]), replace_deleted=True)
+        self._labels[item_id] = label
+        self._ids[label] = item_id
+
+    def remove(self, item_id: str):
+        label = self._labels.pop(item_id, None)
+        if label is not None:
+            self._index.mark_deleted(label)
+            del self._ids[label]
+
+    def search(self, query: np.ndarray, k: int) -> List[str]:
+        k = min(k, len(self._labels))
+        if k <= 0:
+            return []
+        self._index.set_ef(max(self.ef_search, k))
+        labels, _ = self._index.knn_query(query.reshape(1, -1), k=k)
+        return [self._ids[label] for label in labels[0]]
+
+
+def make_index(backend: str, dim: int, **options):
+    """Create an empty ANN index for the given backend name"""
+    if backend == "ivf":
+        return IVFFlatIndex(dim, nlist=options.get("nlist"), nprobe=options.get("nprobe", 8))
+    if backend == "hnsw":
+        return HNSWIndex(dim, ef_search=options.get("ef_search", 64))
+    raise ValueError(f"Unknown ANN backend: {backend}")
+
+
+class ComplementaryANN:
+    """
+    Complementary matcher over an ``EmbeddingStore`` using two ANN indexes.
+
+    The indexes follow the store through its change listener. Stores smaller
+    than ``min_profiles`` are scored exactly, since brute force is faster
+    there than any index (the IVF defaults break even around 7500 profiles
+    on ``python ann_index.py``).
+
+    Args:
+        store: EmbeddingStore to index
+        backend: "ivf" or "hnsw"
+        candidates: Minimum candidates retrieved per direction
+        candidate_fraction: Candidates per direction as a share of the store,
+            when that is more than ``candidates``
+        min_profiles: Smallest store that gets indexes
+        rebuild_growth: Retrain once the store grew by this factor since the last build
+        index_options: Backend options (``nprobe``, ``nlist``, ``ef_search``)
+    """
+
+    def __init__(self, store: EmbeddingStore, backend: str = "ivf",
+                 candidates: int = 300, candidate_fraction: float = 0.015,
+                 min_profiles: int = 10000, rebuild_growth: float = 2.0, **index_options):
+        self.store = store
+        self.backend = backend
+        self.candidates = candidates
+        self.candidate_fraction = candidate_fraction
+        self.min_profiles = min_profiles
+        self.rebuild_growth = rebuild_growth
+        self.index_options = index_options
+        self._strengths_index = None
+        self._weaknesses_index = None
+        self._built_size = 0
+        self._build_task: Optional[asyncio.Task] = None
+        # Changes made while a background build runs, replayed onto its result
+        self._pending: Optional[List[Tuple[str, str]]] = None
+        store.add_listener(self._on_store_change)
+
+    @property
+    def built(self) -> bool:
+        return self._strengths_index is not None
+
+    @property
+    def building(self) -> bool:
+        return self._build_task is not None and not self._build_task.done()
+
+    def _build_indexes(self, ids: List[str], strengths: np.ndarray, weaknesses: np.ndarray):
+        start = time.perf_counter()
+        strengths_index = make_index(self.backend, self.store.dim, **self.index_options)
+        weaknesses_index = make_index(self.backend, self.store.dim, **self.index_options)
+        strengths_index.build(ids, strengths)
+        weaknesses_index.build(ids, weaknesses)
+        logger.info(f"Built {self.backend} ANN indexes over {len(ids)} profiles "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return strengths_index, weaknesses_index
+
+    def build(self):
+        """(Re)build both indexes from the current store contents, in place"""
+        ids = list(self.store.ids)
+        self._strengths_index, self._weaknesses_index = self._build_indexes(
+            ids, self.store.strengths, self.store.weaknesses)
+        self._built_size = len(ids)
+
+    async def build_async(self):
+        """
+        Build both indexes in a worker thread, then swap them in
+
+        The thread works on a copy of the store; store changes made meanwhile
+        are recorded and replayed onto the new indexes. A reload during the
+        build starts it over.
+        """
+        while True:
+            ids = list(self.store.ids)
+            strengths, weaknesses = self.store.strengths.copy(), self.store.weaknesses.copy()
+            self._pending = []
+            try:
+                indexes = await asyncio.to_thread(self._build_indexes, ids, strengths, weaknesses)
+            finally:
+                pending, self._pending = self._pending, None
+            if ("reload", "") not in pending:
+                break
+        self._strengths_index, self._weaknesses_index = indexes
+        self._built_size = len(ids)
+        for event, student_id in pending:
+            self._apply(event, student_id)
+
+    def schedule_build(self) -> bool:
+        """
+        Start a background build unless one is running or the store is small
+
+        Returns:
+            False if there is no running event loop to build on
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        if len(self.store) >= self.min_profiles and not self.building:
+            self._build_task = loop.create_task(self.build_async())
+            self._build_task.add_done_callback(self._on_build_done)
+        return True
+
+    @staticmethod
+    def _on_build_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Building the ANN indexes failed: {task.exception()!r}")
+
+    def _apply(self, event: str, student_id: str):
+        if event == "remove":
+            self._strengths_index.remove(student_id)
+            self._weaknesses_index.remove(student_id)
+        elif event == "upsert":
+            row = self.store.row_of(student_id)
+            if row is None:
+                # Removed again since (replay of a change made during a build)
+                return
+            self._strengths_index.add(student_id, self.store.strengths[row])
+            self._weaknesses_index.add(student_id, self.store.weaknesses[row])
+
+    def _on_store_change(self, event: str, student_id: str):
+        if event == "attach":
+            # Indexes are keyed by id, so only the differences need applying
+            changes = self.store.attach_changes
+            events = [("remove", i) for i in changes.removed] + [("upsert", i) for i in changes.upserted]
+        else:
+            events = [(event, student_id)]
+        if self._pending is not None:
+            self._pending.extend(events)
+        if event == "reload":
+            self._strengths_index = self._weaknesses_index = None
+            self.schedule_build()
+        elif self.built:
+            for change in events:
+                self._apply(*change)
+        elif event == "attach":
+            self.schedule_build()
+
+    def _ensure_index(self) -> bool:
+        """
+        True if the indexes can answer this request
+
+        Missing or outgrown indexes are (re)built in the background; requests
+        are scored exactly until a first build is ready. Without a running
+        event loop (scripts) the build happens in place.
+        """
+        if len(self.store) < self.min_profiles:
+            return False
+        if not self.built or len(self.store) > self.rebuild_growth * self._built_size:
+            if not self.schedule_build():
+                self.build()
+        return self.built
+
+    def candidate_rows(self, student_id: str, top_k: int) -> np.ndarray:
+        """Union of the ANN candidates for both directions, as store rows"""
+        row = self.store.row_of(student_id)
+        k = max(self.candidates, int(self.candidate_fraction * len(self.store)), top_k + 1)
+        # Direction 1: others whose weaknesses match my strengths
+        ids = set(self._weaknesses_index.search(self.store.strengths[row], k))
+        # Direction 2: others whose strengths match my weaknesses
+        ids.update(self._strengths_index.search(self.store.weaknesses[row], k))
+        ids.discard(student_id)
+        rows = [self.store.row_of(i) for i in ids]
+        return np.array(sorted(r for r in rows if r is not None), dtype=np.intp)
+
+    def find_best_matches(self, student_id: str,
+                          top_k: int = 3) -> List[Tuple[str, str, float, str, str]]:
+        """
+        ANN equivalent of ``find_best_matches``
+
+        Args:
+            student_id: ID of the target student
+            top_k: Number of top matches to return
+
+        Returns:
+            List of tuples: (student_id, name, score, strengths, weaknesses)
+        """
+        if student_id not in self.store:
+            return []
+        if not self._ensure_index():
+            return find_best_matches_vectorized(student_id, self.store, top_k)
+
+        row = self.store.row_of(student_id)
+        rows = self.candidate_rows(student_id, top_k)
+        strengths, weaknesses = self.store.strengths, self.store.weaknesses
+        # Exact re-rank of the candidate union
+        scores = complementary_scores(strengths[row], weaknesses[row],
+                                      strengths[rows], weaknesses[rows])
+
+        matches = []
+        for i in top_k_rows(scores, top_k):
+            profile = self.store.profile_at(rows[i])
+            matches.append((profile['id'], profile['name'], float(scores[i]),
+                            profile['strengths'], profile['weaknesses']))
+        return matches
+
+
+def recall_at_k(ann: ComplementaryANN, k: int,
+                queries: Iterable[str]) -> Tuple[float, float, float]:
+    """
+    Measure ANN recall@k against exact brute-force matching
+
+    Args:
+        ann: Matcher with built indexes
+        k: Number of matches compared per query
+        queries: Student IDs to query
+
+    Returns:
+        (mean recall@k, mean ANN latency in ms, mean brute-force latency in ms)
+    """
+    recalls, ann_ms, exact_ms = [], [], []
+    for student_id in queries:
+        start = time.perf_counter()
+        exact = find_best_matches_vectorized(student_id, ann.store, k)
+        exact_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        approx = ann.find_best_matches(student_id, k)
+        ann_ms.append((time.perf_counter() - start) * 1000)
+
+        expected = {m[0] for m in exact}
+        if expected:
+            recalls.append(len(expected & {m[0] for m in approx}) / len(expected))
+    return float(np.mean(recalls)), float(np.mean(ann_ms)), float(np.mean(exact_ms))
+
+
+def synthetic_store(n: int, dim: int = 384, topics: int = 64, seed: int = 0) -> EmbeddingStore:
+    """
+    Build a store of clustered random embeddings
+
+    Real skill embeddings cluster by subject, so the vectors are drawn around
+    ``topics`` random centres rather than uniformly (which no ANN index can
+    search well).
+    """
+    rng = np.random.default_rng(seed)
+    centres = normalize_rows(rng.standard_normal((topics, dim)))
+    store = EmbeddingStore(dim=dim, initial_capacity=max(n, 1))
+    for i in range(n):
+        strengths = centres[rng.integers(topics)] + 0.6 * rng.standard_normal(dim) / np.sqrt(dim)
+        weaknesses = centres[rng.integers(topics)] + 0.6 * rng.standard_normal(dim) / np.sqrt(dim)
+        store.upsert({"id": f"syn{i:06d}", "name": f"Student {i}", "strengths": "",
+                      "weaknesses": "", "strengths_emb": strengths, "weaknesses_emb": weaknesses})
+    return store
+
+
+async def _mongo_store() -> EmbeddingStore:
+    from database import get_db
+    store = EmbeddingStore()
+    await store.load(get_db()["profiles"])
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN recall@k vs. brute-force report")
+    parser.add_argument("--source", choices=["synthetic", "mongo"], default="synthetic",
+                        help="Profiles to index: clustered synthetic vectors or the MongoDB collection")
+    parser.add_argument("--profiles", type=int, default=20000, help="Synthetic profile count")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled query students")
+    parser.add_argument("--k", type=int, default=10, help="Matches compared per query")
+    parser.add_argument("--backend", choices=["ivf", "hnsw"], default="ivf")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[100, 300],
+                        help="Minimum ANN candidates retrieved per direction (one report row per value)")
+    parser.add_argument("--candidate-fraction", type=float, default=0.015,
+                        help="Candidates per direction as a share of the profiles")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32],
+                        help="IVF lists probed (one report row per value)")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 64, 128],
+                        help="HNSW search breadth (one report row per value)")
+    args = parser.parse_args()
+
+    if args.source == "mongo":
+        store = asyncio.run(_mongo_store())
+    else:
+        store = synthetic_store(args.profiles)
+
+    rng = np.random.default_rng(1)
+    queries = [store.ids[i] for i in rng.choice(len(store), min(args.queries, len(store)), replace=False)]
+    settings = args.nprobe if args.backend == "ivf" else args.ef_search
+    option = "nprobe" if args.backend == "ivf" else "ef_search"
+
+    print(f"{len(store)} profiles, {len(queries)} queries, k={args.k}, backend={args.backend}")
+    print(f"{option:>10} {'candidates':>10} {'recall@k':>10} {'ann ms':>10} {'exact ms':>10} {'speedup':>8}")
+    for value in settings:
+        ann = ComplementaryANN(store, backend=args.backend, min_profiles=0,
+                               candidate_fraction=args.candidate_fraction, **{option: value})
+        ann.build()
+        for candidates in args.candidates:
+            ann.candidates = candidates
+            recall, ann_ms, exact_ms = recall_at_k(ann, args.k, queries)
+            print(f"{value:>10} {candidates:>10} {recall:>10.3f} {ann_ms:>10.2f} "
+                  f"{exact_ms:>10.2f} {exact_ms / ann_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+    main()
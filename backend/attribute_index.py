@@ -0,0 +1,157 @@
+"""
+Precomputed attribute masks for filtered matching.
+
+Advisors filter matches by study preferences ("Evenings", "small groups",
+"online", ...). Rather than scoring everyone and discarding afterwards, the
+``AttributeIndex`` keeps a boolean matrix with one row per store row and one
+column per preference term, updated from the store's change events. A filter
+is then a couple of column reductions, and only the surviving rows are scored,
+so filtered queries are cheaper than unfiltered ones.
+
+Preferences are split on commas into phrases; both the phrase and its single
+words are indexed, lowercased and with a plural "s" dropped, so "Flexible
+schedule" is found by "flexible" and "Small Groups" by "small group".
+"""
+
+from typing import Dict, Iterable, List, Set
+import re
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+PHRASE_DELIMITERS = re.compile(r"[,;/\n]+")
+
+
+def normalize_term(text: str) -> str:
+    """Lowercase, collapse whitespace and singularize each word"""
+    words = []
+    for word in text.lower().split():
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words)
+
+
+def preference_terms(preferences: str) -> Set[str]:
+    """Indexed terms of a preferences string: each phrase and each of its words"""
+    terms = set()
+    for phrase in PHRASE_DELIMITERS.split(preferences or ""):
+        phrase = normalize_term(phrase)
+        if phrase:
+            terms.add(phrase)
+            terms.update(phrase.split())
+    return terms
+
+
+class AttributeIndex:
+    """
+    Row-aligned boolean term matrix over an EmbeddingStore's profiles
+
+    Args:
+        store: EmbeddingStore to follow (through its change listener)
+        field: Profile field to index
+    """
+
+    def __init__(self, store: EmbeddingStore, field: str = "preferences"):
+        self.store = store
+        self.field = field
+        self._terms: Dict[str, int] = {}
+        self._bits = np.zeros((0, 0), dtype=bool)
+        # Our own id -> row view, to know which row a removed id occupied
+        self._rows: Dict[str, int] = {}
+        self.rebuild()
+        store.add_listener(self._on_store_change)
+
+    def _ensure_shape(self, rows: int, columns: int):
+        capacity, width = self._bits.shape
+        if rows <= capacity and columns <= width:
+            return
+        bits = np.zeros((max(rows, capacity * 2, 64), max(columns, width * 2, 16)), dtype=bool)
+        bits[:capacity, :width] = self._bits
+        self._bits = bits
+
+    def _set_row(self, row: int, profile: Dict):
+        terms = preference_terms(profile.get(self.field, ""))
+        for term in terms:
+            self._terms.setdefault(term, len(self._terms))
+        self._ensure_shape(row + 1, len(self._terms))
+        self._bits[row] = False
+        self._bits[row, [self._terms[term] for term in terms]] = True
+
+    def rebuild(self):
+        self._terms, self._rows = {}, {}
+        self._bits = np.zeros((0, 0), dtype=bool)
+        for row, student_id in enumerate(self.store.ids):
+            self._set_row(row, self.store.profile_at(row))
+            self._rows[student_id] = row
+
+    def _remap(self):
+        """Follow an attach: move unchanged rows to their new position, re-index the rest"""
+        upserted = set(self.store.attach_changes.upserted)
+        old_bits, old_rows = self._bits, self._rows
+        self._bits, self._rows = np.zeros((0, 0), dtype=bool), {}
+        self._ensure_shape(len(self.store), old_bits.shape[1])
+        new_rows, from_rows = [], []
+        for row, student_id in enumerate(self.store.ids):
+            self._rows[student_id] = row
+            old_row = old_rows.get(student_id)
+            if old_row is None or student_id in upserted:
+                self._set_row(row, self.store.profile_at(row))
+            else:
+                new_rows.append(row)
+                from_rows.append(old_row)
+        self._bits[new_rows, :old_bits.shape[1]] = old_bits[from_rows]
+
+    def _on_store_change(self, event: str, student_id: str):
+        if event == "reload":
+            self.rebuild()
+        elif event == "attach":
+            self._remap()
+        elif event == "upsert":
+            row = self.store.row_of(student_id)
+            self._set_row(row, self.store.profile_at(row))
+            self._rows[student_id] = row
+        elif event == "remove":
+            row = self._rows.pop(student_id, None)
+            if row is None:
+                return
+            # Mirror the store: its last row moved into the freed slot
+            last = len(self.store)
+            if row != last:
+                self._bits[row] = self._bits[last]
+                self._rows[self.store.ids[row]] = row
+            self._bits[last] = False
+
+    def terms(self) -> Dict[str, int]:
+        """Number of profiles per indexed term"""
+        counts = self._bits[:len(self.store)].sum(axis=0)
+        return {term: int(counts[column]) for term, column in self._terms.items()}
+
+    def candidate_mask(self, required: Iterable[str] = (), exclude: Iterable[str] = ()) -> np.ndarray:
+        """
+        Rows having every required term and not in the exclusion list
+
+        Args:
+            required: Preference terms a candidate must have (normalized here)
+            exclude: Student ids to leave out
+
+        Returns:
+            Boolean array of length len(store)
+        """
+        n = len(self.store)
+        columns: List[int] = []
+        for term in required:
+            term = normalize_term(term)
+            if term not in self._terms:
+                return np.zeros(n, dtype=bool)
+            columns.append(self._terms[term])
+        if columns:
+            mask = self._bits[:n, columns].all(axis=1)
+        else:
+            mask = np.ones(n, dtype=bool)
+        for student_id in exclude:
+            row = self.store.row_of(student_id)
+            if row is not None:
+                mask[row] = False
+        return mask
@@ -0,0 +1,117 @@
+"""
+Micro-batching scheduler for embedding requests.
+
+Concurrent ``POST /profiles`` calls each need two short texts embedded; on CPU
+the transformer is far more efficient per text when run on a batch. The
+``EmbeddingBatcher`` collects texts from concurrent callers for up to
+``max_wait_ms`` (or until ``max_batch_size`` texts are pending), runs one
+encode over the whole batch and hands every caller its own slice of the result.
+"""
+
+from typing import List, Optional, Set, Tuple
+import asyncio
+import logging
+import time
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic batcher in front of ``EmbeddingService.aembed_batch``
+
+    Args:
+        service: EmbeddingService used to encode the combined batches
+        max_wait_ms: How long the first pending text may wait for company;
+            0 disables batching (every call is encoded on its own)
+        max_batch_size: Flush as soon as this many texts are pending
+    """
+
+    def __init__(self, service, max_wait_ms: float = 5.0, max_batch_size: int = 64):
+        self.service = service
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[List[str], asyncio.Future, float]] = []
+        self._pending_texts = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks: hold running batches here
+        self._tasks: Set[asyncio.Task] = set()
+        self.batch_size_histogram = Histogram(
+            "embedding_batch_size", [1, 2, 4, 8, 16, 32, 64, 128, 256],
+            "Texts encoded per batched model call",
+        )
+        self.wait_ms_histogram = Histogram(
+            "embedding_batch_wait_ms", [0.5, 1, 2, 5, 10, 20, 50, 100],
+            "Time a request waited for its batch to be dispatched (ms)",
+        )
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts as part of the next batch
+
+        Raises:
+            EmbeddingBusyError: If the inference pool rejects the batch
+        """
+        # Fully cached requests never wait for a batch
+        cached = self.service.lookup_cached(texts)
+        if cached is not None:
+            return cached
+
+        if self.max_wait_ms <= 0:
+            self.batch_size_histogram.observe(len(texts))
+            self.wait_ms_histogram.observe(0.0)
+            return await self.service.aembed_batch(texts, batch_size=self.max_batch_size)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((texts, future, time.perf_counter()))
+        self._pending_texts += len(texts)
+
+        if self._pending_texts >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+        return await future
+
+    def _flush(self):
+        """Dispatch everything pending as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending, self._pending_texts = self._pending, [], 0
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[List[str], asyncio.Future, float]]):
+        dispatched = time.perf_counter()
+        texts = [text for item_texts, _, _ in batch for text in item_texts]
+        self.batch_size_histogram.observe(len(texts))
+        for _, _, enqueued in batch:
+            self.wait_ms_histogram.observe((dispatched - enqueued) * 1000)
+
+        try:
+            embeddings = await self.service.aembed_batch(texts, batch_size=self.max_batch_size)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, future, _ in batch:
+            if not future.done():
+                future.set_result(embeddings[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+    def stats(self) -> dict:
+        """Batch-size and wait-time histograms for tuning the window"""
+        return {
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "wait_ms": self.wait_ms_histogram.snapshot(),
+        }
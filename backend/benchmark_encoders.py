@@ -0,0 +1,107 @@
+"""
+Throughput and memory benchmark of the embedding backends.
+
+Each backend runs in a fresh subprocess so its peak RSS is measured in
+isolation (model weights + runtime + inference buffers)::
+
+    python benchmark_encoders.py --backends torch onnx onnx-int8 --texts 2000
+"""
+
+from typing import Dict, List
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+SUBJECTS = [
+    "Mathematics", "Calculus", "Algebra", "Physics", "Chemistry", "Biology",
+    "Computer Science", "Programming", "Statistics", "Engineering",
+    "English Literature", "Creative Writing", "History", "Philosophy",
+    "Psychology", "Art", "Music", "Foreign Languages", "Sociology",
+    "Business", "Marketing", "Finance", "Accounting", "Economics", "Management",
+]
+
+
+def synthetic_texts(n: int, seed: int = 0) -> List[str]:
+    """Skill-list texts shaped like real strengths/weaknesses fields"""
+    rng = random.Random(seed)
+    return [", ".join(rng.sample(SUBJECTS, rng.randint(1, 4))) for _ in range(n)]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_backend(backend: str, n_texts: int, batch_size: int) -> Dict:
+    """Benchmark one backend inside the current process"""
+    from matcher import EmbeddingService
+
+    service = EmbeddingService(backend=backend)
+    start = time.perf_counter()
+    service.warm_up()
+    load_seconds = time.perf_counter() - start
+
+    texts = synthetic_texts(n_texts)
+    start = time.perf_counter()
+    service._encode(texts, batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    single = texts[:min(200, n_texts)]
+    start = time.perf_counter()
+    for text in single:
+        service._encode([text], 1)
+    single_seconds = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "batched_texts_per_sec": round(n_texts / batch_seconds, 1),
+        "single_texts_per_sec": round(len(single) / single_seconds, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--texts", type=int, default=2000, help="Texts encoded per backend")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.texts, args.batch_size)))
+        return
+
+    results = []
+    print(f"{'backend':>10} {'load s':>8} {'batched/s':>10} {'single/s':>9} {'peak RSS MB':>12}")
+    for backend in args.backends:
+        completed = subprocess.run(
+            [sys.executable, __file__, "--worker", backend,
+             "--texts", str(args.texts), "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if completed.returncode != 0:
+            stderr = completed.stderr.strip().splitlines()
+            reason = stderr[-1] if stderr else "no error output"
+            print(f"{backend:>10} failed (exit code {completed.returncode}): {reason}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{backend:>10} {result['load_seconds']:>8} {result['batched_texts_per_sec']:>10} "
+              f"{result['single_texts_per_sec']:>9} {result['peak_rss_mb']:>12}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
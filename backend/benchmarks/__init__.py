@@ -0,0 +1,22 @@
+"""
+Reproducible benchmarks of the matcher's hot paths.
+
+Three suites, each optional:
+
+- ``embedding``: ``EmbeddingService`` throughput for single texts, batches
+  and cache hits
+- ``scoring``: latency of ``find_best_matches`` (per-pair loop),
+  ``find_best_matches_vectorized`` and ``find_best_matches_batch`` against
+  N synthetic profiles (100 -> 100k)
+- ``api``: end-to-end ``GET /match`` and ``POST /profiles`` p50/p95/p99
+  through the ASGI app, with MongoDB replaced by ``mongomock-motor``
+  (``pip install mongomock-motor``)
+
+Synthetic profiles use the vocabularies of ``demo/generate_demo_data.py``.
+Results are written as JSON so two commits can be compared (from the backend
+directory)::
+
+    python -m benchmarks run --json base.json
+    python -m benchmarks run --suites scoring --sizes 1000 10000 --json new.json
+    python -m benchmarks compare base.json new.json
+"""
@@ -0,0 +1,145 @@
+"""
+Command line entry point: ``python -m benchmarks {run,compare}`` (from the backend directory).
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Tuple
+import argparse
+import json
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+SUITES = ("embedding", "scoring", "api")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> Dict:
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+    }
+    log = lambda message: print(message, file=sys.stderr)
+
+    if "embedding" in args.suites:
+        from benchmarks import embedding
+        results["embedding"] = embedding.run(args.texts, backend=args.backend, mode=args.embed_mode,
+                                             seed=args.seed)
+        log(f"embedding: {results['embedding']}")
+    if "scoring" in args.suites:
+        from benchmarks import scoring
+        results["scoring"] = scoring.run(args.sizes, args.queries, args.top_k, args.vectors,
+                                         args.loop_max, seed=args.seed, log=log)
+    # Last: importing the app configures and warms the whole backend
+    if "api" in args.suites:
+        from benchmarks import api
+        results["api"] = api.run(args.api_profiles, args.requests, args.top_k, args.vectors,
+                                 args.response_cache, seed=args.seed, log=log)
+    return results
+
+
+def _flatten(results: Dict, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, path + ".")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, float(value)
+
+
+def _lower_is_better(metric: str):
+    """True/False for latency/throughput metrics, None for the rest (counts, sizes)"""
+    if metric.endswith("_ms") or metric.endswith("_seconds"):
+        return True
+    if metric.endswith("_per_sec"):
+        return False
+    return None
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """Print the relative change of every shared metric; returns the number of regressions"""
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = dict(_flatten(json.load(f)))
+
+    print(f"{'metric':<45} {'base':>12} {'new':>12} {'change':>9}")
+    regressions = 0
+    for metric, old_value in _flatten(base):
+        lower_is_better = _lower_is_better(metric)
+        if lower_is_better is None or metric not in new or old_value == 0:
+            continue
+        change = new[metric] / old_value - 1
+        worse = change > threshold if lower_is_better else change < -threshold
+        regressions += worse
+        print(f"{metric:<45} {old_value:>12.4f} {new[metric]:>12.4f} {change:>+8.1%}{'  ❌' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Embedding, scoring and API benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run benchmark suites")
+    run_parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    run_parser.add_argument("--json", help="Write the results to this JSON file")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--top-k", type=int, default=3)
+    run_parser.add_argument("--vectors", choices=("model", "random"), default="model",
+                            help="Profile embeddings: pooled model subject vectors or random (no model)")
+    run_parser.add_argument("--texts", type=int, default=1000, help="embedding: texts to encode")
+    run_parser.add_argument("--backend", default="torch", help="embedding: torch, onnx or onnx-int8")
+    run_parser.add_argument("--embed-mode", default="sentence", help="embedding: sentence or skills")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000],
+                            help="scoring: numbers of stored profiles")
+    run_parser.add_argument("--queries", type=int, default=100, help="scoring: timed queries per size")
+    run_parser.add_argument("--loop-max", type=int, default=1000,
+                            help="scoring: largest size for the per-pair loop scorer")
+    run_parser.add_argument("--api-profiles", type=int, default=10000, help="api: seeded profiles")
+    run_parser.add_argument("--requests", type=int, default=200, help="api: timed requests per endpoint")
+    run_parser.add_argument("--response-cache", action="store_true", help="api: keep the /match cache on")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Relative slowdown reported as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        regressions = compare(args.base, args.new, args.threshold)
+        if regressions:
+            print(f"{regressions} metrics regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        return
+
+    results = run(args)
+    output = json.dumps(results, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Wrote {args.json}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
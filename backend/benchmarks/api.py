@@ -0,0 +1,111 @@
+"""
+End-to-end API latency through the ASGI app.
+
+MongoDB is replaced by an in-process ``mongomock-motor`` database seeded with
+synthetic profiles, so the numbers cover routing, validation, embedding,
+scoring and serialization without network or server noise. Requests go
+through Starlette's ``TestClient``, which runs the app's lifespan (store load,
+model warm-up) like a real server start.
+"""
+
+from typing import Dict
+import asyncio
+import os
+import random
+import time
+
+from benchmarks.data import synthetic_embeddings, synthetic_profiles
+from benchmarks.timing import summarize
+
+# Settings of the app under test: no shared matrix, snapshots or cache
+# persistence, and no query-plan check (mongomock has no explain())
+BENCHMARK_ENV = {
+    "MONGODB_URL": os.getenv("MONGODB_URL") or "mongodb://localhost:27017",
+    "MONGO_INDEX_CHECK": "0",
+    "PROFILE_SYNC": "off",
+    "SHARED_MATRIX_DIR": "",
+    "SNAPSHOT_PATH": "",
+    "EMBED_CACHE_PATH": "",
+}
+
+
+def _import_app(response_cache: bool):
+    """Import ``main`` against a fresh mongomock database"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise RuntimeError("The api suite needs mongomock-motor: pip install mongomock-motor")
+
+    os.environ.update(BENCHMARK_ENV)
+    if not response_cache:
+        os.environ["MATCH_CACHE_ENTRIES"] = "0"
+    import database
+
+    database._db = AsyncMongoMockClient()["peer_matcher"]
+    import main
+    return main, database._db["profiles"]
+
+
+async def _seed(collection, profiles, strengths, weaknesses, stored_embedding, now):
+    docs = []
+    for profile, s, w in zip(profiles, strengths, weaknesses):
+        docs.append(dict(profile, strengths_emb=stored_embedding(s), weaknesses_emb=stored_embedding(w),
+                         updated_at=now))
+    await collection.insert_many(docs)
+
+
+def run(n_profiles: int = 10000, requests: int = 200, top_k: int = 3, vectors: str = "model",
+        response_cache: bool = False, seed: int = 0, log=print) -> Dict:
+    """
+    Measure ``GET /match/{id}`` and ``POST /profiles`` latency
+
+    Args:
+        n_profiles: Profiles in the database when the app starts
+        requests: Timed requests per endpoint
+        top_k: ``top_k`` of the match requests
+        vectors: Embedding source of the seeded profiles, see ``synthetic_embeddings``
+        response_cache: Keep the /match response cache on (repeated targets
+            then mostly measure cache hits)
+        seed: Seed of profiles and targets
+        log: Progress output
+
+    Returns:
+        Latency summary per endpoint, plus startup time
+    """
+    from fastapi.testclient import TestClient
+
+    main, collection = _import_app(response_cache)
+    profiles = synthetic_profiles(n_profiles, seed=seed)
+    strengths, weaknesses = synthetic_embeddings(profiles, vectors, seed=seed,
+                                                 backend=main.embedding_service.backend)
+    asyncio.run(_seed(collection, profiles, strengths, weaknesses, main.stored_embedding, main.utc_now()))
+
+    rng = random.Random(seed)
+    targets = [rng.choice(profiles)["id"] for _ in range(requests)]
+    new_profiles = synthetic_profiles(requests, seed=seed + 1, prefix="BENCHNEW")
+
+    start = time.perf_counter()
+    with TestClient(main.app) as client:
+        startup_seconds = time.perf_counter() - start
+        results = {"profiles": n_profiles, "startup_seconds": round(startup_seconds, 3)}
+
+        seconds = []
+        for target in targets:
+            begin = time.perf_counter()
+            response = client.get(f"/match/{target}", params={"top_k": top_k})
+            seconds.append(time.perf_counter() - begin)
+            response.raise_for_status()
+        results["match"] = summarize(seconds)
+
+        seconds = []
+        for profile in new_profiles:
+            begin = time.perf_counter()
+            response = client.post("/profiles", json=profile)
+            seconds.append(time.perf_counter() - begin)
+            response.raise_for_status()
+        results["create_profile"] = summarize(seconds)
+
+    log(f"api n={n_profiles}: /match p50 {results['match']['p50_ms']:.2f} ms "
+        f"p99 {results['match']['p99_ms']:.2f} ms, /profiles p50 {results['create_profile']['p50_ms']:.2f} ms "
+        f"p99 {results['create_profile']['p99_ms']:.2f} ms")
+    return results
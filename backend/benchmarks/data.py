@@ -0,0 +1,114 @@
+"""
+Synthetic profiles and embeddings for the benchmarks.
+
+The vocabularies (names, subject pools, preferences, learning styles) are read
+from ``demo/generate_demo_data.py`` without importing it, since that script
+needs ``requests`` and rewraps stdout on import.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import ast
+import os
+import random
+
+import numpy as np
+
+from embedding_store import EmbeddingStore, normalize_rows
+
+DEMO_DATA_SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "demo", "generate_demo_data.py")
+
+
+def load_vocabularies(path: str = DEMO_DATA_SCRIPT) -> Dict[str, List[str]]:
+    """Every ``NAME = [string literals]`` assignment of the demo data script, by name"""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    vocabularies = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.List) \
+                and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                values = ast.literal_eval(node.value)
+            except ValueError:
+                continue
+            if values and all(isinstance(value, str) for value in values):
+                vocabularies[node.targets[0].id] = values
+    return vocabularies
+
+
+def synthetic_profiles(n: int, seed: int = 0, prefix: str = "BENCH") -> List[Dict]:
+    """
+    ``n`` profiles shaped like ``generate_student_profile`` output
+
+    Args:
+        n: Number of profiles
+        seed: Random seed (same seed, same profiles)
+        prefix: Student id prefix
+
+    Returns:
+        Profile dicts with id, name, strengths, weaknesses, preferences, description
+    """
+    v = load_vocabularies()
+    stem, humanities, business = v["STEM_SUBJECTS"], v["HUMANITIES_SUBJECTS"], v["BUSINESS_SUBJECTS"]
+    pools = {
+        "STEM": (stem, [humanities]),
+        "HUMANITIES": (humanities, [stem]),
+        "BUSINESS": (business, [stem, humanities]),
+        "MIXED": (stem + humanities + business, [stem, humanities]),
+    }
+    rng = random.Random(seed)
+    profiles = []
+    for i in range(n):
+        strengths_pool, weakness_pools = pools[rng.choice(list(pools))]
+        weaknesses_pool = rng.choice(weakness_pools)
+        strengths = rng.sample(strengths_pool, rng.randint(3, 5))
+        weaknesses = rng.sample([s for s in weaknesses_pool if s not in strengths], rng.randint(3, 5))
+        profiles.append({
+            "id": f"{prefix}{i:06d}",
+            "name": f"{rng.choice(v['FIRST_NAMES'])} {rng.choice(v['LAST_NAMES'])}",
+            "strengths": ", ".join(strengths),
+            "weaknesses": ", ".join(weaknesses),
+            "preferences": f"{rng.choice(v['times'])}, {rng.choice(v['group_sizes'])}, {rng.choice(v['modes'])}",
+            "description": rng.choice(v["learning_styles"]),
+        })
+    return profiles
+
+
+def synthetic_embeddings(profiles: List[Dict], vectors: str = "model", dim: int = 384,
+                         seed: int = 0, backend: str = "torch") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalized strengths/weaknesses matrices for synthetic profiles
+
+    Args:
+        profiles: Profiles from ``synthetic_profiles``
+        vectors: "model" embeds every distinct subject once and pools them per
+            profile (``EmbeddingService`` skills mode), which is realistic and
+            fast even for 100k profiles; "random" draws Gaussian vectors and
+            needs no model
+        dim: Dimension of random vectors
+        seed: Random seed for "random"
+        backend: Embedding backend for "model"
+
+    Returns:
+        (strengths, weaknesses), each float32 of shape (len(profiles), dim)
+    """
+    if vectors == "random":
+        rng = np.random.default_rng(seed)
+        return (normalize_rows(rng.standard_normal((len(profiles), dim), dtype=np.float32)),
+                normalize_rows(rng.standard_normal((len(profiles), dim), dtype=np.float32)))
+    if vectors != "model":
+        raise ValueError(f"Unknown vector source: {vectors}")
+
+    from matcher import EmbeddingService
+
+    service = EmbeddingService(mode="skills", backend=backend)
+    texts = [p["strengths"] for p in profiles] + [p["weaknesses"] for p in profiles]
+    embedded = normalize_rows(np.asarray(service.embed_batch(texts), dtype=np.float32))
+    return embedded[:len(profiles)], embedded[len(profiles):]
+
+
+def build_store(profiles: List[Dict], strengths: np.ndarray, weaknesses: np.ndarray,
+                store: Optional[EmbeddingStore] = None) -> EmbeddingStore:
+    """An EmbeddingStore holding the synthetic profiles (attached, no per-row upserts)"""
+    store = store or EmbeddingStore(dim=strengths.shape[1])
+    store.attach([p["id"] for p in profiles], profiles, strengths, weaknesses)
+    return store
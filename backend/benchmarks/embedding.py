@@ -0,0 +1,63 @@
+"""
+Embedding throughput: ``EmbeddingService.embed_text`` one text at a time,
+``embed_batch`` over all texts, and the same texts again as cache hits.
+"""
+
+from typing import Dict
+import time
+
+from embedding_cache import EmbeddingCache
+from matcher import EmbeddingService
+
+from benchmarks.data import synthetic_profiles
+
+
+def run(n_texts: int = 1000, batch_size: int = 64, backend: str = "torch",
+        mode: str = "sentence", seed: int = 0) -> Dict:
+    """
+    Measure embedding throughput on distinct strengths/weaknesses texts
+
+    Args:
+        n_texts: Texts per measurement (single-text runs use at most 200)
+        batch_size: Texts per model forward pass for ``embed_batch``
+        backend: Embedding backend ("torch", "onnx", "onnx-int8")
+        mode: Embedding mode ("sentence" or "skills")
+        seed: Seed of the synthetic profiles
+
+    Returns:
+        Texts per second for each measurement plus the model load time
+    """
+    profiles = synthetic_profiles((n_texts + 1) // 2, seed=seed)
+    texts = list(dict.fromkeys(t for p in profiles for t in (p["strengths"], p["weaknesses"])))
+
+    service = EmbeddingService(mode=mode, backend=backend)
+    start = time.perf_counter()
+    service.warm_up()
+    load_seconds = time.perf_counter() - start
+
+    single = texts[:min(200, len(texts))]
+    start = time.perf_counter()
+    for text in single:
+        service.embed_text(text)
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service.embed_batch(texts, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    service.cache = EmbeddingCache(service.cache_namespace, max_entries=len(texts) * 8)
+    service.embed_batch(texts, batch_size=batch_size)
+    start = time.perf_counter()
+    for text in single:
+        service.embed_text(text)
+    cached_seconds = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "mode": mode,
+        "texts": len(texts),
+        "load_seconds": round(load_seconds, 3),
+        "single_texts_per_sec": round(len(single) / single_seconds, 1),
+        "batched_texts_per_sec": round(len(texts) / batch_seconds, 1),
+        "cached_texts_per_sec": round(len(single) / cached_seconds, 1),
+    }
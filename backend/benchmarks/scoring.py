@@ -0,0 +1,78 @@
+"""
+Match scoring latency against N profiles.
+
+For each roster size the same random targets are scored by:
+
+- ``loop``: the original per-pair ``find_best_matches`` (at most
+  ``LOOP_QUERIES`` queries, and skipped above ``loop_max`` profiles, where
+  one query takes seconds)
+- ``vectorized``: ``find_best_matches_vectorized`` over the store matrices
+- ``batch``: ``find_best_matches_batch`` for ``batch_size`` targets at a
+  time, reported per target
+"""
+
+from typing import Dict, Sequence
+import random
+import time
+
+from matcher import find_best_matches, find_best_matches_batch, find_best_matches_vectorized
+
+from benchmarks.data import build_store, synthetic_embeddings, synthetic_profiles
+from benchmarks.timing import summarize, time_calls
+
+LOOP_QUERIES = 20
+
+
+def run(sizes: Sequence[int] = (100, 1000, 10000, 100000), queries: int = 100, top_k: int = 3,
+        vectors: str = "model", loop_max: int = 1000, batch_size: int = 50, seed: int = 0,
+        log=print) -> Dict:
+    """
+    Measure per-query scoring latency for each roster size
+
+    Args:
+        sizes: Numbers of stored profiles
+        queries: Timed queries per scorer and size
+        top_k: Matches per query
+        vectors: Embedding source, see ``synthetic_embeddings``
+        loop_max: Largest size the per-pair loop scorer is run on
+        batch_size: Targets per ``find_best_matches_batch`` call
+        seed: Seed of profiles and targets
+        log: Progress output
+
+    Returns:
+        Dict of size -> scorer -> latency summary (milliseconds per target)
+    """
+    profiles = synthetic_profiles(max(sizes), seed=seed)
+    strengths, weaknesses = synthetic_embeddings(profiles, vectors, seed=seed)
+    rng = random.Random(seed)
+
+    results = {}
+    for n in sorted(sizes):
+        store = build_store(profiles[:n], strengths[:n].copy(), weaknesses[:n].copy())
+        targets = [rng.choice(store.ids) for _ in range(queries)]
+        result = {}
+
+        if n <= loop_max:
+            as_profiles = store.as_profiles()
+            result["loop"] = time_calls([
+                lambda t=t: find_best_matches(t, as_profiles, top_k) for t in targets[:LOOP_QUERIES]
+            ], warmup=1)
+
+        result["vectorized"] = time_calls([
+            lambda t=t: find_best_matches_vectorized(t, store, top_k) for t in targets
+        ])
+
+        seconds = []
+        for start in range(0, len(targets), batch_size):
+            block = targets[start:start + batch_size]
+            begin = time.perf_counter()
+            find_best_matches_batch(block, store, top_k)
+            elapsed = time.perf_counter() - begin
+            seconds.extend([elapsed / len(block)] * len(block))
+        result["batch"] = summarize(seconds)
+
+        results[str(n)] = result
+        log(f"scoring n={n:>7}: " + ", ".join(
+            f"{scorer} p50 {summary['p50_ms']:.3f} ms" for scorer, summary in result.items()
+        ))
+    return results
@@ -0,0 +1,36 @@
+"""
+Latency sampling helpers shared by the benchmark suites.
+"""
+
+from typing import Callable, Dict, Sequence
+import time
+
+import numpy as np
+
+
+def summarize(seconds: Sequence[float]) -> Dict:
+    """Latency percentiles (milliseconds) of a list of durations in seconds"""
+    samples = np.asarray(seconds, dtype=np.float64) * 1000
+    if samples.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(samples.max()), 4),
+    }
+
+
+def time_calls(calls: Sequence[Callable[[], object]], warmup: int = 3) -> Dict:
+    """Run each call once (after ``warmup`` untimed calls) and summarize the latencies"""
+    for call in calls[:warmup]:
+        call()
+    seconds = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
@@ -0,0 +1,229 @@
+"""
+Content-addressed cache for text embeddings.
+
+Strengths/weaknesses strings repeat heavily across students ("Calculus,
+Physics", "Essay Writing", ...), so ``EmbeddingService`` looks texts up here
+before running the transformer. The cache is keyed on the model name plus the
+normalized text and has two tiers:
+
+- an in-memory LRU bounded by entry count and by bytes
+- an optional SQLite file that survives restarts
+
+SQLite never runs on the caller's thread for writes: ``put`` hands new
+vectors to a writer thread that inserts them in batches, one commit per
+batch. Async callers read the file off the event loop with
+``load_persisted`` (one query for all memory misses).
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Most rows the writer thread inserts per commit
+WRITE_BATCH_ROWS = 512
+# Keys per SELECT ... IN query (below SQLite's bound-parameter limit)
+READ_BATCH_KEYS = 500
+
+
+class EmbeddingCache:
+    """
+    Two-tier LRU cache of float32 embedding vectors (thread-safe)
+
+    Args:
+        model_name: Model identifier, part of every key so switching models
+            never returns stale vectors
+        dim: Embedding dimension (size of the zero vector for empty text)
+        max_entries: Maximum vectors held in memory
+        max_bytes: Maximum bytes of vector data held in memory
+        persist_path: SQLite file for the persistent tier (None disables it)
+        lowercase: Fold case in the key; only valid for uncased models such
+            as all-MiniLM-L6-v2, whose tokenizer lowercases anyway
+    """
+
+    def __init__(self, model_name: str, dim: int = 384, max_entries: int = 10000,
+                 max_bytes: int = 32 * 1024 * 1024, persist_path: Optional[str] = None,
+                 lowercase: bool = True):
+        self.model_name = model_name
+        self._zero = np.zeros(dim, dtype=np.float32)
+        self._zero.flags.writeable = False
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lowercase = lowercase
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.empty_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        # Serializes use of the connection between readers and the writer thread
+        self._db_lock = threading.Lock()
+        self._writes: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+            self._writer = threading.Thread(target=self._write_loop, name="embedding-cache-writer",
+                                            daemon=True)
+            self._writer.start()
+            logger.info(f"Embedding cache persistent tier: {persist_path}")
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def normalize(self, text: str) -> str:
+        """Collapse whitespace (and case, for uncased models)"""
+        text = " ".join(text.split())
+        return text.lower() if self.lowercase else text
+
+    def key(self, text: str) -> str:
+        normalized = self.normalize(text)
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str, record: bool = True, disk: bool = True) -> Optional[np.ndarray]:
+        """Return the cached vector for a text, or None on a miss
+
+        Empty or whitespace-only text always yields the shared zero vector.
+        With ``record=False`` the lookup only peeks at the memory tier and
+        leaves counters and LRU order untouched. With ``disk=False`` a memory
+        miss is left for ``load_persisted`` (and counted there).
+        """
+        if not text or not text.strip():
+            if record:
+                with self._lock:
+                    self.empty_hits += 1
+            return self._zero
+
+        key = self.key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if not record:
+                return vector
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._db is None:
+                self.misses += 1
+                return None
+            if not disk:
+                return None
+        return self.load_persisted([text]).get(text)
+
+    def load_persisted(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Read texts missing from memory from the persistent tier (blocking)
+
+        Found vectors are promoted to the memory tier. Async callers run this
+        in a thread.
+
+        Returns:
+            Vector per text found on disk
+        """
+        keys: Dict[str, List[str]] = {}
+        for text in texts:
+            keys.setdefault(self.key(text), []).append(text)
+        rows = []
+        if self._db is not None:
+            key_list = list(keys)
+            with self._db_lock:
+                for start in range(0, len(key_list), READ_BATCH_KEYS):
+                    chunk = key_list[start:start + READ_BATCH_KEYS]
+                    rows.extend(self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall())
+        found = {}
+        with self._lock:
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._insert(key, vector)
+                for text in keys[key]:
+                    found[text] = vector
+            self.disk_hits += len(rows)
+            self.misses += len(keys) - len(rows)
+        return found
+
+    def put(self, text: str, vector) -> np.ndarray:
+        """Store a vector (as read-only float32) and return the stored array"""
+        key = self.key(text)
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        with self._lock:
+            self._insert(key, vector)
+        if self._writer is not None:
+            self._writes.put((key, vector.tobytes()))
+        return vector
+
+    def _write_loop(self):
+        """Writer thread: insert queued vectors, one transaction per batch"""
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < WRITE_BATCH_ROWS:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in batch if item is not None]
+            if rows:
+                try:
+                    with self._db_lock:
+                        self._db.executemany(
+                            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows
+                        )
+                        self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache could not persist {len(rows)} vectors: {e}")
+            if len(rows) < len(batch):
+                return
+
+    def _insert(self, key: str, vector: np.ndarray):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "empty_hits": self.empty_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        """Write the pending vectors and close the persistent tier"""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
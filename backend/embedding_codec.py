@@ -0,0 +1,72 @@
+"""
+Compact binary encoding of embedding vectors for MongoDB.
+
+BSON stores a Python list of floats as an array of doubles with a string key
+per element ("0", "1", ...), roughly 6x the size of raw float32 and slow to
+decode. Embeddings are instead persisted as a single BSON Binary value:
+
+    offset 0  3 bytes  magic b"EMB"
+    offset 3  uint8    format version (1)
+    offset 4  uint8    dtype code (1 = float32 little-endian)
+    offset 5  uint8    reserved (0)
+    offset 6  uint16   dimension, little-endian
+    offset 8  dim * 4  float32 little-endian values
+
+The 8-byte header keeps the payload 4-byte aligned, so decoding is a
+zero-copy ``np.frombuffer``. Readers accept both this format and the legacy
+list-of-floats documents during the rollout.
+"""
+
+from typing import Union
+import struct
+
+import numpy as np
+from bson.binary import Binary
+
+MAGIC = b"EMB"
+VERSION = 1
+DTYPE_FLOAT32 = 1
+HEADER = struct.Struct("<3sBBxH")
+
+_DTYPES = {DTYPE_FLOAT32: np.dtype("<f4")}
+
+
+def encode_embedding(vector) -> Binary:
+    """
+    Pack an embedding vector into a BSON Binary value
+
+    Args:
+        vector: List or array of floats
+
+    Returns:
+        Binary holding the header and the float32 little-endian payload
+    """
+    values = np.asarray(vector, dtype="<f4").ravel()
+    return Binary(HEADER.pack(MAGIC, VERSION, DTYPE_FLOAT32, len(values)) + values.tobytes())
+
+
+def decode_embedding(value: Union[bytes, list, np.ndarray]) -> np.ndarray:
+    """
+    Decode a stored embedding (binary or legacy list) into a float32 array
+
+    Binary values are decoded without copying, so the returned array is
+    read-only.
+
+    Raises:
+        ValueError: If a binary value has an unknown header or wrong length
+    """
+    if isinstance(value, (bytes, bytearray)):
+        if len(value) < HEADER.size:
+            raise ValueError("Embedding binary is shorter than its header")
+        magic, version, dtype_code, dim = HEADER.unpack_from(value)
+        if magic != MAGIC or version != VERSION or dtype_code not in _DTYPES:
+            raise ValueError(f"Unsupported embedding binary (magic={magic!r}, version={version}, dtype={dtype_code})")
+        dtype = _DTYPES[dtype_code]
+        if len(value) != HEADER.size + dim * dtype.itemsize:
+            raise ValueError(f"Embedding binary length {len(value)} does not match dimension {dim}")
+        return np.frombuffer(value, dtype=dtype, count=dim, offset=HEADER.size)
+    return np.asarray(value, dtype=np.float32)
+
+
+def is_binary_embedding(value) -> bool:
+    return isinstance(value, (bytes, bytearray))
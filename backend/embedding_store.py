@@ -0,0 +1,390 @@
+"""
+In-memory embedding store for the Peer Learning Matcher.
+
+Keeps every valid profile's strengths/weaknesses embeddings in two contiguous
+float32 NumPy matrices plus an id -> row index, so the match endpoint can score
+against process memory instead of re-reading the whole MongoDB collection.
+"""
+
+import numpy as np
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import hashlib
+import logging
+
+from embedding_codec import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2 produces 384-dim vectors
+
+# Profile text fields kept alongside the matrices (everything except embeddings)
+PROFILE_FIELDS = ("id", "name", "strengths", "weaknesses", "preferences", "description")
+
+# Example ids kept per rejection reason for the aggregated report
+REJECTION_SAMPLE_IDS = 5
+
+# Rows compared per step when diffing an attached generation (bounds temporaries)
+DIFF_BLOCK_ROWS = 8192
+
+
+class AttachChanges(NamedTuple):
+    """Difference between the contents before and after ``EmbeddingStore.attach``"""
+    removed: List[str]
+    upserted: List[str]  # added, or stored with different fields or vectors
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row of a matrix (zero rows are left as zeros)
+
+    Args:
+        matrix: Array of shape (n, dim) or a single vector of shape (dim,)
+
+    Returns:
+        float32 array of the same shape with unit-length rows
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class EmbeddingStore:
+    """
+    Process-resident store of profile embeddings.
+
+    Rows are packed densely: row ``i`` of ``strengths`` and ``weaknesses``
+    belongs to ``ids[i]``. Removing a profile moves the last row into the
+    freed slot so the live rows always occupy ``[0, len(store))``.
+
+    Vectors are L2-normalized on insert, so a dot product between rows is
+    their cosine similarity. Zero vectors (empty text) stay zero.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, initial_capacity: int = 1024):
+        self.dim = dim
+        self._strengths = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._weaknesses = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._profiles: List[Dict] = []
+        self._index: Dict[str, int] = {}
+        self._listeners: List[Callable[[str, str], None]] = []
+        self.loaded = False
+        # Bumped on every change; lets consumers detect a modified store cheaply
+        self.version = 0
+        # Per-profile content hashes and their XOR (see ``digest``)
+        self._row_digests: Dict[str, int] = {}
+        self._digest = 0
+        # Documents refused by upsert because of missing or invalid embeddings;
+        # reason -> (count, example ids) since the last report_rejections()
+        self.rejected = 0
+        self._rejections: Dict[str, Tuple[int, List[str]]] = {}
+        # What the last attach() changed, for "attach" listeners
+        self.attach_changes = AttachChanges([], [])
+        # Row freed by the last remove(), for "remove" listeners
+        self.removed_row: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, student_id: str) -> bool:
+        return student_id in self._index
+
+    @property
+    def strengths(self) -> np.ndarray:
+        """Strengths matrix of shape (len(store), dim); a view, do not mutate."""
+        return self._strengths[:len(self._ids)]
+
+    @property
+    def weaknesses(self) -> np.ndarray:
+        """Weaknesses matrix of shape (len(store), dim); a view, do not mutate."""
+        return self._weaknesses[:len(self._ids)]
+
+    @property
+    def ids(self) -> List[str]:
+        return self._ids
+
+    def row_of(self, student_id: str) -> Optional[int]:
+        """Return the matrix row for a student, or None if not stored"""
+        return self._index.get(student_id)
+
+    def get_profile(self, student_id: str) -> Optional[Dict]:
+        """Return the stored profile fields (without embeddings) for a student"""
+        row = self._index.get(student_id)
+        return None if row is None else self._profiles[row]
+
+    def profile_at(self, row: int) -> Dict:
+        return self._profiles[row]
+
+    @property
+    def digest(self) -> str:
+        """
+        Fingerprint of the contents, independent of row order and history
+
+        Unlike ``version`` it is equal in every process holding the same
+        profiles (and across restarts), so it can key shared caches and ETags.
+        """
+        return f"{self._digest:016x}"
+
+    def _row_digest(self, row: int) -> int:
+        profile = self._profiles[row]
+        content = hashlib.blake2b(digest_size=8)
+        content.update(repr(tuple(profile.get(field, "") for field in PROFILE_FIELDS)).encode("utf-8"))
+        content.update(self._strengths[row].tobytes())
+        content.update(self._weaknesses[row].tobytes())
+        return int.from_bytes(content.digest(), "little")
+
+    def _update_digest(self, student_id: str, row: Optional[int]):
+        """Replace a profile's share of the digest (row None: the profile is gone)"""
+        self._digest ^= self._row_digests.pop(student_id, 0)
+        if row is not None:
+            self._row_digests[student_id] = self._row_digest(row)
+            self._digest ^= self._row_digests[student_id]
+
+    def add_listener(self, listener: Callable[[str, str], None]):
+        """
+        Register a callback for store changes
+
+        The listener is called as ``listener(event, student_id)`` with event
+        ``"upsert"`` after a profile is stored, ``"remove"`` after it is
+        removed and ``"reload"`` (student_id ``""``) after a full load.
+
+        After ``"remove"``, ``store.removed_row`` is the row that was freed
+        (the former last row now occupies it).
+
+        ``"attach"`` (student_id ``""``) follows ``attach``: rows may have
+        moved, and ``store.attach_changes`` lists the ids removed and the ids
+        added or changed relative to the previous contents, so derived indexes
+        can update incrementally instead of rebuilding.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, event: str, student_id: str):
+        self.version += 1
+        for listener in self._listeners:
+            listener(event, student_id)
+
+    @staticmethod
+    def has_valid_embeddings(doc: Dict) -> bool:
+        """True if a MongoDB document carries both non-empty embedding fields"""
+        return bool(doc.get("strengths_emb") is not None and len(doc["strengths_emb"])
+                    and doc.get("weaknesses_emb") is not None and len(doc["weaknesses_emb"]))
+
+    def _grow(self, min_capacity: int):
+        capacity = max(self._strengths.shape[0], 1)
+        while capacity < min_capacity:
+            capacity *= 2
+        for name in ("_strengths", "_weaknesses"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, self.dim), dtype=np.float32)
+            new[:len(self._ids)] = old[:len(self._ids)]
+            setattr(self, name, new)
+
+    def upsert(self, doc: Dict) -> bool:
+        """
+        Insert or replace a profile from a MongoDB document
+
+        Args:
+            doc: Profile document including ``strengths_emb`` and ``weaknesses_emb``
+                (binary-encoded or legacy lists of floats)
+
+        Returns:
+            True if the profile was stored, False if its embeddings were invalid
+        """
+        if not self.has_valid_embeddings(doc):
+            return self._reject(doc, "missing embeddings")
+        try:
+            strengths = normalize_rows(decode_embedding(doc["strengths_emb"]))
+            weaknesses = normalize_rows(decode_embedding(doc["weaknesses_emb"]))
+        except ValueError as e:
+            logger.debug(f"Profile {doc.get('id', 'UNKNOWN')} has undecodable embeddings: {e}")
+            return self._reject(doc, "undecodable embeddings")
+        if strengths.shape != (self.dim,) or weaknesses.shape != (self.dim,):
+            return self._reject(doc, "wrong embedding dimension")
+
+        student_id = doc["id"]
+        row = self._index.get(student_id)
+        if row is None:
+            row = len(self._ids)
+            if row >= self._strengths.shape[0]:
+                self._grow(row + 1)
+            self._ids.append(student_id)
+            self._profiles.append({})
+            self._index[student_id] = row
+
+        self._strengths[row] = strengths
+        self._weaknesses[row] = weaknesses
+        self._profiles[row] = {field: doc.get(field, "") for field in PROFILE_FIELDS}
+        self._update_digest(student_id, row)
+        self._notify("upsert", student_id)
+        return True
+
+    def _reject(self, doc: Dict, reason: str) -> bool:
+        self.rejected += 1
+        count, examples = self._rejections.get(reason, (0, []))
+        if len(examples) < REJECTION_SAMPLE_IDS:
+            examples.append(doc.get("id", "UNKNOWN"))
+        self._rejections[reason] = (count + 1, examples)
+        return False
+
+    def report_rejections(self, context: str) -> int:
+        """
+        Log one aggregated warning for the documents refused since the last report
+
+        Args:
+            context: What was being loaded, for the message (e.g. "Embedding store load")
+
+        Returns:
+            Number of refused documents reported
+        """
+        rejections, self._rejections = self._rejections, {}
+        total = sum(count for count, _ in rejections.values())
+        if total:
+            details = "; ".join(f"{reason}: {count} (e.g. {', '.join(examples)})"
+                                for reason, (count, examples) in rejections.items())
+            logger.warning(f"{context} skipped {total} invalid profiles - {details}")
+        return total
+
+    def is_current(self, doc: Dict) -> bool:
+        """True if the stored profile already equals a MongoDB document"""
+        row = self._index.get(doc.get("id"))
+        if row is None or not self.has_valid_embeddings(doc):
+            return False
+        profile = self._profiles[row]
+        if any(profile[field] != doc.get(field, "") for field in PROFILE_FIELDS):
+            return False
+        try:
+            strengths = normalize_rows(decode_embedding(doc["strengths_emb"]))
+            weaknesses = normalize_rows(decode_embedding(doc["weaknesses_emb"]))
+        except ValueError:
+            return False
+        return (strengths.shape == weaknesses.shape == (self.dim,)
+                and np.allclose(strengths, self._strengths[row], atol=1e-6)
+                and np.allclose(weaknesses, self._weaknesses[row], atol=1e-6))
+
+    def remove(self, student_id: str) -> bool:
+        """Remove a profile; returns False if it was not stored"""
+        row = self._index.pop(student_id, None)
+        if row is None:
+            return False
+
+        last = len(self._ids) - 1
+        if row != last:
+            # Move the last row into the freed slot to keep the matrices dense
+            self._strengths[row] = self._strengths[last]
+            self._weaknesses[row] = self._weaknesses[last]
+            self._ids[row] = self._ids[last]
+            self._profiles[row] = self._profiles[last]
+            self._index[self._ids[row]] = row
+
+        self._ids.pop()
+        self._profiles.pop()
+        self._update_digest(student_id, None)
+        self.removed_row = row
+        self._notify("remove", student_id)
+        return True
+
+    async def load(self, collection, object_ids: Optional[Dict] = None) -> List[str]:
+        """
+        (Re)build the store from a MongoDB collection
+
+        Args:
+            collection: Motor collection holding the profiles
+            object_ids: If given, filled with ``_id`` -> student id of every
+                document read (in the same pass, so it matches the contents)
+
+        Returns:
+            IDs of profiles skipped because of missing or empty embeddings
+        """
+        listeners, self._listeners = self._listeners, []
+        self._ids, self._profiles, self._index = [], [], {}
+        self._row_digests, self._digest = {}, 0
+        self._rejections = {}
+        if isinstance(self._strengths, np.memmap):
+            # Don't rewrite (and so privatize) every page of shared matrices
+            self._strengths = np.zeros(self._strengths.shape, dtype=np.float32)
+            self._weaknesses = np.zeros(self._weaknesses.shape, dtype=np.float32)
+        skipped = []
+        try:
+            async for doc in collection.find({}, None if object_ids is not None else {"_id": 0}):
+                if object_ids is not None and "id" in doc:
+                    object_ids[doc["_id"]] = doc["id"]
+                if not self.upsert(doc):
+                    skipped.append(doc.get("id", "UNKNOWN"))
+        finally:
+            # Listeners get one "reload" instead of an event per profile
+            self._listeners = listeners
+        self.loaded = True
+        self._notify("reload", "")
+
+        logger.info(f"Embedding store loaded {len(self)} profiles")
+        self.report_rejections("Embedding store load")
+        return skipped
+
+    def attach(self, ids: List[str], profiles: List[Dict],
+               strengths: np.ndarray, weaknesses: np.ndarray):
+        """
+        Replace the contents with externally provided matrices
+
+        Used to adopt memory-mapped matrices shared between worker processes
+        (see ``shared_matrix.py``). The matrices may have spare rows beyond
+        ``len(ids)``; later upserts fill those before the store grows.
+
+        Args:
+            ids: Student id of each row
+            profiles: Profile fields of each row
+            strengths: Normalized strengths matrix, shape (capacity, dim)
+            weaknesses: Normalized weaknesses matrix, shape (capacity, dim)
+        """
+        if strengths.shape != weaknesses.shape or strengths.shape[1] != self.dim \
+                or strengths.shape[0] < len(ids) or len(profiles) != len(ids):
+            raise ValueError("Attached matrices do not match the ids or the store dimension")
+        old_index, old_profiles = self._index, self._profiles
+        old_strengths, old_weaknesses = self.strengths, self.weaknesses
+        self._ids, self._profiles = list(ids), list(profiles)
+        self._index = {student_id: row for row, student_id in enumerate(self._ids)}
+        self._strengths, self._weaknesses = strengths, weaknesses
+        self.loaded = True
+        self.attach_changes = self._diff(old_index, old_profiles, old_strengths, old_weaknesses)
+        for student_id in self.attach_changes.removed:
+            self._update_digest(student_id, None)
+        for student_id in self.attach_changes.upserted:
+            self._update_digest(student_id, self._index[student_id])
+        self._notify("attach", "")
+
+    def _diff(self, old_index: Dict[str, int], old_profiles: List[Dict],
+              old_strengths: np.ndarray, old_weaknesses: np.ndarray) -> AttachChanges:
+        """Ids removed, and ids added or changed, relative to the previous contents"""
+        removed = [student_id for student_id in old_index if student_id not in self._index]
+        upserted = []
+        kept_new, kept_old = [], []
+        for row, student_id in enumerate(self._ids):
+            old_row = old_index.get(student_id)
+            if old_row is None or old_profiles[old_row] != self._profiles[row]:
+                upserted.append(student_id)
+            else:
+                kept_new.append(row)
+                kept_old.append(old_row)
+        # Same fields: compare the vectors, block by block
+        for start in range(0, len(kept_new), DIFF_BLOCK_ROWS):
+            new_rows = np.array(kept_new[start:start + DIFF_BLOCK_ROWS], dtype=np.intp)
+            old_rows = np.array(kept_old[start:start + DIFF_BLOCK_ROWS], dtype=np.intp)
+            changed = np.any(old_strengths[old_rows] != self._strengths[new_rows], axis=1)
+            changed |= np.any(old_weaknesses[old_rows] != self._weaknesses[new_rows], axis=1)
+            upserted.extend(self._ids[row] for row in new_rows[changed])
+        return AttachChanges(removed, upserted)
+
+    def as_profiles(self) -> Dict[str, Dict]:
+        """
+        Build a profiles dict compatible with ``find_best_matches``
+
+        Embedding fields are row views into the store matrices, so no copies
+        of the vectors are made.
+        """
+        strengths, weaknesses = self.strengths, self.weaknesses
+        profiles = {}
+        for row, student_id in enumerate(self._ids):
+            profile = dict(self._profiles[row])
+            profile["strengths_emb"] = strengths[row]
+            profile["weaknesses_emb"] = weaknesses[row]
+            profiles[student_id] = profile
+        return profiles
@@ -0,0 +1,135 @@
+"""
+Offline evaluation of the per-skill embedding mode.
+
+Embeds the demo profiles twice - full-sentence encoding (the reference) and
+per-skill composition - and reports how much the match rankings change, plus
+how many texts each mode actually sends through the transformer.
+
+Usage (from the backend directory)::
+
+    python eval_skill_embeddings.py --k 5
+    python eval_skill_embeddings.py --pooling mean --profiles ../demo_profiles.json
+"""
+
+from typing import Dict, List
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+from embedding_store import EmbeddingStore
+from matcher import EmbeddingService, complementary_scores
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PROFILE_FILES = [
+    os.path.join(ROOT, "demo_profiles.json"),
+    os.path.join(ROOT, "demo", "random_profiles.json"),
+]
+
+
+class CountingEmbeddingService(EmbeddingService):
+    """EmbeddingService that counts the texts actually run through the model"""
+
+    encoded = 0
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        self.encoded += len(texts)
+        return super()._encode(texts, batch_size)
+
+
+def load_profiles(paths: List[str]) -> List[Dict]:
+    """Load profile JSON files; list-valued fields are joined into skill lists"""
+    profiles, seen = [], set()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for profile in json.load(f):
+                if profile["id"] in seen:
+                    continue
+                seen.add(profile["id"])
+                for field in ("strengths", "weaknesses"):
+                    if isinstance(profile[field], list):
+                        profile[field] = ", ".join(profile[field])
+                profiles.append(profile)
+    return profiles
+
+
+def build_store(profiles: List[Dict], service: EmbeddingService) -> EmbeddingStore:
+    texts = [p["strengths"] for p in profiles] + [p["weaknesses"] for p in profiles]
+    embeddings = service.embed_batch(texts)
+    store = EmbeddingStore(initial_capacity=len(profiles))
+    for i, profile in enumerate(profiles):
+        store.upsert(dict(profile, strengths_emb=embeddings[i],
+                          weaknesses_emb=embeddings[len(profiles) + i]))
+    return store
+
+
+def rank(values: np.ndarray) -> np.ndarray:
+    """Average ranks (ties share their mean rank), for Spearman correlation"""
+    order = np.argsort(values, kind="stable")
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(len(values))
+    for value in np.unique(values):
+        tied = values == value
+        ranks[tied] = ranks[tied].mean()
+    return ranks
+
+
+def compare(reference: EmbeddingStore, candidate: EmbeddingStore, k: int) -> Dict:
+    """Per-student overlap@k and Spearman correlation of complementary scores"""
+    overlaps, correlations = [], []
+    for row in range(len(reference)):
+        scores = []
+        for store in (reference, candidate):
+            s = complementary_scores(store.strengths[row], store.weaknesses[row],
+                                     store.strengths, store.weaknesses)
+            scores.append(np.delete(s, row))
+        top_ref = set(np.argsort(-scores[0], kind="stable")[:k])
+        top_new = set(np.argsort(-scores[1], kind="stable")[:k])
+        overlaps.append(len(top_ref & top_new) / k)
+        ranks_ref, ranks_new = rank(scores[0]), rank(scores[1])
+        if ranks_ref.std() > 0 and ranks_new.std() > 0:
+            correlations.append(np.corrcoef(ranks_ref, ranks_new)[0, 1])
+
+    vector_cosines = np.concatenate([
+        np.sum(reference.strengths * candidate.strengths, axis=1),
+        np.sum(reference.weaknesses * candidate.weaknesses, axis=1),
+    ])
+    return {
+        f"overlap@{k}": float(np.mean(overlaps)),
+        "spearman": float(np.mean(correlations)) if correlations else float("nan"),
+        "mean_vector_cosine": float(vector_cosines.mean()),
+        "min_vector_cosine": float(vector_cosines.min()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-skill vs. full-sentence embedding evaluation")
+    parser.add_argument("--profiles", nargs="+", default=DEFAULT_PROFILE_FILES,
+                        help="Profile JSON files to evaluate on")
+    parser.add_argument("--k", type=int, default=5, help="Matches compared per student")
+    parser.add_argument("--pooling", choices=["mean", "weighted"], default="weighted")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profiles)
+    print(f"Evaluating on {len(profiles)} profiles (k={args.k}, pooling={args.pooling})")
+
+    stores = {}
+    for mode in ("sentence", "skills"):
+        cache = EmbeddingCache(EmbeddingService.MODEL_NAME, max_entries=10 ** 6,
+                               max_bytes=2 ** 31)
+        service = CountingEmbeddingService(cache=cache, mode=mode, pooling=args.pooling)
+        service.get_model()  # keep model loading out of the timing
+        start = time.perf_counter()
+        stores[mode] = build_store(profiles, service)
+        elapsed = time.perf_counter() - start
+        print(f"  {mode:>8}: {service.encoded} texts encoded, {elapsed:.2f}s")
+
+    for metric, value in compare(stores["sentence"], stores["skills"], args.k).items():
+        print(f"  {metric:>20}: {value:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Indexes of the profiles collection and a query-plan self-check.
+
+Every hot query of the API filters or sorts on ``id``, so the collection gets
+a unique index on it at startup (plus one on ``updated_at`` for the polling
+mode of ``sync.py``). The unique index is also what makes duplicate
+detection race-free: inserts simply fail with ``DuplicateKeyError``.
+
+``check_query_plans`` runs ``explain()`` on the hot query shapes and raises if
+any of them would scan the whole collection (COLLSCAN), so a missing or
+dropped index fails the deployment instead of silently slowing every request.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterator, List
+import logging
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_INDEX = "id_unique"
+UPDATED_AT_INDEX = "updated_at"
+
+# Query shapes of the API endpoints: (description, filter, sort)
+HOT_QUERIES = [
+    ("lookup by id (match, delete)", {"id": "__index_check__"}, None),
+    ("lookup by id list (profile sync)", {"id": {"$in": ["__index_check__"]}}, None),
+    ("keyset page (GET /profiles)", {"id": {"$gt": ""}}, [("id", 1)]),
+    ("changes since (profile sync polling)", {"updated_at": {"$gt": datetime(1970, 1, 1)}}, [("updated_at", 1)]),
+]
+
+
+class IndexCheckError(RuntimeError):
+    """Raised when a hot query is not served by an index."""
+
+
+async def ensure_indexes(collection):
+    """
+    Create the unique index on ``id`` and the ``updated_at`` index used by
+    profile sync polling (no-ops if they already exist)
+
+    Raises:
+        RuntimeError: If stored profiles already contain duplicate ids
+    """
+    try:
+        await collection.create_index("id", unique=True, name=PROFILE_ID_INDEX)
+    except (DuplicateKeyError, OperationFailure) as e:
+        if getattr(e, "code", None) != 11000:
+            raise
+        raise RuntimeError(
+            f"Cannot create the unique index on profiles.id: the collection holds "
+            f"duplicate ids ({e}). Remove the duplicates and restart."
+        ) from e
+    await collection.create_index("updated_at", name=UPDATED_AT_INDEX)
+    logger.info(f"Ensured indexes '{PROFILE_ID_INDEX}' and '{UPDATED_AT_INDEX}' on profiles")
+
+
+def _plan_stages(plan) -> Iterator[str]:
+    """Every ``stage`` name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def check_query_plans(collection) -> Dict[str, List[str]]:
+    """
+    Explain each hot query and fail if its winning plan contains a COLLSCAN
+
+    Returns:
+        Description of each query -> stages of its winning plan
+
+    Raises:
+        IndexCheckError: If any hot query falls back to a collection scan
+    """
+    plans = {}
+    scans = []
+    for description, query, sort in HOT_QUERIES:
+        cursor = collection.find(query, {"_id": 0, "id": 1})
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.limit(1).explain()
+        winning_plan = explained.get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_plan_stages(winning_plan))
+        plans[description] = stages
+        if "COLLSCAN" in stages:
+            scans.append(description)
+
+    if scans:
+        raise IndexCheckError(
+            f"Queries on profiles fall back to a collection scan: {scans}. "
+            f"Are the '{PROFILE_ID_INDEX}' / '{UPDATED_AT_INDEX}' indexes missing?"
+        )
+    logger.info("Query plan check passed: all hot profile queries use an index")
+    return plans
@@ -0,0 +1,86 @@
+"""
+Executor for CPU-bound model inference.
+
+``SentenceTransformer.encode`` is synchronous and CPU-bound; calling it inside
+an async handler blocks the event loop. ``InferencePool`` runs such calls in a
+thread or process pool and bounds the number of queued calls, so overload is
+reported back to the client (HTTP 503) instead of growing an unbounded queue.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+import asyncio
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBusyError(RuntimeError):
+    """Raised when the inference pool already holds ``max_pending`` calls."""
+
+
+class InferencePool:
+    """
+    Bounded executor for model inference
+
+    Args:
+        kind: ``"thread"`` (shares the model, PyTorch releases the GIL while
+            computing) or ``"process"`` (one model copy per worker process)
+        workers: Number of worker threads/processes
+        max_pending: Maximum calls running or waiting; further calls raise
+            ``EmbeddingBusyError`` immediately
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 1, max_pending: int = 32):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn: forking a process that already loaded torch is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="inference",
+                )
+            logger.info(f"Started {self.kind} inference pool with {self.workers} workers")
+        return self._executor
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run ``fn(*args)`` in the pool and await its result
+
+        For process pools ``fn`` and its arguments must be picklable
+        (module-level functions only).
+
+        Raises:
+            EmbeddingBusyError: If ``max_pending`` calls are already queued
+        """
+        if self.saturated:
+            raise EmbeddingBusyError(f"Inference queue is full ({self.pending} pending calls)")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,120 @@
+"""
+Logging configuration for the Peer Learning Matcher backend.
+
+Log records are handed to a queue and written by a background thread
+(``QueueHandler`` + ``QueueListener``), so a log call on the event loop costs a
+queue put and never waits on terminal or file I/O. This applies to the root
+logger and to uvicorn's own loggers (access and error logs).
+
+Per-request events go through ``RequestLog``: they are level-gated (off at the
+default levels) and sampled below ``WARNING``, and carry ``key=value`` fields instead of
+free-form sentences.
+"""
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional, Sequence, Tuple
+import atexit
+import json
+import logging
+import queue
+import random
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Loggers with their own handlers whose output is moved behind a queue too
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+logger = logging.getLogger(__name__)
+
+# (logger, its original handlers, listener) per queued logger
+_queued: List[Tuple[logging.Logger, List[logging.Handler], QueueListener]] = []
+
+
+def _queue_logger(logger: logging.Logger, handlers: Sequence[logging.Handler]):
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _queued.append((logger, list(logger.handlers), listener))
+    logger.handlers = [QueueHandler(log_queue)]
+
+
+def configure_logging(level: str = "INFO", extra_loggers: Sequence[str] = UVICORN_LOGGERS):
+    """
+    Route logging through background writer threads (idempotent)
+
+    Handlers already installed on the root logger (or on ``extra_loggers``)
+    are kept and run by the listener thread; a root logger without handlers
+    gets a stderr handler with ``LOG_FORMAT``.
+
+    Args:
+        level: Root logger level
+        extra_loggers: Non-propagating loggers with their own handlers to queue as well
+    """
+    if _queued:
+        return
+    root = logging.getLogger()
+    root.setLevel(level)
+    handlers = root.handlers
+    if not handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers = [handler]
+    _queue_logger(root, handlers)
+    for name in extra_loggers:
+        logger = logging.getLogger(name)
+        if logger.handlers:
+            _queue_logger(logger, logger.handlers)
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush the queues and give the loggers their handlers back"""
+    while _queued:
+        logger, handlers, listener = _queued.pop()
+        listener.stop()
+        logger.handlers = handlers
+
+
+class RequestLog:
+    """
+    Sampled, level-gated structured events for request handlers
+
+    ``request_log("match", student_id=..., matches=3)`` logs
+    ``match student_id="stu001" matches=3`` for a ``sample_rate`` fraction of
+    calls, and only if the logger is enabled for the level. Gated calls cost a
+    level check and never format anything. Events at ``WARNING`` and above
+    (e.g. load shedding) are never sampled away.
+
+    Args:
+        logger: Logger to write to
+        level: Level of the events (``DEBUG`` keeps them off by default);
+            unknown level names fall back to ``INFO`` with a warning
+        sample_rate: Fraction of events below ``WARNING`` logged (0-1)
+    """
+
+    def __init__(self, logger: logging.Logger, level: str = "DEBUG", sample_rate: float = 1.0):
+        self.logger = logger
+        self.level = self._resolve_level(level)
+        self.sample_rate = sample_rate
+
+    @staticmethod
+    def _resolve_level(level) -> int:
+        if isinstance(level, int):
+            return level
+        # getLevelName maps known names to numbers and anything else to a string
+        resolved = logging.getLevelName(str(level).strip().upper())
+        if isinstance(resolved, int):
+            return resolved
+        logger.warning(f"Unknown request log level {level!r}; using INFO")
+        return logging.INFO
+
+    def __call__(self, event: str, level: Optional[int] = None, **fields):
+        level = self.level if level is None else level
+        if not self.logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.logger.log(level, "%s %s", event, " ".join(
+            f"{name}={json.dumps(value) if isinstance(value, str) else value}"
+            for name, value in fields.items()
+        ))
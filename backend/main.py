@@ -4,24 +4,205 @@ All profile data is stored in a MongoDB Atlas collection named ``profiles``.
 The async Motor driver is used via the ``backend.database`` helper.
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List, Optional
+import asyncio
+import json
 import logging
+import os
+import time
 
-from models import ProfileInput, MatchResult
-from matcher import EmbeddingService, find_best_matches
+import numpy as np
+
+from models import ProfileInput, MatchResult, MatchBatchRequest, MatchQuery, PairingRequest, PairingGroup
+from inference import InferencePool, EmbeddingBusyError
+from batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache
+from matcher import (
+    EmbeddingService, find_best_matches, find_best_matches_batch, find_best_matches_for_embeddings,
+    find_best_matches_vectorized,
+)
+from embedding_store import EmbeddingStore, PROFILE_FIELDS, normalize_rows
+from embedding_codec import encode_embedding
+from ann_index import ComplementaryANN
+from match_table import MatchTable
+from attribute_index import AttributeIndex
+from match_cache import MatchCache
+from metrics import MetricsRegistry
+from logging_setup import RequestLog, configure_logging, stop_logging
+from pairing import form_groups
 from database import get_db
+from indexes import ensure_indexes, check_query_plans
+from sync import ProfileSync
+from shared_matrix import SharedMatrix
+from snapshot import capacity_for, copy_store, restore_store, write_snapshot
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Logging is configured at startup (queue-backed, see logging_setup.py).
+# Per-request events are off at the default levels and sampled when enabled.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+request_log = RequestLog(
+    logger,
+    level=os.getenv("REQUEST_LOG_LEVEL", "DEBUG"),
+    sample_rate=float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.1")),
+)
+
+# Fail startup if a hot profiles query would scan the whole collection
+MONGO_INDEX_CHECK = os.getenv("MONGO_INDEX_CHECK", "1") != "0"
+
+# Directory shared by the workers of one machine for the embedding matrices
+SHARED_MATRIX_DIR = os.getenv("SHARED_MATRIX_DIR") or None
+SHARED_MATRIX_WAIT_SECONDS = float(os.getenv("SHARED_MATRIX_WAIT_SECONDS", "30"))
+
+# Snapshot file for fast cold starts (unset: always load from MongoDB)
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH") or None
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "300"))
+
+# Readiness of the worker: /readyz only reports ready once every part is hot
+readiness = {"embedding_store": False, "model": False}
+
+
+async def warm_up_model():
+    """Load the sentence transformer and run a warm-up encode."""
+    start = time.perf_counter()
+    try:
+        await embedding_service.awarm_up()
+    except Exception as e:
+        logger.error(f"Model warm-up failed: {e}")
+        return
+    readiness["model"] = True
+    logger.info(f"Model warmed up in {time.perf_counter() - start:.1f}s")
+
+
+async def load_store(profiles, profile_sync: ProfileSync):
+    """Restore the snapshot and replay newer changes, or load everything from MongoDB."""
+    # The change stream replays from here, covering writes made during the load
+    await profile_sync.mark_start()
+    if SNAPSHOT_PATH and os.path.exists(SNAPSHOT_PATH):
+        start = time.perf_counter()
+        try:
+            header = restore_store(embedding_store, SNAPSHOT_PATH)
+            await profile_sync.catch_up(header.high_water)
+            embedding_store.report_rejections("Snapshot catch-up")
+            logger.info(f"Restored {header.rows} profiles from {SNAPSHOT_PATH} and replayed "
+                        f"changes since {header.high_water} in {time.perf_counter() - start:.2f}s")
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring snapshot {SNAPSHOT_PATH}: {e}")
+    # Everything written before the load started is in the store afterwards
+    loaded_at = utc_now()
+    await profile_sync.load()
+    profile_sync.advance_high_water(loaded_at)
+
+
+async def write_store_snapshot(profile_sync: ProfileSync):
+    """Write the store to SNAPSHOT_PATH (copied on the loop, written in a thread)."""
+    high_water = profile_sync.high_water
+    contents = copy_store(embedding_store)
+    start = time.perf_counter()
+    await asyncio.to_thread(write_snapshot, SNAPSHOT_PATH, *contents, high_water,
+                            capacity_for(len(contents[0])))
+    logger.info(f"Wrote snapshot of {len(contents[0])} profiles in {time.perf_counter() - start:.2f}s")
+
+
+async def write_snapshots(profile_sync: ProfileSync, shared_matrix):
+    """Periodically snapshot the store when it changed (leader / single worker only)."""
+    written_version = embedding_store.version
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS)
+        if shared_matrix is not None and not shared_matrix.is_leader:
+            continue
+        if embedding_store.version != written_version:
+            written_version = embedding_store.version
+            try:
+                await write_store_snapshot(profile_sync)
+            except OSError as e:
+                logger.error(f"Writing snapshot {SNAPSHOT_PATH} failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Preload the embedding store and warm the model before taking traffic.
+
+    The store is loaded before the server starts accepting requests; the model
+    warms up in the background so /healthz answers during a slow cold start
+    while /readyz keeps the load balancer away until the worker is hot.
+    """
+    configure_logging(LOG_LEVEL)
+    profiles = get_db()["profiles"]
+    await ensure_indexes(profiles)
+    if MONGO_INDEX_CHECK:
+        await check_query_plans(profiles)
+    profile_sync = ProfileSync(
+        profiles,
+        embedding_store,
+        mode=os.getenv("PROFILE_SYNC", "auto"),
+        state_path=os.getenv("PROFILE_SYNC_STATE_PATH") or None,
+        poll_interval=float(os.getenv("PROFILE_SYNC_POLL_SECONDS", "2")),
+        reconcile_interval=float(os.getenv("PROFILE_SYNC_RECONCILE_SECONDS", "60")),
+    )
+    app.state.profile_sync = profile_sync
+
+    # With a shared matrix only the leader reads MongoDB; followers map its copy
+    shared_matrix = None
+    if SHARED_MATRIX_DIR:
+        if SharedMatrix.supported:
+            shared_matrix = SharedMatrix(
+                SHARED_MATRIX_DIR,
+                embedding_store,
+                publish_interval=float(os.getenv("SHARED_MATRIX_PUBLISH_SECONDS", "5")),
+                high_water=lambda: profile_sync.high_water,
+            )
+        else:
+            logger.warning("SHARED_MATRIX_DIR is set but file locks are unavailable; using a private store")
+    app.state.shared_matrix = shared_matrix
+
+    if shared_matrix is None or shared_matrix.try_lead():
+        await load_store(profiles, profile_sync)
+        profile_sync.start()
+        if shared_matrix is not None:
+            await shared_matrix.publish()
+    elif not await shared_matrix.wait_for_generation(SHARED_MATRIX_WAIT_SECONDS):
+        logger.warning("No shared matrix generation published yet; loading a private store")
+        await embedding_store.load(profiles)
+
+    if shared_matrix is not None:
+        async def promote():
+            await load_store(profiles, profile_sync)
+            profile_sync.start()
+
+        shared_matrix.start(on_promote=promote)
+    readiness["embedding_store"] = True
+    warm_up_task = asyncio.create_task(warm_up_model())
+    snapshot_task = None
+    if SNAPSHOT_PATH:
+        snapshot_task = asyncio.create_task(write_snapshots(profile_sync, shared_matrix))
+    yield
+    warm_up_task.cancel()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+        if shared_matrix is None or shared_matrix.is_leader:
+            await write_store_snapshot(profile_sync)
+    if shared_matrix is not None:
+        await shared_matrix.stop()
+    await profile_sync.stop()
+    inference_pool.shutdown()
+    embedding_cache.close()
+    stop_logging()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI-Powered Peer Learning Matcher",
     description="Intelligent matchmaking system for pairing students with complementary skills",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Enable CORS for frontend integration
@@ -38,26 +219,246 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize embedding service (still in‑memory, no DB needed)
-embedding_service = EmbeddingService()
+# Initialize embedding service (still in‑memory, no DB needed). Inference runs
+# in a bounded thread/process pool so model.encode never blocks the event loop.
+inference_pool = InferencePool(
+    kind=os.getenv("EMBED_EXECUTOR", "thread"),
+    workers=int(os.getenv("EMBED_WORKERS", "1")),
+    max_pending=int(os.getenv("EMBED_MAX_PENDING", "32")),
+)
+embedding_service = EmbeddingService(
+    pool=inference_pool,
+    mode=os.getenv("EMBED_MODE", "sentence"),
+    pooling=os.getenv("EMBED_SKILL_POOLING", "weighted"),
+    backend=os.getenv("EMBED_BACKEND", "torch"),
+)
+embedding_cache = EmbeddingCache(
+    embedding_service.cache_namespace,
+    max_entries=int(os.getenv("EMBED_CACHE_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("EMBED_CACHE_MB", "32")) * 1024 * 1024,
+    persist_path=os.getenv("EMBED_CACHE_PATH") or None,
+)
+embedding_service.cache = embedding_cache
+
+# Coalesces texts from concurrent profile creations into one encode call
+embedding_batcher = EmbeddingBatcher(
+    embedding_service,
+    max_wait_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+    max_batch_size=int(os.getenv("EMBED_BATCH_SIZE", "64")),
+)
+
+# Process-resident embedding matrices, loaded once at startup and kept in sync
+# by create_profile/delete_profile so /match never reads embeddings from MongoDB
+embedding_store = EmbeddingStore()
+
+# How new embeddings are written: "binary" (packed float32, see
+# embedding_codec) or "list" (legacy BSON double arrays, for rollbacks).
+# Reads accept both formats.
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "binary")
+
+
+def utc_now() -> datetime:
+    """Write timestamp (``updated_at``) used by polling profile sync."""
+    return datetime.now(timezone.utc)
+
+
+def stored_embedding(embedding: List[float]):
+    """Encode an embedding for MongoDB according to EMBEDDING_STORAGE."""
+    return encode_embedding(embedding) if EMBEDDING_STORAGE == "binary" else embedding
+
+# Texts per model forward pass and maximum profiles per POST /profiles/bulk
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+BULK_MAX_PROFILES = int(os.getenv("BULK_MAX_PROFILES", "5000"))
+
+# Scoring engine for /match: "vectorized" (matrix products over the store),
+# "ann" (approximate candidate retrieval + exact re-rank) or "loop" (the
+# original per-pair find_best_matches), kept for comparison
+MATCH_SCORER = os.getenv("MATCH_SCORER", "vectorized")
+
+complementary_ann = None
+if MATCH_SCORER == "ann":
+    complementary_ann = ComplementaryANN(
+        embedding_store,
+        backend=os.getenv("ANN_BACKEND", "ivf"),
+        candidates=int(os.getenv("ANN_CANDIDATES", "300")),
+        candidate_fraction=float(os.getenv("ANN_CANDIDATE_FRACTION", "0.015")),
+        min_profiles=int(os.getenv("ANN_MIN_PROFILES", "10000")),
+        nprobe=int(os.getenv("ANN_NPROBE", "8")),
+        ef_search=int(os.getenv("ANN_EF_SEARCH", "64")),
+    )
+
+# Preference term masks for filtered matching
+attribute_index = AttributeIndex(embedding_store)
+
+match_table = None
+if MATCH_SCORER == "table":
+    match_table = MatchTable(
+        embedding_store,
+        k=int(os.getenv("MATCH_TABLE_K", "20")),
+        block_bytes=int(os.getenv("MATCH_TABLE_BLOCK_MB", "64")) * 1024 * 1024,
+    )
+
+# Students per POST /match/batch (each costs one row of a students x N product)
+MATCH_BATCH_MAX_STUDENTS = int(os.getenv("MATCH_BATCH_MAX_STUDENTS", "500"))
+
+# Cohort pairing: the dense score matrix is N x N float32 (100 MB at 5000)
+PAIRING_MAX_PROFILES = int(os.getenv("PAIRING_MAX_PROFILES", "5000"))
+PAIRING_EXACT_MAX = int(os.getenv("PAIRING_EXACT_MAX", "100"))
+PAIRING_TIME_LIMIT_MS = int(os.getenv("PAIRING_TIME_LIMIT_MS", "2000"))
+# Requested time budgets are capped here; each holds a worker thread
+PAIRING_MAX_TIME_LIMIT_MS = int(os.getenv("PAIRING_MAX_TIME_LIMIT_MS", "10000"))
+
+
+# /match response cache. The config version covers everything besides the
+# store contents that changes results; the contents are keyed by the store
+# digest, so every worker (and a restarted one) yields the same ETags.
+SCORING_CONFIG_VERSION = ":".join([
+    embedding_service.cache_namespace,
+    embedding_service.mode,
+    MATCH_SCORER,
+    os.getenv("ANN_BACKEND", "ivf"),
+    os.getenv("ANN_CANDIDATES", "300"),
+    os.getenv("ANN_CANDIDATE_FRACTION", "0.015"),
+    os.getenv("ANN_NPROBE", "8"),
+    os.getenv("ANN_EF_SEARCH", "64"),
+])
+match_cache = MatchCache(
+    max_entries=int(os.getenv("MATCH_CACHE_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("MATCH_CACHE_TTL_SECONDS", "60")),
+    config_version=SCORING_CONFIG_VERSION,
+)
+
+# Prometheus metrics for GET /metrics. Counters and gauges are read from the
+# components at scrape time; only the per-stage request timers touch the hot
+# path, and METRICS_STAGE_TIMING=0 turns them off.
+metrics = MetricsRegistry(prefix="peer_matcher_", stage_timing=os.getenv("METRICS_STAGE_TIMING", "1") != "0")
+metrics.define_stages("match", ("lookup", "cache", "score", "response"))
+metrics.define_stages("create_profile", ("embed", "encode", "db_write", "index"))
+metrics.register(embedding_batcher.batch_size_histogram)
+metrics.register(embedding_batcher.wait_ms_histogram)
+for cache_name, cache, hits in (
+    ("match", match_cache, lambda: match_cache.hits),
+    ("embedding", embedding_cache, lambda: embedding_cache.hits + embedding_cache.disk_hits),
+):
+    metrics.counter("cache_requests_total", "Cache lookups by result",
+                    {"cache": cache_name, "result": "hit"}, function=hits)
+    metrics.counter("cache_requests_total", "Cache lookups by result",
+                    {"cache": cache_name, "result": "miss"}, function=lambda cache=cache: cache.misses)
+metrics.counter("profiles_skipped_total", "Profiles not stored because of missing or invalid embeddings",
+                function=lambda: embedding_store.rejected)
+metrics.gauge("embedding_store_profiles", "Profiles in the in-memory embedding store",
+              function=lambda: len(embedding_store))
+metrics.gauge("embedding_store_bytes", "Size of the live embedding matrices",
+              function=lambda: embedding_store.strengths.nbytes + embedding_store.weaknesses.nbytes)
+metrics.gauge("embedding_cache_entries", "Texts in the in-memory embedding cache",
+              function=lambda: embedding_cache.stats()["entries"])
+metrics.gauge("inference_pending_calls", "Embedding calls running or queued in the inference pool",
+              function=lambda: inference_pool.pending)
+for component in readiness:
+    metrics.gauge("ready", "1 once a component is loaded (model warmed up, store loaded)",
+                  {"component": component}, function=lambda component=component: readiness[component])
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header lists the ETag (or is "*")."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def score_matches(student_id: str, top_k: int, candidates: Optional[np.ndarray] = None):
+    """Run the configured scoring engine against the in-memory store.
+
+    A candidate mask (filtered matching) always uses the exact vectorized
+    scorer over just the candidate rows.
+    """
+    if candidates is not None:
+        return find_best_matches_vectorized(student_id, embedding_store, top_k, candidates)
+    if MATCH_SCORER == "loop":
+        return find_best_matches(student_id, embedding_store.as_profiles(), top_k)
+    if complementary_ann is not None:
+        return complementary_ann.find_best_matches(student_id, top_k)
+    if match_table is not None:
+        matches = match_table.lookup(student_id, top_k)
+        if matches is not None:
+            return matches
+    return find_best_matches_vectorized(student_id, embedding_store, top_k)
 
 # Helper to get the MongoDB collection used for profiles
 def get_profiles_collection(db=Depends(get_db)):
     return db["profiles"]
 
+
+def embedding_busy(error: EmbeddingBusyError) -> HTTPException:
+    """503 response telling clients to retry once the inference queue drains."""
+    request_log("embedding_busy", level=logging.WARNING, error=str(error))
+    return HTTPException(
+        status_code=503,
+        detail="Embedding service is busy. Please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
+def duplicate_profile(student_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Profile with ID '{student_id}' already exists",
+    )
+
 # ---------------------------------------------------------------------------
 # Health check
 # ---------------------------------------------------------------------------
 @app.get("/")
 async def root(db=Depends(get_db)):
     """Health check endpoint – returns basic status and total profile count."""
-    total = await db["profiles"].count_documents({})
+    # Collection metadata count: O(1), no scan
+    total = await db["profiles"].estimated_document_count()
     return {
         "status": "online",
         "message": "AI-Powered Peer Learning Matcher API",
         "total_profiles": total,
     }
 
+# ---------------------------------------------------------------------------
+# Liveness and readiness probes
+# ---------------------------------------------------------------------------
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe – the process is up and serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe – 200 once the embedding store is loaded and the model is warm."""
+    ready = all(readiness.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "checks": readiness},
+    )
+
+# ---------------------------------------------------------------------------
+# Embedding pipeline statistics
+# ---------------------------------------------------------------------------
+@app.get("/stats/embedding")
+async def embedding_stats():
+    """Embedding micro-batcher histograms and embedding cache counters."""
+    return {
+        "batcher": embedding_batcher.stats(),
+        "cache": embedding_cache.stats(),
+        "pending_inference_calls": inference_pool.pending,
+        "match_cache": match_cache.stats(),
+        "sync": app.state.profile_sync.stats(),
+        "shared_matrix": app.state.shared_matrix.stats() if app.state.shared_matrix else None,
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ---------------------------------------------------------------------------
 # Create a new profile
 # ---------------------------------------------------------------------------
@@ -67,45 +468,48 @@ async def create_profile(
     collection = Depends(get_profiles_collection),
 ):
     """Create a new student profile with NLP embeddings and store it in MongoDB."""
-    # Check for duplicate ID
-    existing = await collection.find_one({"id": profile.id})
-    if existing:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Profile with ID '{profile.id}' already exists",
-        )
+    # Cheap early exit before embedding; the unique index is the authority
+    if profile.id in embedding_store:
+        raise duplicate_profile(profile.id)
 
-    logger.info(f"Creating profile for student: {profile.id}")
+    timer = metrics.stage_timer("create_profile")
 
     # Generate embeddings
     try:
-        strengths_emb = embedding_service.embed_text(profile.strengths)
-        weaknesses_emb = embedding_service.embed_text(profile.weaknesses)
+        strengths_emb, weaknesses_emb = await embedding_batcher.embed(
+            [profile.strengths, profile.weaknesses]
+        )
         
         # Ensure embeddings are lists (they should be from embed_text, but double-check)
         if not isinstance(strengths_emb, list):
             strengths_emb = list(strengths_emb)
         if not isinstance(weaknesses_emb, list):
             weaknesses_emb = list(weaknesses_emb)
-            
-        logger.info(f"Generated embeddings - strengths: {len(strengths_emb)} dims, weaknesses: {len(weaknesses_emb)} dims")
+    except EmbeddingBusyError as e:
+        raise embedding_busy(e)
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to generate embeddings. Please try again.",
         )
+    timer.mark("embed")
 
     # Prepare document for MongoDB
     profile_data = profile.model_dump()
-    profile_data["strengths_emb"] = strengths_emb
-    profile_data["weaknesses_emb"] = weaknesses_emb
-    
-    # Log what we're storing
-    logger.info(f"Storing profile with fields: {list(profile_data.keys())}")
+    profile_data["strengths_emb"] = stored_embedding(strengths_emb)
+    profile_data["weaknesses_emb"] = stored_embedding(weaknesses_emb)
+    profile_data["updated_at"] = utc_now()
+    timer.mark("encode")
 
-    await collection.insert_one(profile_data)
-    logger.info(f"Profile created successfully for {profile.id}")
+    try:
+        await collection.insert_one(profile_data)
+    except DuplicateKeyError:
+        raise duplicate_profile(profile.id)
+    timer.mark("db_write")
+    embedding_store.upsert(profile_data)
+    timer.mark("index")
+    request_log("profile_created", student_id=profile.id)
 
     return {
         "message": "Profile created successfully",
@@ -113,27 +517,166 @@ async def create_profile(
         "name": profile.name,
     }
 
+# ---------------------------------------------------------------------------
+# Create many profiles at once
+# ---------------------------------------------------------------------------
+@app.post("/profiles/bulk", status_code=201)
+async def create_profiles_bulk(
+    profiles: List[ProfileInput],
+    collection = Depends(get_profiles_collection),
+):
+    """Create many profiles with one batched embedding pass and one insert_many.
+
+    Duplicate IDs (already stored, or repeated within the request) are skipped
+    and reported per item instead of failing the whole batch.
+    """
+    if len(profiles) > BULK_MAX_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many profiles in one request ({len(profiles)}). Maximum is {BULK_MAX_PROFILES}.",
+        )
+
+    duplicates = []
+    unique = {}
+    for profile in profiles:
+        if profile.id in unique:
+            duplicates.append({"id": profile.id, "reason": "Duplicate ID in request"})
+        else:
+            unique[profile.id] = profile
+
+    # Skip known profiles before embedding; anything the store does not know
+    # about is still caught by the unique index on insert
+    for student_id in [i for i in unique if i in embedding_store]:
+        del unique[student_id]
+        duplicates.append({"id": student_id, "reason": "Profile already exists"})
+
+    to_insert = list(unique.values())
+    if not to_insert:
+        request_log("profiles_bulk_created", requested=len(profiles), inserted=0,
+                    duplicates=len(duplicates), errors=0)
+        return {
+            "message": "No new profiles to create",
+            "inserted": 0,
+            "inserted_ids": [],
+            "duplicates": duplicates,
+            "errors": [],
+        }
+
+    # Strengths and weaknesses of every profile are encoded in a single call
+    try:
+        texts = [p.strengths for p in to_insert] + [p.weaknesses for p in to_insert]
+        embeddings = await embedding_service.aembed_batch(texts, batch_size=EMBED_BATCH_SIZE)
+    except EmbeddingBusyError as e:
+        raise embedding_busy(e)
+    except Exception as e:
+        logger.error(f"Error generating bulk embeddings: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to generate embeddings. Please try again.",
+        )
+
+    documents = []
+    now = utc_now()
+    for i, profile in enumerate(to_insert):
+        profile_data = profile.model_dump()
+        profile_data["strengths_emb"] = stored_embedding(embeddings[i])
+        profile_data["weaknesses_emb"] = stored_embedding(embeddings[len(to_insert) + i])
+        profile_data["updated_at"] = now
+        documents.append(profile_data)
+
+    failed = {}
+    errors = []
+    try:
+        await collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            student_id = documents[write_error["index"]]["id"]
+            failed[write_error["index"]] = student_id
+            if write_error.get("code") == 11000:
+                duplicates.append({"id": student_id, "reason": "Profile already exists"})
+            else:
+                errors.append({"id": student_id, "reason": write_error.get("errmsg", "Write failed")})
+
+    inserted_ids = []
+    for i, document in enumerate(documents):
+        if i not in failed:
+            embedding_store.upsert(document)
+            inserted_ids.append(document["id"])
+
+    request_log("profiles_bulk_created", requested=len(profiles), inserted=len(inserted_ids),
+                duplicates=len(duplicates), errors=len(errors))
+    return {
+        "message": f"Created {len(inserted_ids)} profiles",
+        "inserted": len(inserted_ids),
+        "inserted_ids": inserted_ids,
+        "duplicates": duplicates,
+        "errors": errors,
+    }
+
 # ---------------------------------------------------------------------------
 # Retrieve all profiles (without embedding vectors)
 # ---------------------------------------------------------------------------
+PROFILES_PAGE_MAX = int(os.getenv("PROFILES_PAGE_MAX", "1000"))
+
+
+def public_profile(doc: dict) -> dict:
+    """Profile fields returned by the API (no embeddings or Mongo _id)."""
+    return {field: doc.get(field, "") for field in PROFILE_FIELDS}
+
+
 @app.get("/profiles")
-async def get_all_profiles(collection = Depends(get_profiles_collection)):
-    """Return a list of all stored profiles, omitting heavy embedding fields."""
-    cursor = collection.find(
-        {},
-        {"strengths_emb": 0, "weaknesses_emb": 0},
-    )
-    clean_profiles: List[dict] = []
-    async for doc in cursor:
-        clean_profiles.append({
-            "id": doc["id"],
-            "name": doc["name"],
-            "strengths": doc["strengths"],
-            "weaknesses": doc["weaknesses"],
-            "preferences": doc.get("preferences", ""),
-            "description": doc.get("description", ""),
-        })
-    return {"total": len(clean_profiles), "profiles": clean_profiles}
+async def get_all_profiles(
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    format: str = "json",
+    collection = Depends(get_profiles_collection),
+):
+    """
+    Return stored profiles, omitting heavy embedding fields.
+
+    Without parameters every profile is returned in one body. ``limit`` and
+    ``after`` page through the collection by ``id`` (pass the previous page's
+    ``next_after``), and ``format=ndjson`` streams one profile per line as the
+    cursor produces them.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    if limit is not None and not 1 <= limit <= PROFILES_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {PROFILES_PAGE_MAX}")
+
+    query = {} if after is None else {"id": {"$gt": after}}
+    projection = {field: 1 for field in PROFILE_FIELDS}
+    projection["_id"] = 0
+    cursor = collection.find(query, projection)
+    if limit is not None or after is not None:
+        # Keyset pagination: stable order on the unique id
+        cursor = cursor.sort("id", 1)
+    if limit is not None:
+        # One extra document tells whether another page follows
+        cursor = cursor.limit(limit + 1)
+
+    if format == "ndjson":
+        async def stream():
+            sent = 0
+            async for doc in cursor.batch_size(500):
+                if limit is not None and sent == limit:
+                    break
+                sent += 1
+                yield json.dumps(public_profile(doc)) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    clean_profiles: List[dict] = [public_profile(doc) async for doc in cursor]
+    if limit is None:
+        return {"total": len(clean_profiles), "profiles": clean_profiles}
+
+    has_more = len(clean_profiles) > limit
+    clean_profiles = clean_profiles[:limit]
+    return {
+        "count": len(clean_profiles),
+        "profiles": clean_profiles,
+        "next_after": clean_profiles[-1]["id"] if has_more else None,
+    }
 
 # ---------------------------------------------------------------------------
 # Find matches for a given student
@@ -141,63 +684,60 @@ async def get_all_profiles(collection = Depends(get_profiles_collection)):
 @app.get("/match/{student_id}")
 async def get_matches(
     student_id: str,
+    response: Response,
     top_k: int = 3,
+    preference: Optional[List[str]] = Query(None, description="Preference terms every match must have"),
+    exclude: Optional[List[str]] = Query(None, description="Student IDs to leave out"),
+    if_none_match: Optional[str] = Header(None),
     collection = Depends(get_profiles_collection),
 ):
-    """Find the best matching peers for a student using the complementary scoring algorithm."""
-    target = await collection.find_one({"id": student_id})
-    if not target:
+    """Find the best matching peers for a student using the complementary scoring algorithm.
+
+    ``preference`` (repeatable) keeps only candidates whose preferences contain
+    every given term; ``exclude`` (repeatable) leaves out the listed students.
+    """
+    timer = metrics.stage_timer("match")
+    target = embedding_store.get_profile(student_id)
+    if target is None:
+        # Distinguish unknown students from stored profiles without embeddings
+        if await collection.find_one({"id": student_id}, {"_id": 1}) is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Student with ID '{student_id}' not found",
+            )
         raise HTTPException(
-            status_code=404,
-            detail=f"Student with ID '{student_id}' not found",
+            status_code=500,
+            detail=f"Student '{student_id}' profile exists but has invalid or missing embeddings. Please recreate the profile.",
         )
 
     # Need at least two profiles to match
-    total_profiles = await collection.count_documents({})
-    if total_profiles < 2:
+    if len(embedding_store) < 2:
         raise HTTPException(
             status_code=400,
             detail="Not enough profiles to generate matches. Need at least 2 profiles.",
         )
 
-    logger.info(f"Finding matches for student: {student_id}")
+    timer.mark("lookup")
 
-    # Load all profiles into a dict compatible with the existing matcher utility
-    all_docs = await collection.find().to_list(length=None)
-    
-    # Validate and prepare profiles
-    profiles_dict = {}
-    skipped_profiles = []
-    
-    for doc in all_docs:
-        doc.pop("_id", None)  # Remove MongoDB's _id field
-        
-        # Validate that embeddings exist and are valid
-        student_id_val = doc.get("id", "UNKNOWN")
-        
-        if "strengths_emb" not in doc or "weaknesses_emb" not in doc:
-            logger.warning(f"Profile {student_id_val} missing embedding fields - skipping from matches")
-            skipped_profiles.append(student_id_val)
-            continue
-            
-        if not doc["strengths_emb"] or not doc["weaknesses_emb"]:
-            logger.warning(f"Profile {student_id_val} has null/empty embeddings - skipping from matches")
-            skipped_profiles.append(student_id_val)
-            continue
-            
-        profiles_dict[doc["id"]] = doc
-    
-    if skipped_profiles:
-        logger.warning(f"Skipped {len(skipped_profiles)} profiles due to missing embeddings: {skipped_profiles}")
-    
-    # Ensure target student has valid embeddings
-    if student_id not in profiles_dict:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Student '{student_id}' profile exists but has invalid or missing embeddings. Please recreate the profile.",
-        )
+    # Same store generation and scoring config => same result
+    preference, exclude = sorted(set(preference or [])), sorted(set(exclude or []))
+    cache_key = match_cache.key(embedding_store.digest, student_id, top_k,
+                                tuple(preference), tuple(exclude))
+    etag = MatchCache.etag(cache_key)
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+    cached = match_cache.get(cache_key)
+    timer.mark("cache")
+    if cached is not None:
+        return cached
 
-    matches = find_best_matches(student_id, profiles_dict, top_k)
+    candidates = None
+    if preference or exclude:
+        candidates = attribute_index.candidate_mask(preference, exclude)
+    matches = score_matches(student_id, top_k, candidates)
+    timer.mark("score")
 
     match_results = []
     for match in matches:
@@ -211,12 +751,194 @@ async def get_matches(
             )
         )
 
-    return {
+    result = {
         "student_id": student_id,
         "student_name": target["name"],
         "total_matches": len(match_results),
         "matches": [m.model_dump() for m in match_results],
     }
+    match_cache.put(cache_key, result)
+    timer.mark("response")
+    request_log("match", student_id=student_id, top_k=top_k, matches=len(match_results))
+    return result
+
+# ---------------------------------------------------------------------------
+# Find matches for many students at once
+# ---------------------------------------------------------------------------
+@app.post("/match/batch")
+async def get_matches_batch(request: MatchBatchRequest):
+    """Find the best matching peers for many students with one scoring pass.
+
+    All requested students are scored against the store in a single
+    matrix-matrix product, so a dashboard of 50 students costs one pass
+    instead of 50 ``GET /match`` calls. Scoring is always exact (vectorized),
+    whatever MATCH_SCORER is. Unknown students are listed in ``not_found``.
+    """
+    student_ids = list(dict.fromkeys(request.student_ids))
+    if len(student_ids) > MATCH_BATCH_MAX_STUDENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many students for one batch ({len(student_ids)} > {MATCH_BATCH_MAX_STUDENTS})",
+        )
+    if len(embedding_store) < 2:
+        raise HTTPException(
+            status_code=400,
+            detail="Not enough profiles to generate matches. Need at least 2 profiles.",
+        )
+
+    matches_by_student = find_best_matches_batch(student_ids, embedding_store, request.top_k)
+
+    results = []
+    for student_id, matches in matches_by_student.items():
+        match_results = [
+            MatchResult(
+                student_id=match[0],
+                name=match[1],
+                score=round(match[2], 4),
+                strengths=match[3],
+                weaknesses=match[4],
+            )
+            for match in matches
+        ]
+        results.append({
+            "student_id": student_id,
+            "student_name": embedding_store.get_profile(student_id)["name"],
+            "total_matches": len(match_results),
+            "matches": [m.model_dump() for m in match_results],
+        })
+
+    return {
+        "total_students": len(results),
+        "results": results,
+        "not_found": [student_id for student_id in student_ids if student_id not in matches_by_student],
+    }
+
+# ---------------------------------------------------------------------------
+# Match a hypothetical profile without storing it
+# ---------------------------------------------------------------------------
+@app.post("/match/query")
+async def query_matches(query: MatchQuery):
+    """Find who would match a profile that does not exist yet.
+
+    Each side is given as text (embedded through the cached, batched
+    embedding service) or as a precomputed vector, and scored against the
+    in-memory store. Nothing is written to MongoDB or the store.
+    """
+    texts, vectors = [], {}
+    for side in ("strengths", "weaknesses"):
+        embedding = getattr(query, f"{side}_emb")
+        if embedding is not None:
+            if len(embedding) != embedding_store.dim:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{side}_emb must have {embedding_store.dim} dimensions, got {len(embedding)}",
+                )
+            vectors[side] = embedding
+        elif getattr(query, side):
+            texts.append(side)
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Provide either {side} text or {side}_emb",
+            )
+
+    if texts:
+        try:
+            embedded = await embedding_batcher.embed([getattr(query, side) for side in texts])
+        except EmbeddingBusyError as e:
+            raise embedding_busy(e)
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {e}")
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to generate embeddings. Please try again.",
+            )
+        vectors.update(zip(texts, embedded))
+
+    if len(embedding_store) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="No profiles to match against.",
+        )
+
+    candidates = None
+    if query.preference or query.exclude:
+        candidates = attribute_index.candidate_mask(query.preference, query.exclude)
+    matches = find_best_matches_for_embeddings(
+        normalize_rows(vectors["strengths"]), normalize_rows(vectors["weaknesses"]),
+        embedding_store, query.top_k, candidates,
+    )
+
+    match_results = [
+        MatchResult(
+            student_id=match[0],
+            name=match[1],
+            score=round(match[2], 4),
+            strengths=match[3],
+            weaknesses=match[4],
+        )
+        for match in matches
+    ]
+    return {
+        "total_matches": len(match_results),
+        "matches": [m.model_dump() for m in match_results],
+    }
+
+# ---------------------------------------------------------------------------
+# Pair or group a whole cohort
+# ---------------------------------------------------------------------------
+@app.post("/pairings")
+async def create_pairings(request: PairingRequest):
+    """Assign a cohort to pairs/groups maximizing the total complementary score."""
+    # Default to every profile; keep the caller's order and drop repeats
+    student_ids = list(dict.fromkeys(request.student_ids or embedding_store.ids))
+    unknown = [student_id for student_id in student_ids if student_id not in embedding_store]
+    if unknown:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Students not found or without embeddings: {unknown[:20]}",
+        )
+    if len(student_ids) > PAIRING_MAX_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many students for one pairing ({len(student_ids)} > {PAIRING_MAX_PROFILES})",
+        )
+
+    # Snapshot the cohort's rows so the store can change while we compute
+    rows = np.array([embedding_store.row_of(student_id) for student_id in student_ids], dtype=np.intp)
+    strengths = embedding_store.strengths[rows]
+    weaknesses = embedding_store.weaknesses[rows]
+    names = [embedding_store.profile_at(row)["name"] for row in rows]
+    time_limit_ms = request.time_limit_ms if request.time_limit_ms is not None else PAIRING_TIME_LIMIT_MS
+    time_limit_ms = min(time_limit_ms, PAIRING_MAX_TIME_LIMIT_MS)
+    try:
+        groups, totals, method = await asyncio.to_thread(
+            form_groups, strengths, weaknesses, request.group_size, request.method,
+            time_limit_ms / 1000, PAIRING_EXACT_MAX,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = []
+    for members, total in zip(groups, totals):
+        n_pairs = len(members) * (len(members) - 1) / 2
+        results.append(
+            PairingGroup(
+                student_ids=[student_ids[i] for i in members],
+                names=[names[i] for i in members],
+                score=round(total / n_pairs, 4),
+            )
+        )
+
+    total_score = sum(totals)
+    return {
+        "total_students": len(student_ids),
+        "group_size": request.group_size,
+        "method": method,
+        "total_score": round(total_score, 4),
+        "mean_group_score": round(sum(g.score for g in results) / len(results), 4),
+        "groups": [g.model_dump() for g in results],
+    }
 
 # ---------------------------------------------------------------------------
 # Delete a profile
@@ -230,7 +952,8 @@ async def delete_profile(student_id: str, collection = Depends(get_profiles_coll
             status_code=404,
             detail=f"Student with ID '{student_id}' not found",
         )
-    logger.info(f"Profile deleted: {student_id}")
+    embedding_store.remove(student_id)
+    request_log("profile_deleted", student_id=student_id)
     return {"message": "Profile deleted successfully", "student_id": student_id}
 
 # ---------------------------------------------------------------------------
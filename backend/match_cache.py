@@ -0,0 +1,89 @@
+"""
+Cache of ``/match`` responses.
+
+The frontend re-requests the same students' matches on every click. Results
+only change when the scoring configuration or the profiles change, so they are
+cached under (student_id, top_k, scoring config version, store generation):
+
+- the generation is the ``EmbeddingStore.digest`` content fingerprint, which
+  changes with every create, delete or sync update; a new generation drops
+  all entries, since one new profile can enter any student's top-K. Being
+  derived from the contents, it is the same in every worker and across
+  restarts, so ETags validate wherever the revalidation lands
+- entries also expire after a TTL and the cache is LRU-bounded
+
+The same key yields the response ``ETag``, so unchanged results are answered
+with ``304 Not Modified`` without scoring or serializing anything.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+import hashlib
+import time
+
+
+class MatchCache:
+    """
+    TTL + LRU cache of match responses, invalidated by store generation
+
+    Args:
+        max_entries: Maximum cached responses (0 disables caching)
+        ttl_seconds: Lifetime of an entry
+        config_version: Identifies the scoring configuration; part of every key
+            and ETag, so changing the scorer invalidates browser caches too
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 60.0, config_version: str = ""):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.config_version = config_version
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+        self._generation: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, generation: Hashable, *parts: Hashable) -> Tuple:
+        return (self.config_version, generation) + parts
+
+    @staticmethod
+    def etag(key: Tuple) -> str:
+        """Strong ETag of a cache key"""
+        return '"' + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20] + '"'
+
+    def _sync_generation(self, generation: Hashable):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        self._sync_generation(key[1])
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple, response: Dict):
+        if self.max_entries <= 0:
+            return
+        self._sync_generation(key[1])
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "generation": self._generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,428 @@
+"""
+Precomputed top-K match table.
+
+For cohort-sized rosters it is cheaper to keep every student's top-K
+complementary matches precomputed than to score on each request. The table
+is built with blocked matrix-matrix products over the ``EmbeddingStore`` and
+then maintained incrementally from the store's change events:
+
+- a new profile is scored once against everyone (one matrix-vector product);
+  because the complementary score is symmetric, that single row also tells
+  which other students' lists the newcomer enters
+- a removed profile is dropped from the lists that contained it; each such
+  list is still an exact top-(K-1) until it is recomputed, in place when only
+  a few lists are affected and in a worker thread otherwise (lookups deeper
+  than a truncated list fall back to vectorized scoring meanwhile)
+
+``/match/{student_id}`` then becomes an O(K) lookup.
+
+Full builds are O(N^2 * dim), so they run in a worker thread on a copy of
+the store; score blocks are sized to a fixed byte budget rather than a fixed
+row count. Changes made during a build are replayed onto its result, and
+lookups return None (callers fall back to vectorized scoring) until the
+first build is ready.
+"""
+
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import asyncio
+import bisect
+import logging
+import time
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from matcher import complementary_score_matrix, complementary_scores, top_k_rows
+
+logger = logging.getLogger(__name__)
+
+# Above this share of changed profiles an attach rebuilds the table instead
+INCREMENTAL_ATTACH_FRACTION = 0.1
+
+# Lists truncated by one removal that are refilled in place; more (a removed
+# "hub" listed by many students) are recomputed in a worker thread
+SYNC_REFILL_LISTS = 8
+
+
+class MatchTable:
+    """
+    Per-student top-K complementary matches, kept in sync with a store
+
+    Args:
+        store: EmbeddingStore to follow (through its change listener)
+        k: Matches kept per student; lookups with a larger top_k return None
+        block_bytes: Memory budget of the score blocks of a build (two
+            float32 blocks of rows x N are alive at a time)
+    """
+
+    def __init__(self, store: EmbeddingStore, k: int = 20, block_bytes: int = 64 * 1024 * 1024):
+        self.store = store
+        self.k = k
+        self.block_bytes = block_bytes
+        # student id -> (match ids, match scores), best first
+        self._lists: Dict[str, Tuple[List[str], List[float]]] = {}
+        # student id -> students whose lists contain it
+        self._referenced_by: Dict[str, Set[str]] = {}
+        # Per store row: score a newcomer must beat to enter that row's list
+        self._thresholds = np.zeros(0, dtype=np.float32)
+        self._thresholds_dirty = True
+        # Lists cut short by removals: exact, but fewer than K matches
+        self._truncated: Set[str] = set()
+        self.built = False
+        self._build_task: Optional[asyncio.Task] = None
+        self._refill_task: Optional[asyncio.Task] = None
+        # Changes made while a background build / refill runs, replayed onto its result
+        self._pending: Optional[List[Tuple[str, str]]] = None
+        self._refill_events: Optional[List[Tuple[str, str]]] = None
+        store.add_listener(self._on_store_change)
+
+    def __len__(self) -> int:
+        return len(self._lists)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+    @property
+    def building(self) -> bool:
+        return self._build_task is not None and not self._build_task.done()
+
+    def block_rows(self, n: int) -> int:
+        """Query rows per score block for a store of n profiles"""
+        return max(1, self.block_bytes // (2 * 4 * max(n, 1)))
+
+    def _top_lists(self, rows: np.ndarray, ids: List[str], strengths: np.ndarray,
+                   weaknesses: np.ndarray) -> Iterator[Tuple[str, List[str], List[float]]]:
+        """(id, match ids, match scores) of the given rows, scored block by block"""
+        limit = min(self.k, len(ids) - 1)
+        step = self.block_rows(len(ids))
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            scores = complementary_score_matrix(strengths[block], weaknesses[block], strengths, weaknesses)
+            scores[np.arange(len(block)), block] = -np.inf
+            for i, row in enumerate(block):
+                best = top_k_rows(scores[i], limit)
+                yield ids[row], [ids[j] for j in best], [float(scores[i, j]) for j in best]
+
+    def _set_list(self, student_id: str, match_ids: List[str], match_scores: List[float]):
+        """Install a freshly computed (complete) list"""
+        old = self._lists.get(student_id)
+        if old is not None:
+            for match_id in old[0]:
+                self._referenced_by.get(match_id, set()).discard(student_id)
+        self._lists[student_id] = (match_ids, match_scores)
+        self._truncated.discard(student_id)
+        for match_id in match_ids:
+            self._referenced_by.setdefault(match_id, set()).add(student_id)
+        self._update_threshold(student_id)
+
+    def _compute_rows(self, rows: np.ndarray, ids: List[str], strengths: np.ndarray,
+                      weaknesses: np.ndarray) -> Dict[str, Tuple[List[str], List[float]]]:
+        """Lists of the given rows (pure: safe to run in a thread)"""
+        return {student_id: (match_ids, match_scores) for student_id, match_ids, match_scores
+                in self._top_lists(rows, ids, strengths, weaknesses)}
+
+    def _recompute(self, rows: np.ndarray):
+        """Recompute the lists of the given store rows"""
+        for student_id, (match_ids, match_scores) in self._compute_rows(
+                rows, self.store.ids, self.store.strengths, self.store.weaknesses).items():
+            self._set_list(student_id, match_ids, match_scores)
+
+    def _compute_all(self, ids: List[str], strengths: np.ndarray, weaknesses: np.ndarray):
+        """Lists and reverse references of every row (pure: safe to run in a thread)"""
+        lists: Dict[str, Tuple[List[str], List[float]]] = {}
+        referenced_by: Dict[str, Set[str]] = {}
+        for student_id, match_ids, match_scores in self._top_lists(
+                np.arange(len(ids)), ids, strengths, weaknesses):
+            lists[student_id] = (match_ids, match_scores)
+            for match_id in match_ids:
+                referenced_by.setdefault(match_id, set()).add(student_id)
+        return lists, referenced_by
+
+    def _install(self, lists, referenced_by, size: int, start: float):
+        self._lists, self._referenced_by = lists, referenced_by
+        self._truncated = set()
+        self._thresholds_dirty = True
+        self._refresh_thresholds()
+        self.built = True
+        logger.info(f"Built match table (k={self.k}) for {size} profiles "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    def build(self):
+        """Compute every student's top-K list from scratch, in place"""
+        start = time.perf_counter()
+        lists, referenced_by = self._compute_all(self.store.ids, self.store.strengths,
+                                                 self.store.weaknesses)
+        self._install(lists, referenced_by, len(self.store), start)
+
+    async def build_async(self):
+        """
+        Compute every list in a worker thread from a copy of the store
+
+        Changes made meanwhile are replayed onto the result; a reload (or an
+        attach changing too many profiles) during the build starts it over.
+        """
+        start = time.perf_counter()
+        while True:
+            ids = list(self.store.ids)
+            strengths, weaknesses = self.store.strengths.copy(), self.store.weaknesses.copy()
+            self._pending = []
+            try:
+                lists, referenced_by = await asyncio.to_thread(self._compute_all, ids, strengths, weaknesses)
+            finally:
+                pending, self._pending = self._pending, None
+            if ("reload", "") not in pending:
+                break
+        self._install(lists, referenced_by, len(ids), start)
+        for event, student_id in pending:
+            self._apply(event, student_id)
+
+    def schedule_build(self):
+        """Build in the background (in place when no event loop is running)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.build()
+            return
+        if not self.building:
+            self._build_task = loop.create_task(self.build_async())
+            self._build_task.add_done_callback(self._on_build_done)
+
+    @staticmethod
+    def _on_build_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Building the match table failed: {task.exception()!r}")
+
+    # ------------------------------------------------------------------
+    # Truncated lists
+    # ------------------------------------------------------------------
+    async def refill_async(self):
+        """
+        Recompute the truncated lists in a worker thread from a copy of the store
+
+        Changes made meanwhile are applied to the recomputed lists like to
+        every other list; lists truncated again are refilled in a next round.
+        """
+        while self._truncated and self.built:
+            refill = [student_id for student_id in self._truncated if student_id in self.store]
+            ids = list(self.store.ids)
+            rows = np.array([self.store.row_of(student_id) for student_id in refill], dtype=np.intp)
+            strengths, weaknesses = self.store.strengths.copy(), self.store.weaknesses.copy()
+            self._refill_events = []
+            try:
+                lists = await asyncio.to_thread(self._compute_rows, rows, ids, strengths, weaknesses)
+            finally:
+                events, self._refill_events = self._refill_events, None
+            if ("reload", "") not in events:
+                self._merge_refill(lists, events)
+
+    def _merge_refill(self, lists: Dict[str, Tuple[List[str], List[float]]],
+                      events: List[Tuple[str, str]]):
+        """Install refilled lists, then apply the changes made since the copy to them"""
+        store = self.store
+        # Lists re-created or refilled in place meanwhile are newer than ours
+        refilled = {student_id for student_id in lists
+                    if student_id in self._truncated and student_id in store}
+        for student_id in refilled:
+            self._set_list(student_id, *lists[student_id])
+        for event, changed_id in events:
+            # Its score in the refilled lists is stale (or it is gone)
+            for student_id in self._referenced_by.get(changed_id, set()) & refilled:
+                self._drop_match(student_id, changed_id)
+            row = store.row_of(changed_id)
+            if event != "upsert" or row is None:
+                continue
+            targets = [student_id for student_id in refilled if student_id != changed_id]
+            target_rows = np.array([store.row_of(student_id) for student_id in targets], dtype=np.intp)
+            scores = complementary_scores(store.strengths[row], store.weaknesses[row],
+                                          store.strengths[target_rows], store.weaknesses[target_rows])
+            for student_id, score in zip(targets, scores):
+                if score > self._threshold(student_id):
+                    self._insert_match(student_id, changed_id, float(score))
+
+    def _refill(self, student_ids: Set[str]):
+        """Refill truncated lists: in place when few, else in the background"""
+        rows = [self.store.row_of(student_id) for student_id in student_ids & self._truncated]
+        rows = np.array([row for row in rows if row is not None], dtype=np.intp)
+        if not len(rows):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or len(rows) <= SYNC_REFILL_LISTS:
+            self._recompute(rows)
+        elif self._refill_task is None or self._refill_task.done():
+            self._refill_task = loop.create_task(self.refill_async())
+            self._refill_task.add_done_callback(self._on_refill_done)
+
+    @staticmethod
+    def _on_refill_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Refilling match table lists failed: {task.exception()!r}")
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+    def _threshold(self, student_id: str) -> float:
+        if student_id not in self._lists:
+            # Attached but not yet added: its whole list is computed when it is
+            return np.inf
+        match_ids, match_scores = self._lists[student_id]
+        if student_id in self._truncated:
+            # Only a match above the last one keeps the list exact
+            return match_scores[-1] if match_scores else np.inf
+        if len(match_ids) < self.k:
+            # Short but not truncated: the list holds every other student
+            return -np.inf
+        return match_scores[-1]
+
+    def _refresh_thresholds(self):
+        """Align the thresholds with the store rows (full pass only when dirty)"""
+        ids = self.store.ids
+        if self._thresholds_dirty or len(self._thresholds) > len(ids):
+            self._thresholds = np.array([self._threshold(student_id) for student_id in ids],
+                                        dtype=np.float32)
+            self._thresholds_dirty = False
+        elif len(self._thresholds) < len(ids):
+            # Profiles appended since
+            added = [self._threshold(student_id) for student_id in ids[len(self._thresholds):]]
+            self._thresholds = np.concatenate([self._thresholds, np.array(added, dtype=np.float32)])
+
+    def _update_threshold(self, student_id: str):
+        row = self.store.row_of(student_id)
+        if not self._thresholds_dirty and row is not None and row < len(self._thresholds):
+            self._thresholds[row] = self._threshold(student_id)
+
+    def _drop_threshold_row(self):
+        """Mirror the store's swap-with-last removal in the row-aligned thresholds"""
+        row = self.store.removed_row
+        if self._thresholds_dirty or row is None or len(self._thresholds) != len(self.store) + 1:
+            self._thresholds_dirty = True
+            return
+        self._thresholds[row] = self._thresholds[-1]
+        self._thresholds = self._thresholds[:-1]
+
+    def _insert_match(self, student_id: str, match_id: str, score: float):
+        """Insert one match into a list, keeping it sorted and at most K long"""
+        match_ids, match_scores = self._lists[student_id]
+        position = bisect.bisect_right([-s for s in match_scores], -score)
+        match_ids.insert(position, match_id)
+        match_scores.insert(position, score)
+        self._referenced_by.setdefault(match_id, set()).add(student_id)
+        if len(match_ids) > self.k:
+            dropped = match_ids.pop()
+            match_scores.pop()
+            self._referenced_by.get(dropped, set()).discard(student_id)
+        if len(match_ids) >= self.k:
+            self._truncated.discard(student_id)
+        self._update_threshold(student_id)
+
+    def _drop_match(self, student_id: str, match_id: str):
+        """Remove one match from a list; a full list becomes truncated"""
+        match_ids, match_scores = self._lists[student_id]
+        position = match_ids.index(match_id)
+        del match_ids[position]
+        del match_scores[position]
+        self._referenced_by.get(match_id, set()).discard(student_id)
+        if len(match_ids) + 1 >= self.k:
+            self._truncated.add(student_id)
+        self._update_threshold(student_id)
+
+    def _add(self, student_id: str):
+        row = self.store.row_of(student_id)
+        strengths, weaknesses = self.store.strengths, self.store.weaknesses
+        scores = complementary_scores(strengths[row], weaknesses[row], strengths, weaknesses)
+        scores[row] = -np.inf
+
+        # The newcomer's own list
+        best = top_k_rows(scores, min(self.k, len(scores) - 1))
+        ids = self.store.ids
+        self._set_list(student_id, [ids[j] for j in best], [float(scores[j]) for j in best])
+
+        # Symmetric score: enter every list whose current K-th score it beats
+        self._refresh_thresholds()
+        self._thresholds[row] = self._threshold(student_id)
+        already_listed = self._referenced_by.get(student_id, set())
+        for j in np.nonzero(scores > self._thresholds)[0]:
+            if ids[j] in already_listed:
+                continue
+            self._insert_match(ids[j], student_id, float(scores[j]))
+
+    def _remove(self, student_id: str):
+        old = self._lists.pop(student_id, None)
+        self._truncated.discard(student_id)
+        if old is not None:
+            for match_id in old[0]:
+                self._referenced_by.get(match_id, set()).discard(student_id)
+        affected = self._referenced_by.pop(student_id, set())
+        for listed_by in affected:
+            if listed_by in self._lists:
+                self._drop_match(listed_by, student_id)
+        self._refill(affected)
+
+    def _apply(self, event: str, student_id: str):
+        if event == "remove":
+            self._remove(student_id)
+        elif event == "upsert":
+            if self.store.row_of(student_id) is None:
+                # Removed again since (replay of a change made during a build)
+                return
+            if student_id in self._lists:
+                # Changed embeddings: drop the stale scores everywhere first
+                self._remove(student_id)
+            self._add(student_id)
+
+    def _on_store_change(self, event: str, student_id: str):
+        if event == "attach":
+            # Re-score only the removed, added and changed profiles, unless
+            # so many changed that a rebuild is cheaper
+            changes = self.store.attach_changes
+            events = [("remove", i) for i in changes.removed] + [("upsert", i) for i in changes.upserted]
+            if not self.built or len(events) > INCREMENTAL_ATTACH_FRACTION * len(self.store):
+                event, events = "reload", [("reload", "")]
+        else:
+            events = [(event, student_id)]
+        if self._pending is not None:
+            self._pending.extend(events)
+        if self._refill_events is not None:
+            self._refill_events.extend(events)
+        if event == "reload":
+            # The lists refer to the previous contents: answer nothing until rebuilt
+            self.built = False
+            self._lists, self._referenced_by, self._truncated = {}, {}, set()
+            self.schedule_build()
+        elif self.built:
+            if event == "attach":
+                # Rows moved: the per-row thresholds are realigned once, below
+                self._thresholds_dirty = True
+            elif event == "remove":
+                self._drop_threshold_row()
+            for change in events:
+                self._apply(*change)
+            if event == "attach":
+                self._refresh_thresholds()
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def lookup(self, student_id: str,
+               top_k: int = 3) -> Optional[List[Tuple[str, str, float, str, str]]]:
+        """
+        Precomputed equivalent of ``find_best_matches``
+
+        Returns:
+            List of tuples: (student_id, name, score, strengths, weaknesses),
+            or None if the table cannot answer (not built, or top_k > k)
+        """
+        if not self.built or top_k > self.k or student_id not in self._lists:
+            return None
+        match_ids, match_scores = self._lists[student_id]
+        if student_id in self._truncated and len(match_ids) < top_k:
+            # Cut short by a removal and not refilled yet
+            return None
+        matches = []
+        for match_id, score in zip(match_ids[:max(top_k, 0)], match_scores):
+            profile = self.store.get_profile(match_id)
+            matches.append((match_id, profile['name'], score,
+                            profile['strengths'], profile['weaknesses']))
+        return matches
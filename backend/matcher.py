@@ -3,15 +3,18 @@ NLP and Matching Logic for Peer Learning Matcher
 Uses Sentence Transformers for semantic embeddings and cosine similarity for matching.
 """
 
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+import asyncio
 import logging
 import os
+import re
+
+from inference import InferencePool
+from embedding_cache import EmbeddingCache
+from onnx_encoder import ONNX_FILES, OnnxEncoder
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -19,22 +22,84 @@ class EmbeddingService:
     """
     Singleton service for generating text embeddings using Sentence Transformers.
     Uses cached model from backend/model_cache for faster cold starts (no download needed).
+
+    The ``aembed_*`` coroutines run inference in an ``InferencePool`` so async
+    handlers never block the event loop on ``model.encode``. With an
+    ``EmbeddingCache`` attached, repeated texts skip the transformer entirely.
+
+    Inference backends (``backend``):
+    - ``"torch"``: SentenceTransformer on PyTorch (default)
+    - ``"onnx"`` / ``"onnx-int8"``: the exported model on onnxruntime, fp32
+      or int8 dynamically quantized (see ``onnx_encoder.py``)
+
+    Embedding modes:
+    - ``"sentence"``: encode each text as a whole (default)
+    - ``"skills"``: split comma-separated skill lists, embed every skill once
+      (cached) and pool the skill vectors into the profile vector; free text
+      falls back to sentence encoding
     """
-    _model = None
+    MODEL_NAME = 'all-MiniLM-L6-v2'
+    DIM = 384  # all-MiniLM-L6-v2 produces 384-dim vectors
+    BACKENDS = ("torch",) + tuple(ONNX_FILES)
+    _models: Dict[str, object] = {}
+
+    def __init__(self, pool: Optional[InferencePool] = None,
+                 cache: Optional[EmbeddingCache] = None,
+                 mode: str = "sentence", pooling: str = "weighted",
+                 backend: str = "torch"):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {backend}")
+        if mode not in ("sentence", "skills"):
+            raise ValueError(f"Unknown embedding mode: {mode}")
+        if pooling not in ("mean", "weighted"):
+            raise ValueError(f"Unknown skill pooling: {pooling}")
+        self.pool = pool
+        self.cache = cache
+        self.mode = mode
+        self.pooling = pooling
+        self.backend = backend
+
+    @property
+    def cache_namespace(self) -> str:
+        """Model identity for cache keys (backends produce slightly different vectors)"""
+        return f"{self.MODEL_NAME}:{self.backend}"
     
     def get_model(self):
         """Get or initialize the Sentence Transformer model from cache"""
-        if self._model is None:
-            # Use preloaded model from cache to avoid download on cold start
-            cache_folder = os.path.join(os.path.dirname(__file__), 'model_cache')
-            logger.info(f"Loading Sentence Transformer model from cache: {cache_folder}")
-            
-            self._model = SentenceTransformer(
-                'all-MiniLM-L6-v2',
-                cache_folder=cache_folder
-            )
+        model = EmbeddingService._models.get(self.backend)
+        if model is None:
+            if self.backend == "torch":
+                # Imported here so ONNX deployments never load torch
+                from sentence_transformers import SentenceTransformer
+
+                # Use preloaded model from cache to avoid download on cold start
+                cache_folder = os.path.join(os.path.dirname(__file__), 'model_cache')
+                logger.info(f"Loading Sentence Transformer model from cache: {cache_folder}")
+
+                model = SentenceTransformer(
+                    self.MODEL_NAME,
+                    cache_folder=cache_folder
+                )
+            else:
+                model = OnnxEncoder(self.backend)
+            EmbeddingService._models[self.backend] = model
             logger.info("Model loaded successfully from cache!")
-        return self._model
+        return model
+    
+    def warm_up(self):
+        """Load the model and run one throwaway encode (first-inference cost)"""
+        self._encode(["warm-up"], batch_size=1)
+
+    async def awarm_up(self):
+        """Warm the model wherever inference runs (every process-pool worker)"""
+        if self.pool is None:
+            self.warm_up()
+        elif self.pool.kind == "process":
+            await asyncio.gather(*[
+                self.pool.run(_warm_up_in_worker, self.backend) for _ in range(self.pool.workers)
+            ])
+        else:
+            await self.pool.run(self.warm_up)
     
     def embed_text(self, text: str) -> List[float]:
         """
@@ -46,13 +111,176 @@ class EmbeddingService:
         Returns:
             List of floats representing the embedding vector
         """
-        if not text or not text.strip():
-            # Return zero vector for empty text
-            return [0.0] * 384  # all-MiniLM-L6-v2 produces 384-dim vectors
-        
+        return self.embed_batch([text], batch_size=1)[0]
+
+    def embed_batch(self, texts: List[str], batch_size: int = 64) -> List[List[float]]:
+        """
+        Generate embedding vectors for many texts with a single encode call
+
+        Args:
+            texts: Input texts to embed
+            batch_size: Number of texts the model processes per forward pass
+
+        Returns:
+            One embedding (list of floats) per input text, in input order
+        """
+        units, plan = self._plan(texts)
+        vectors, missing = self._lookup(units)
+        if missing:
+            self._fill(vectors, units, missing, self._encode(missing, batch_size))
+        return self._compose(plan, vectors)
+
+    def lookup_cached(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Embeddings for texts if every one is cached (or empty), else None"""
+        units, plan = self._plan(texts)
+        if self.cache is None or self._lookup(units, record=False)[1]:
+            return None
+        vectors, _ = self._lookup(units)
+        return self._compose(plan, vectors)
+
+    def _plan(self, texts: List[str]) -> Tuple[List[str], List[List[Tuple[int, float]]]]:
+        """
+        Map input texts to the units that are actually encoded
+
+        In sentence mode every text is its own unit. In skills mode a skill
+        list becomes one unit per skill, shared across all texts of the batch.
+
+        Returns:
+            (units to embed, per text a list of (unit index, pooling weight))
+        """
+        if self.mode == "sentence":
+            return list(texts), [[(i, 1.0)] for i in range(len(texts))]
+
+        units: Dict[str, int] = {}
+        plan = []
+        for text in texts:
+            parts = split_skills(text) or [text]
+            entry = []
+            for part in parts:
+                index = units.setdefault(part, len(units))
+                # Weighted pooling approximates the token-level mean pooling of
+                # a full-sentence encode: longer skills contribute more
+                weight = float(len(part.split())) if self.pooling == "weighted" else 1.0
+                entry.append((index, weight))
+            plan.append(entry)
+        return list(units), plan
+
+    @staticmethod
+    def _compose(plan: List[List[Tuple[int, float]]],
+                 vectors: List[np.ndarray]) -> List[List[float]]:
+        """Pool unit vectors per text and renormalize to unit length"""
+        embeddings = []
+        for entry in plan:
+            if len(entry) == 1:
+                embeddings.append(vectors[entry[0][0]].tolist())
+                continue
+            pooled = sum(weight * vectors[index] for index, weight in entry)
+            norm = np.linalg.norm(pooled)
+            embeddings.append((pooled / norm if norm > 0 else pooled).tolist())
+        return embeddings
+
+    def _lookup(self, texts: List[str], record: bool = True,
+                disk: bool = True) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+        """
+        Resolve empty and cached texts
+
+        With ``disk=False`` only the memory tier of the cache is consulted.
+
+        Returns:
+            (per-text vectors with None for misses, unique texts to encode)
+        """
+        vectors: List[Optional[np.ndarray]] = []
+        missing: Dict[str, None] = {}
+        for text in texts:
+            if self.cache is not None:
+                vector = self.cache.get(text, record=record, disk=disk)
+            elif not text or not text.strip():
+                # Return zero vector for empty text
+                vector = np.zeros(self.DIM, dtype=np.float32)
+            else:
+                vector = None
+            if vector is None:
+                missing[text.strip()] = None
+            vectors.append(vector)
+        return vectors, list(missing)
+
+    def _fill(self, vectors: List[Optional[np.ndarray]], texts: List[str],
+              missing: List[str], encoded: np.ndarray):
+        """Put freshly encoded vectors into the cache and the result slots"""
+        by_text = {}
+        for text, vector in zip(missing, encoded):
+            by_text[text] = self.cache.put(text, vector) if self.cache is not None else vector
+        for i, text in enumerate(texts):
+            if vectors[i] is None:
+                vectors[i] = by_text[text.strip()]
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Run the transformer on non-empty, stripped texts"""
         model = self.get_model()
-        embedding = model.encode(text.strip(), convert_to_numpy=True)
-        return embedding.tolist()
+        return model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+    async def aembed_text(self, text: str) -> List[float]:
+        """Async ``embed_text``; raises EmbeddingBusyError when the pool is full"""
+        return (await self.aembed_batch([text], batch_size=1))[0]
+
+    async def aembed_batch(self, texts: List[str], batch_size: int = 64) -> List[List[float]]:
+        """Async ``embed_batch``; raises EmbeddingBusyError when the pool is full
+
+        Memory-tier lookups happen on the event loop; the persistent tier is
+        read in a thread, and only texts missing from both are sent to the
+        inference pool.
+        """
+        units, plan = self._plan(texts)
+        vectors, missing = self._lookup(units, disk=False)
+        if missing and self.cache is not None and self.cache.persistent:
+            persisted = await asyncio.to_thread(self.cache.load_persisted, missing)
+            for i, text in enumerate(units):
+                if vectors[i] is None:
+                    vectors[i] = persisted.get(text.strip())
+            missing = [text for text in missing if text not in persisted]
+        if missing:
+            if self.pool is None:
+                encoded = self._encode(missing, batch_size)
+            elif self.pool.kind == "process":
+                encoded = await self.pool.run(_encode_in_worker, missing, batch_size, self.backend)
+            else:
+                encoded = await self.pool.run(self._encode, missing, batch_size)
+            self._fill(vectors, units, missing, encoded)
+        return self._compose(plan, vectors)
+
+
+# Delimiters between skills in a strengths/weaknesses list
+SKILL_DELIMITERS = re.compile(r"\s*(?:[,;|/\n]|\s&\s)\s*")
+# Pieces longer than this (or text with sentence punctuation) are free text
+MAX_SKILL_WORDS = 4
+
+
+def split_skills(text: str) -> Optional[List[str]]:
+    """
+    Split a delimited skill list into individual skills
+
+    Args:
+        text: Strengths or weaknesses text, e.g. "Calculus, Physics"
+
+    Returns:
+        List of at least two skills, or None if the text is empty, a single
+        skill, or free text that should be encoded as a whole sentence
+    """
+    if not text or not text.strip() or re.search(r"[.!?]", text):
+        return None
+    skills = [part for part in SKILL_DELIMITERS.split(text.strip()) if part]
+    if len(skills) < 2 or any(len(skill.split()) > MAX_SKILL_WORDS for skill in skills):
+        return None
+    return skills
+
+
+def _warm_up_in_worker(backend: str):
+    EmbeddingService(backend=backend).warm_up()
+
+
+def _encode_in_worker(texts: List[str], batch_size: int, backend: str) -> np.ndarray:
+    """Process-pool entry point: each worker process loads its own model copy once"""
+    return EmbeddingService(backend=backend)._encode(texts, batch_size)
 
 
 def cosine_sim(vec1: List[float], vec2: List[float]) -> float:
@@ -77,6 +305,11 @@ def cosine_sim(vec1: List[float], vec2: List[float]) -> float:
     return float(similarity)
 
 
+def _is_empty(embedding) -> bool:
+    """True for None or zero-length embeddings (works for lists and NumPy rows)"""
+    return embedding is None or len(embedding) == 0
+
+
 def complementary_score(profile_a: Dict, profile_b: Dict) -> float:
     """
     Calculate complementary matching score between two student profiles
@@ -103,11 +336,11 @@ def complementary_score(profile_a: Dict, profile_b: Dict) -> float:
             logger.error(f"Profile {profile_b.get('id', 'UNKNOWN')} missing field: {field}")
             return 0.0
     
-    # Validate embeddings are not None and are lists/arrays
-    if not profile_a['strengths_emb'] or not profile_a['weaknesses_emb']:
+    # Validate embeddings are not None and are non-empty lists/arrays
+    if _is_empty(profile_a['strengths_emb']) or _is_empty(profile_a['weaknesses_emb']):
         logger.error(f"Profile {profile_a.get('id', 'UNKNOWN')} has null embeddings")
         return 0.0
-    if not profile_b['strengths_emb'] or not profile_b['weaknesses_emb']:
+    if _is_empty(profile_b['strengths_emb']) or _is_empty(profile_b['weaknesses_emb']):
         logger.error(f"Profile {profile_b.get('id', 'UNKNOWN')} has null embeddings")
         return 0.0
     
@@ -166,3 +399,206 @@ def find_best_matches(
     # Sort by score (descending) and return top K
     scores.sort(key=lambda x: x[2], reverse=True)
     return scores[:top_k]
+
+
+def complementary_scores(
+    target_strengths: np.ndarray,
+    target_weaknesses: np.ndarray,
+    strengths: np.ndarray,
+    weaknesses: np.ndarray
+) -> np.ndarray:
+    """
+    Vectorized ``complementary_score`` of one student against many candidates
+
+    All inputs must already be L2-normalized, so each direction of the score is
+    a single matrix-vector product.
+
+    Args:
+        target_strengths: Target student's strengths vector, shape (dim,)
+        target_weaknesses: Target student's weaknesses vector, shape (dim,)
+        strengths: Candidates' strengths matrix, shape (n, dim)
+        weaknesses: Candidates' weaknesses matrix, shape (n, dim)
+
+    Returns:
+        Array of n scores clipped to [0, 1]
+    """
+    # A's strengths help B's weaknesses, B's strengths help A's weaknesses
+    scores = weaknesses @ target_strengths
+    scores += strengths @ target_weaknesses
+    scores /= 2.0
+    return np.clip(scores, 0.0, 1.0, out=scores)
+
+
+def complementary_score_matrix(
+    strengths_a: np.ndarray,
+    weaknesses_a: np.ndarray,
+    strengths_b: np.ndarray,
+    weaknesses_b: np.ndarray
+) -> np.ndarray:
+    """
+    Vectorized ``complementary_score`` of every row of A against every row of B
+
+    Args:
+        strengths_a, weaknesses_a: Normalized matrices of group A, shape (m, dim)
+        strengths_b, weaknesses_b: Normalized matrices of group B, shape (n, dim)
+
+    Returns:
+        (m, n) array of scores clipped to [0, 1]
+    """
+    scores = weaknesses_a @ strengths_b.T
+    scores += strengths_a @ weaknesses_b.T
+    scores /= 2.0
+    return np.clip(scores, 0.0, 1.0, out=scores)
+
+
+def top_k_rows(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the ``top_k`` highest scores, best first
+
+    Uses ``np.argpartition`` so only the selected rows are sorted. Ties keep
+    ascending row order, like the stable sort in ``find_best_matches``.
+    """
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if top_k < len(scores):
+        rows = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        rows = np.arange(len(scores))
+    return rows[np.lexsort((rows, -scores[rows]))]
+
+
+def find_best_matches_vectorized(
+    student_id: str,
+    store,
+    top_k: int = 3,
+    candidates: Optional[np.ndarray] = None
+) -> List[Tuple[str, str, float, str, str]]:
+    """
+    Batched equivalent of ``find_best_matches`` over an ``EmbeddingStore``
+
+    Args:
+        student_id: ID of the target student
+        store: EmbeddingStore holding normalized embedding matrices
+        top_k: Number of top matches to return
+        candidates: Optional boolean mask over the store rows; only these rows
+            are scored (e.g. from ``AttributeIndex.candidate_mask``)
+
+    Returns:
+        List of tuples: (student_id, name, score, strengths, weaknesses)
+    """
+    row = store.row_of(student_id)
+    if row is None:
+        return []
+    return find_best_matches_for_embeddings(
+        store.strengths[row], store.weaknesses[row], store, top_k, candidates, skip_row=row
+    )
+
+
+# Candidate masks selecting more than this share of the rows are scored in
+# full (non-candidates set to -inf) instead of gathering the rows into copies
+DENSE_MASK_FRACTION = 0.25
+
+
+def find_best_matches_for_embeddings(
+    strengths_emb: np.ndarray,
+    weaknesses_emb: np.ndarray,
+    store,
+    top_k: int = 3,
+    candidates: Optional[np.ndarray] = None,
+    skip_row: Optional[int] = None
+) -> List[Tuple[str, str, float, str, str]]:
+    """
+    Best matches in an ``EmbeddingStore`` for a pair of embeddings
+
+    The target does not have to be stored, which allows "what-if" queries for
+    a profile that was never created.
+
+    Args:
+        strengths_emb: Normalized strengths embedding of the target, shape (dim,)
+        weaknesses_emb: Normalized weaknesses embedding of the target, shape (dim,)
+        store: EmbeddingStore holding normalized embedding matrices
+        top_k: Number of top matches to return
+        candidates: Optional boolean mask over the store rows to score
+        skip_row: Store row never returned (the target's own row)
+
+    Returns:
+        List of tuples: (student_id, name, score, strengths, weaknesses)
+    """
+    strengths, weaknesses = store.strengths, store.weaknesses
+    if candidates is None:
+        rows = None
+        scores = complementary_scores(strengths_emb, weaknesses_emb, strengths, weaknesses)
+        if skip_row is not None:
+            scores[skip_row] = -np.inf
+        limit = min(top_k, len(scores) - (skip_row is not None))
+    else:
+        candidates = candidates.copy()
+        if skip_row is not None:
+            candidates[skip_row] = False
+        count = int(np.count_nonzero(candidates))
+        if count > DENSE_MASK_FRACTION * len(candidates):
+            rows = None
+            scores = complementary_scores(strengths_emb, weaknesses_emb, strengths, weaknesses)
+            scores[~candidates] = -np.inf
+        else:
+            rows = np.flatnonzero(candidates)
+            scores = complementary_scores(strengths_emb, weaknesses_emb, strengths[rows], weaknesses[rows])
+        limit = min(top_k, count)
+
+    matches = []
+    for i in top_k_rows(scores, limit):
+        profile = store.profile_at(i if rows is None else rows[i])
+        matches.append((
+            profile['id'],
+            profile['name'],
+            float(scores[i]),
+            profile['strengths'],
+            profile['weaknesses']
+        ))
+    return matches
+
+
+def find_best_matches_batch(
+    student_ids: List[str],
+    store,
+    top_k: int = 3,
+    block_size: int = 256
+) -> Dict[str, List[Tuple[str, str, float, str, str]]]:
+    """
+    ``find_best_matches_vectorized`` for many students with matrix-matrix products
+
+    All targets are scored against the whole store at once (in blocks of
+    ``block_size`` targets, bounding the score matrix to block_size x N).
+
+    Args:
+        student_ids: IDs of the target students; unknown IDs are left out
+        store: EmbeddingStore holding normalized embedding matrices
+        top_k: Number of top matches per student
+        block_size: Targets scored per matrix product
+
+    Returns:
+        Dict of student_id -> list of tuples (student_id, name, score, strengths, weaknesses)
+    """
+    known = [student_id for student_id in dict.fromkeys(student_ids) if student_id in store]
+    strengths, weaknesses = store.strengths, store.weaknesses
+    limit = min(top_k, len(store) - 1)
+    results = {}
+    for start in range(0, len(known), block_size):
+        block = known[start:start + block_size]
+        rows = np.array([store.row_of(student_id) for student_id in block], dtype=np.intp)
+        scores = complementary_score_matrix(strengths[rows], weaknesses[rows], strengths, weaknesses)
+        scores[np.arange(len(rows)), rows] = -np.inf  # Skip self
+        for student_id, row_scores in zip(block, scores):
+            matches = []
+            for i in top_k_rows(row_scores, limit):
+                profile = store.profile_at(i)
+                matches.append((
+                    profile['id'],
+                    profile['name'],
+                    float(row_scores[i]),
+                    profile['strengths'],
+                    profile['weaknesses']
+                ))
+            results[student_id] = matches
+    return results
@@ -0,0 +1,235 @@
+"""
+Lightweight in-process metrics for the Peer Learning Matcher backend.
+
+Histograms, counters and gauges live in a ``MetricsRegistry`` that renders
+them in the Prometheus text exposition format for ``GET /metrics``. Counters
+and gauges can read their value from a callback at scrape time, so existing
+counters (cache hits, store size, ...) are exported without touching the hot
+path.
+
+Per-stage request timing uses ``StageTimer``: one ``perf_counter`` call and
+one histogram update per stage. ``MetricsRegistry.stage_timer`` returns a
+no-op timer when stage timing is disabled.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import bisect
+import math
+import time
+
+# Upper bounds (seconds) of the per-stage latency histograms
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+               for _, value in items)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (cumulative bucket counts, Prometheus-style)
+
+    Args:
+        name: Metric name
+        buckets: Sorted upper bounds; an implicit ``+Inf`` bucket is added
+        labels: Constant labels of this series
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, buckets: Sequence[float], description: str = "",
+                 labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict:
+        """Cumulative counts per upper bound plus count, sum and mean"""
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + [float("inf")], self._counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "buckets": cumulative,
+        }
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(metric name, label string, value) lines of the exposition format"""
+        lines, running = [], 0
+        for bound, count in zip(self.buckets + [math.inf], self._counts):
+            running += count
+            lines.append((f"{self.name}_bucket", _format_labels(self.labels, ("le", _format_value(bound))),
+                          running))
+        lines.append((f"{self.name}_sum", _format_labels(self.labels), self.sum))
+        lines.append((f"{self.name}_count", _format_labels(self.labels), self.count))
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter
+
+    Args:
+        name: Metric name (conventionally ending in ``_total``)
+        description: HELP text
+        labels: Constant labels of this series
+        function: Read the value from this callback at scrape time instead of
+            counting with ``inc`` (for counters kept elsewhere)
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str = "", labels: Optional[Dict[str, str]] = None,
+                 function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.function = function
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self.function() if self.function is not None else self._value
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [(self.name, _format_labels(self.labels), self.value)]
+
+
+class Gauge(Counter):
+    """Value that can go up and down; ``set`` it or give a ``function``"""
+
+    kind = "gauge"
+
+    def set(self, value: float):
+        self._value = value
+
+
+class StageTimer:
+    """
+    Times consecutive stages of one request
+
+    Each ``mark(stage)`` records the time since the previous mark (or since
+    the timer was created) in the stage's histogram.
+    """
+
+    __slots__ = ("_histograms", "_last")
+
+    def __init__(self, histograms: Dict[str, Histogram]):
+        self._histograms = histograms
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self._histograms[stage].observe(now - self._last)
+        self._last = now
+
+    def skip(self):
+        """Restart the clock without recording (e.g. after an untimed step)"""
+        self._last = time.perf_counter()
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+    def skip(self):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together for ``/metrics``
+
+    Args:
+        prefix: Prepended to every metric name
+        stage_timing: Record per-stage request histograms (``stage_timer``)
+    """
+
+    def __init__(self, prefix: str = "", stage_timing: bool = True):
+        self.prefix = prefix
+        self.stage_timing = stage_timing
+        self._metrics: List = []
+        self._stages: Dict[str, Dict[str, Histogram]] = {}
+
+    def register(self, metric):
+        """Add an existing metric (its name is prefixed here)"""
+        metric.name = self.prefix + metric.name
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, buckets: Sequence[float], description: str = "",
+                  labels: Optional[Dict[str, str]] = None) -> Histogram:
+        return self.register(Histogram(name, buckets, description, labels))
+
+    def counter(self, name: str, description: str = "", labels: Optional[Dict[str, str]] = None,
+                function: Optional[Callable[[], float]] = None) -> Counter:
+        return self.register(Counter(name, description, labels, function))
+
+    def gauge(self, name: str, description: str = "", labels: Optional[Dict[str, str]] = None,
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, description, labels, function))
+
+    def define_stages(self, endpoint: str, stages: Sequence[str]):
+        """Create the ``request_stage_seconds`` histograms of an endpoint's stages"""
+        self._stages[endpoint] = {
+            stage: self.histogram(
+                "request_stage_seconds", STAGE_BUCKETS,
+                "Time spent in each stage of a request handler",
+                {"endpoint": endpoint, "stage": stage},
+            )
+            for stage in stages
+        }
+
+    def stage_timer(self, endpoint: str):
+        """A ``StageTimer`` for one request, or a no-op timer when stage timing is off"""
+        if not self.stage_timing:
+            return NULL_TIMER
+        return StageTimer(self._stages[endpoint])
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        by_name: Dict[str, List] = {}
+        for metric in self._metrics:
+            by_name.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, metrics in by_name.items():
+            lines.append(f"# HELP {name} {metrics[0].description}")
+            lines.append(f"# TYPE {name} {metrics[0].kind}")
+            for metric in metrics:
+                for sample_name, labels, value in metric.samples():
+                    lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,76 @@
+"""
+Migrate stored embeddings from BSON double arrays to packed binary.
+
+Rewrites ``strengths_emb``/``weaknesses_emb`` of every profile still stored as
+a list of floats into the binary format of ``embedding_codec``. Documents that
+are already binary are left alone, so the script is safe to re-run (and to
+run while the API is serving, since readers accept both formats).
+
+Usage (from the backend directory, with MONGODB_URL set)::
+
+    python migrate_embeddings.py --dry-run
+    python migrate_embeddings.py --batch-size 500
+    python migrate_embeddings.py --to-list     # roll back to lists
+"""
+
+import argparse
+import asyncio
+
+from pymongo import UpdateOne
+
+from database import get_db
+from embedding_codec import decode_embedding, encode_embedding
+
+FIELDS = ("strengths_emb", "weaknesses_emb")
+
+
+async def migrate(batch_size: int, dry_run: bool, to_list: bool) -> int:
+    collection = get_db()["profiles"]
+    # Legacy documents hold arrays; migrated ones hold binData
+    source_type = "binData" if to_list else "array"
+    query = {"$or": [{field: {"$type": source_type}} for field in FIELDS]}
+    projection = {field: 1 for field in FIELDS}
+
+    total = await collection.count_documents(query)
+    print(f"{total} profiles to convert to {'lists' if to_list else 'binary'}")
+    if dry_run or total == 0:
+        return 0
+
+    converted = 0
+    updates = []
+    async for doc in collection.find(query, projection):
+        changes = {}
+        for field in FIELDS:
+            value = doc.get(field)
+            if value is None or len(value) == 0:
+                continue
+            vector = decode_embedding(value)
+            changes[field] = vector.tolist() if to_list else encode_embedding(vector)
+        if changes:
+            updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+
+        if len(updates) >= batch_size:
+            await collection.bulk_write(updates, ordered=False)
+            converted += len(updates)
+            updates = []
+            print(f"  converted {converted}/{total}")
+
+    if updates:
+        await collection.bulk_write(updates, ordered=False)
+        converted += len(updates)
+    print(f"Converted {converted} profiles")
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored embeddings to packed binary")
+    parser.add_argument("--batch-size", type=int, default=500, help="Updates per bulk_write")
+    parser.add_argument("--dry-run", action="store_true", help="Only count documents to convert")
+    parser.add_argument("--to-list", action="store_true",
+                        help="Reverse migration: binary back to lists of floats")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size, args.dry_run, args.to_list))
+
+
+if __name__ == "__main__":
+    main()
@@ -26,3 +26,35 @@ class MatchResult(BaseModel):
     score: float
     strengths: str
     weaknesses: str
+
+
+class PairingRequest(BaseModel):
+    """Input schema for cohort-wide pairing / group formation"""
+    student_ids: Optional[List[str]] = Field(None, description="Students to assign (default: every profile)")
+    group_size: int = Field(2, ge=2, description="Target group size (2 = one-to-one pairs)")
+    method: str = Field("auto", description="auto, exact (pairs only, requires networkx) or approximate")
+    time_limit_ms: Optional[int] = Field(None, ge=0, description="Time budget of the approximate search (capped by the server)")
+
+
+class PairingGroup(BaseModel):
+    """Schema for one formed pair or group"""
+    student_ids: List[str]
+    names: List[str]
+    score: float
+
+
+class MatchBatchRequest(BaseModel):
+    """Input schema for matching many students in one request"""
+    student_ids: List[str] = Field(..., min_length=1, description="Students to find matches for")
+    top_k: int = Field(3, ge=1, description="Number of matches per student")
+
+
+class MatchQuery(BaseModel):
+    """Input schema for a "what-if" match of a profile that is not stored"""
+    strengths: Optional[str] = Field(None, description="Subjects or topics the student excels at")
+    weaknesses: Optional[str] = Field(None, description="Subjects or topics the student needs help with")
+    strengths_emb: Optional[List[float]] = Field(None, description="Precomputed strengths embedding (instead of text)")
+    weaknesses_emb: Optional[List[float]] = Field(None, description="Precomputed weaknesses embedding (instead of text)")
+    top_k: int = Field(3, ge=1, description="Number of matches to return")
+    preference: List[str] = Field([], description="Preference terms every match must have")
+    exclude: List[str] = Field([], description="Student IDs to leave out")
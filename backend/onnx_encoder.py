@@ -0,0 +1,173 @@
+"""
+ONNX Runtime inference backend for the sentence encoder.
+
+Runs all-MiniLM-L6-v2 exported to ONNX (optionally int8 dynamically quantized)
+through onnxruntime, reproducing the SentenceTransformer pipeline of the model:
+Transformer -> mean pooling over the attention mask -> L2 normalization.
+PyTorch is only needed once, to export the model:
+
+    python onnx_encoder.py export            # writes model.onnx and model.int8.onnx
+
+Requires the optional packages ``onnxruntime`` and ``tokenizers`` at runtime;
+the export additionally needs torch and sentence-transformers.
+"""
+
+from typing import List, Union
+import argparse
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE = os.path.join(os.path.dirname(__file__), 'model_cache')
+ONNX_MODEL_DIR = os.path.join(MODEL_CACHE, 'onnx')
+MAX_SEQ_LENGTH = 256  # from the model's sentence_bert_config.json
+
+# Backend name -> ONNX file inside the model directory
+ONNX_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model.int8.onnx",
+}
+
+
+class OnnxEncoder:
+    """
+    Drop-in replacement for ``SentenceTransformer.encode`` backed by onnxruntime
+
+    Args:
+        backend: ``"onnx"`` (fp32) or ``"onnx-int8"`` (dynamically quantized)
+        model_dir: Directory holding the exported model and ``tokenizer.json``
+        threads: onnxruntime intra-op threads (None lets onnxruntime decide)
+    """
+
+    def __init__(self, backend: str = "onnx", model_dir: str = ONNX_MODEL_DIR,
+                 threads: int = None):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                f"Embedding backend '{backend}' requires onnxruntime and tokenizers "
+                "(pip install onnxruntime tokenizers)"
+            ) from e
+
+        model_path = os.path.join(model_dir, ONNX_FILES[backend])
+        if not os.path.exists(model_path):
+            raise RuntimeError(
+                f"ONNX model not found at {model_path}. Export it with: python onnx_encoder.py export"
+            )
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        logger.info(f"Loaded {backend} encoder from {model_path}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 384
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """
+        Encode sentences into normalized embeddings
+
+        Args:
+            sentences: A sentence or list of sentences
+            batch_size: Sentences per onnxruntime call
+
+        Returns:
+            float32 array of shape (n, 384), or (384,) for a single sentence
+        """
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(sentences[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+            # Mean pooling over real (non-padding) tokens, then L2 normalization
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            batches.append((pooled / np.clip(norms, 1e-12, None)).astype(np.float32))
+
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 384), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def export(model_dir: str = ONNX_MODEL_DIR, quantize: bool = True, opset: int = 14):
+    """
+    Export the cached PyTorch model to ONNX (and an int8 dynamically quantized copy)
+
+    Args:
+        model_dir: Output directory for the model files and ``tokenizer.json``
+        quantize: Also write ``model.int8.onnx``
+        opset: ONNX opset version
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(model_dir, exist_ok=True)
+    model = SentenceTransformer('all-MiniLM-L6-v2', cache_folder=MODEL_CACHE, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    dummy = tokenizer(["export the encoder", "to onnx"], padding=True, return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    output_names = ["last_hidden_state", "pooler_output"]
+    fp32_path = os.path.join(model_dir, ONNX_FILES["onnx"])
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes={
+                **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+                "pooler_output": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+    tokenizer.backend_tokenizer.save(os.path.join(model_dir, "tokenizer.json"))
+    print(f"Exported {fp32_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(model_dir, ONNX_FILES["onnx-int8"])
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Quantized {int8_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX export of the sentence encoder")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export model.onnx (and model.int8.onnx)")
+    export_parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    export_parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 model")
+    export_parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.model_dir, quantize=not args.no_quantize, opset=args.opset)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Cohort-wide pairing and group formation.
+
+Where ``/match`` answers "who suits this student", this module assigns a whole
+cohort at once, maximizing the total complementary score inside the groups
+(for pairs, the sum of the pair scores):
+
+- ``exact``: maximum-weight matching via the optional ``networkx`` package,
+  for pairs of small cohorts
+- ``approximate``: greedy group construction followed by a member-swap local
+  search (2-opt for pairs) that runs until no swap improves the total or the
+  time budget is spent
+
+Both work on the dense float32 score matrix of the cohort (N x N x 4 bytes,
+100 MB for 5000 students), computed with ``complementary_score_matrix`` in
+row blocks so the products need no second N x N temporary. Every student is placed: when the cohort size
+is not a multiple of the group size, the leftover students join the groups
+they add the most to, at most one per group (e.g. one trio in an odd cohort of
+pairs). Leftovers outnumbering the groups form one smaller group instead.
+"""
+
+from collections import Counter
+from typing import List, Optional, Tuple
+import logging
+import time
+
+import numpy as np
+
+from matcher import complementary_score_matrix
+
+# networkx is optional; without it pairs are always formed approximately
+try:
+    import networkx as nx
+except ImportError:
+    nx = None
+
+logger = logging.getLogger(__name__)
+
+PAIRING_METHODS = ("auto", "exact", "approximate")
+
+# Memory of the temporary products per score block (on top of the N x N result)
+SCORE_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def cohort_scores(strengths: np.ndarray, weaknesses: np.ndarray,
+                  block_bytes: int = SCORE_BLOCK_BYTES) -> np.ndarray:
+    """Pairwise complementary scores of a cohort, with a zero diagonal"""
+    n = len(strengths)
+    scores = np.empty((n, n), dtype=np.float32)
+    # Each block holds two (rows x n) products
+    step = max(1, block_bytes // (2 * 4 * max(n, 1)))
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        scores[start:stop] = complementary_score_matrix(strengths[start:stop], weaknesses[start:stop],
+                                                        strengths, weaknesses)
+    np.fill_diagonal(scores, 0.0)
+    return scores
+
+
+def group_total(scores: np.ndarray, members: List[int]) -> float:
+    """Sum of the pairwise scores inside one group"""
+    block = scores[np.ix_(members, members)]
+    return float(block.sum()) / 2.0
+
+
+def _attach_leftovers(scores: np.ndarray, groups: List[List[int]], leftovers: List[int]):
+    """
+    Place the leftover students, at most one per group
+
+    Repeatedly adds the (leftover, group) pair with the highest gain; a group
+    that received a student takes no other. If there are more leftovers than
+    groups, they form a group of their own.
+    """
+    if not leftovers:
+        return
+    if len(leftovers) > len(groups):
+        groups.append(list(leftovers))
+        return
+    gains = np.array([[scores[student, members].sum() for members in groups] for student in leftovers])
+    for _ in leftovers:
+        i, g = np.unravel_index(int(np.argmax(gains)), gains.shape)
+        groups[g].append(leftovers[i])
+        gains[i, :] = -np.inf
+        gains[:, g] = -np.inf
+
+
+def exact_pairs(scores: np.ndarray) -> List[List[int]]:
+    """Maximum-weight one-to-one pairing (networkx blossom algorithm)"""
+    n = len(scores)
+    graph = nx.Graph()
+    rows, cols = np.triu_indices(n, 1)
+    graph.add_weighted_edges_from(zip(rows.tolist(), cols.tolist(), scores[rows, cols].tolist()))
+    matching = nx.max_weight_matching(graph, maxcardinality=True)
+    groups = [sorted(pair) for pair in matching]
+    paired = {student for pair in groups for student in pair}
+    _attach_leftovers(scores, groups, [i for i in range(n) if i not in paired])
+    return groups
+
+
+def greedy_groups(scores: np.ndarray, group_size: int) -> List[List[int]]:
+    """
+    Build groups one at a time: seed with the unplaced student whose best
+    partner scores highest, then repeatedly add the unplaced student that adds
+    the most to the group
+    """
+    n = len(scores)
+    placed = np.zeros(n, dtype=bool)
+    seeds = np.argsort(-scores.max(axis=1), kind="stable")
+    groups = []
+    for _ in range(n // group_size):
+        seed = int(seeds[np.argmax(~placed[seeds])])
+        members = [seed]
+        placed[seed] = True
+        gain = scores[seed].copy()
+        while len(members) < group_size:
+            gain[placed] = -np.inf
+            student = int(np.argmax(gain))
+            members.append(student)
+            placed[student] = True
+            gain += scores[student]
+        groups.append(members)
+    _attach_leftovers(scores, groups, np.nonzero(~placed)[0].tolist())
+    return groups
+
+
+def improve_groups(scores: np.ndarray, groups: List[List[int]],
+                   deadline: Optional[float] = None, seed: int = 0) -> List[List[int]]:
+    """
+    Member-swap local search: swap two students of different groups whenever
+    that raises the total score. Each step evaluates all swap partners of one
+    student in O(N * group_size).
+
+    Args:
+        scores: Cohort score matrix with a zero diagonal
+        groups: Initial groups (lists of row indices), modified in place
+        deadline: ``time.perf_counter()`` value to stop at (None: run to a local optimum)
+        seed: Seed of the student visiting order
+
+    Returns:
+        The improved groups
+    """
+    n = len(scores)
+    if len(groups) < 2:
+        return groups
+    labels = np.empty(n, dtype=np.intp)
+    for g, members in enumerate(groups):
+        labels[members] = g
+    # Score of every student with the rest of its own group
+    own = np.array([scores[i, groups[labels[i]]].sum() for i in range(n)])
+    rng = np.random.default_rng(seed)
+
+    improved = True
+    while improved:
+        improved = False
+        for x in rng.permutation(n):
+            if deadline is not None and time.perf_counter() > deadline:
+                return groups
+            a = labels[x]
+            # Score of x with each group, and of every student with x's group
+            x_to_group = np.bincount(labels, weights=scores[x], minlength=len(groups))
+            to_a = scores[:, groups[a]].sum(axis=1)
+            # Swapping x (in A) with y (in B): y joins A minus x, x joins B minus y
+            gains = (to_a - scores[:, x]) - own[x] + (x_to_group[labels] - scores[x]) - own
+            gains[labels == a] = -np.inf
+            y = int(np.argmax(gains))
+            if gains[y] <= 1e-9:
+                continue
+            b = labels[y]
+            groups[a][groups[a].index(x)] = y
+            groups[b][groups[b].index(y)] = x
+            labels[x], labels[y] = b, a
+            for g in (a, b):
+                for member in groups[g]:
+                    own[member] = scores[member, groups[g]].sum()
+            improved = True
+    return groups
+
+
+def form_groups(
+    strengths: np.ndarray,
+    weaknesses: np.ndarray,
+    group_size: int = 2,
+    method: str = "auto",
+    time_limit: float = 2.0,
+    exact_max: int = 100,
+) -> Tuple[List[List[int]], List[float], str]:
+    """
+    Partition a cohort into groups maximizing the total complementary score
+
+    Args:
+        strengths: Normalized strengths matrix of the cohort, shape (n, dim)
+        weaknesses: Normalized weaknesses matrix of the cohort, shape (n, dim)
+        group_size: Target group size (2 = pairs)
+        method: "auto", "exact" or "approximate"; "auto" is exact for pairs of
+            at most ``exact_max`` students when networkx is installed
+        time_limit: Seconds the approximate local search may run
+        exact_max: Largest cohort "auto" solves exactly
+
+    Returns:
+        Tuple of (groups as lists of row indices, total score of each group,
+        method actually used)
+
+    Raises:
+        ValueError: If the method is unknown or cannot be applied
+    """
+    if method not in PAIRING_METHODS:
+        raise ValueError(f"Unknown pairing method '{method}', expected one of {PAIRING_METHODS}")
+    n = len(strengths)
+    if n < group_size:
+        raise ValueError(f"Need at least {group_size} students to form a group")
+    if method == "exact":
+        if group_size != 2:
+            raise ValueError("Exact assignment is only available for pairs (group_size=2)")
+        if nx is None:
+            raise ValueError("Exact pairing requires networkx (pip install networkx)")
+    if method == "auto":
+        exact = group_size == 2 and nx is not None and n <= exact_max
+        method = "exact" if exact else "approximate"
+
+    start = time.perf_counter()
+    scores = cohort_scores(strengths, weaknesses)
+    if method == "exact":
+        groups = exact_pairs(scores)
+    else:
+        groups = improve_groups(scores, greedy_groups(scores, group_size),
+                                deadline=start + time_limit)
+
+    totals = [group_total(scores, members) for members in groups]
+    sizes = Counter(len(members) for members in groups)
+    logger.info(f"Formed {len(groups)} groups "
+                f"({', '.join(f'{count} of {size}' for size, count in sorted(sizes.items()))}) from {n} students "
+                f"({method}, {time.perf_counter() - start:.2f}s, total score {sum(totals):.4f})")
+    return groups, totals, method
@@ -0,0 +1,270 @@
+"""
+Embedding matrices shared by all worker processes of one machine.
+
+With ``uvicorn --workers N`` every worker would otherwise load the whole
+collection from MongoDB and hold its own copy of the embedding matrices. With
+``SharedMatrix`` one worker, the *leader* (whoever holds an exclusive lock on
+``leader.lock``), keeps the store in sync with MongoDB and publishes it as a
+numbered *generation* in a shared directory:
+
+    gen-00000007.snap    snapshot file (see ``snapshot.py``) with spare rows
+    manifest.json        current generation, swapped with os.replace
+
+The other workers memory-map the current generation copy-on-write, so all of
+them share one copy of the matrices in the page cache; a worker's own writes
+(e.g. the profile it just created) only privatize the touched pages, and are
+re-applied on top of each attached generation until one reflects them. When
+the leader exits, one of the followers takes the lock, reloads from MongoDB
+and continues publishing.
+
+Requires ``fcntl`` (Linux/macOS); elsewhere ``SharedMatrix.supported`` is
+False and workers keep private stores.
+"""
+
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import time
+
+from embedding_store import EmbeddingStore
+from snapshot import capacity_for, copy_store, restore_store, write_snapshot
+
+# fcntl is POSIX-only; without it sharing is disabled
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+LOCK_FILE = "leader.lock"
+
+
+class SharedMatrix:
+    """
+    Publishes (leader) or attaches (followers) an EmbeddingStore's matrices
+
+    Args:
+        directory: Shared directory on the local machine (e.g. under /dev/shm)
+        store: The worker's EmbeddingStore
+        publish_interval: Minimum seconds between two generations
+        check_interval: Seconds between manifest checks / leadership attempts
+        headroom: Spare rows published, as a fraction of the live rows, so
+            followers can add profiles without copying the whole matrix
+        keep_generations: Older generations kept on disk for slow attachers
+        high_water: Returns the time up to which the leader's store reflects
+            MongoDB (stored with each generation; followers drop their local
+            writes once a generation covers them)
+    """
+
+    supported = fcntl is not None
+
+    def __init__(self, directory: str, store: EmbeddingStore, publish_interval: float = 5.0,
+                 check_interval: float = 1.0, headroom: float = 0.25, keep_generations: int = 2,
+                 high_water: Optional[Callable[[], Optional[datetime]]] = None):
+        self.directory = directory
+        self.store = store
+        self.publish_interval = publish_interval
+        self.check_interval = check_interval
+        self.headroom = headroom
+        self.keep_generations = keep_generations
+        self.high_water = high_water
+        self.is_leader = False
+        self.generation = 0
+        self._published_version: Optional[int] = None
+        self._last_publish = 0.0
+        self._lock_fd = None
+        self._task: Optional[asyncio.Task] = None
+        # Follower writes not yet seen in a generation: id -> (written at, profile or None if removed)
+        self._local: Dict[str, Tuple[datetime, Optional[Dict]]] = {}
+        self._replaying = False
+        store.add_listener(self._on_store_change)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _generation_file(generation: int) -> str:
+        return f"gen-{generation:08d}.snap"
+
+    def read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self._path(MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # ------------------------------------------------------------------
+    # Leadership
+    # ------------------------------------------------------------------
+    def try_lead(self) -> bool:
+        """Take the leader lock if it is free; the lock lasts for the process lifetime"""
+        if self.is_leader:
+            return True
+        fd = os.open(self._path(LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self.is_leader = True
+        # The leader reloads from MongoDB, which has every local write
+        self._local.clear()
+        manifest = self.read_manifest()
+        self.generation = manifest["generation"] if manifest else 0
+        logger.info(f"Worker {os.getpid()} is the shared matrix leader")
+        return True
+
+    # ------------------------------------------------------------------
+    # Publishing (leader)
+    # ------------------------------------------------------------------
+    def _write_generation(self, generation: int, contents, high_water: Optional[datetime], capacity: int):
+        filename = self._generation_file(generation)
+        write_snapshot(self._path(filename), *contents, high_water, capacity=capacity)
+
+        manifest = {"generation": generation, "file": filename, "published_at": time.time()}
+        tmp_path = self._path(f"{MANIFEST}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._path(MANIFEST))
+
+        # Attached followers keep their mappings of unlinked files
+        for name in os.listdir(self.directory):
+            if name.startswith("gen-") and int(name[4:12]) <= generation - self.keep_generations:
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+
+    async def publish(self):
+        """Write the store as a new generation and point the manifest at it"""
+        store = self.store
+        version = store.version
+        high_water = self.high_water() if self.high_water is not None else None
+        # Snapshot on the event loop so the file is consistent, write off it
+        contents = copy_store(store)
+        generation = self.generation + 1
+        start = time.perf_counter()
+        await asyncio.to_thread(self._write_generation, generation, contents, high_water,
+                                capacity_for(len(store), self.headroom))
+        self.generation = generation
+        self._published_version = version
+        self._last_publish = time.monotonic()
+        logger.info(f"Published shared matrix generation {generation} ({len(contents[0])} profiles) "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    # ------------------------------------------------------------------
+    # Attaching (followers)
+    # ------------------------------------------------------------------
+    def _on_store_change(self, event: str, student_id: str):
+        """Remember a follower's own writes, which the next generation may lack"""
+        if self.is_leader or self._replaying or event not in ("upsert", "remove"):
+            return
+        profile = None
+        if event == "upsert":
+            store = self.store
+            row = store.row_of(student_id)
+            profile = dict(store.profile_at(row), strengths_emb=store.strengths[row].copy(),
+                           weaknesses_emb=store.weaknesses[row].copy())
+        # Naive UTC, like snapshot high-water marks; taken after the MongoDB write
+        self._local[student_id] = (datetime.now(timezone.utc).replace(tzinfo=None), profile)
+
+    def _reapply_local(self, high_water: Optional[datetime]):
+        """Re-apply local writes the attached generation does not reflect yet"""
+        store = self.store
+        self._replaying = True
+        try:
+            for student_id, (written_at, profile) in list(self._local.items()):
+                if profile is None:
+                    reflected = student_id not in store
+                else:
+                    reflected = store.is_current(profile)
+                if reflected or (high_water is not None and high_water >= written_at):
+                    # In the generation, or superseded by a later write the leader synced
+                    del self._local[student_id]
+                elif profile is None:
+                    store.remove(student_id)
+                else:
+                    store.upsert(profile)
+        finally:
+            self._replaying = False
+
+    def attach(self) -> bool:
+        """Map the manifest's generation into the store if it is newer than ours"""
+        manifest = self.read_manifest()
+        if manifest is None or manifest["generation"] <= self.generation:
+            return False
+        try:
+            # Copy-on-write: reads share the page cache, local writes stay private
+            header = restore_store(self.store, self._path(manifest["file"]))
+        except FileNotFoundError:
+            # Superseded while we read the manifest; the next check picks up the new one
+            return False
+        self.generation = manifest["generation"]
+        pending = len(self._local)
+        self._reapply_local(header.high_water)
+        logger.info(f"Attached shared matrix generation {self.generation} ({header.rows} profiles, "
+                    f"{len(self._local)}/{pending} local writes re-applied)")
+        return True
+
+    async def wait_for_generation(self, timeout: float) -> bool:
+        """Attach the first available generation, waiting up to ``timeout`` seconds"""
+        deadline = time.monotonic() + timeout
+        while not self.attach():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(min(self.check_interval, 0.2))
+        return True
+
+    # ------------------------------------------------------------------
+    # Background loop
+    # ------------------------------------------------------------------
+    async def _run(self, on_promote: Callable[[], Awaitable[None]]):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                if self.is_leader:
+                    if (self.store.version != self._published_version
+                            and time.monotonic() - self._last_publish >= self.publish_interval):
+                        await self.publish()
+                elif self.try_lead():
+                    await on_promote()
+                    await self.publish()
+                else:
+                    self.attach()
+            except Exception as e:
+                logger.error(f"Shared matrix update failed: {e}")
+
+    def start(self, on_promote: Callable[[], Awaitable[None]]):
+        """
+        Keep publishing (leader) or attaching new generations (followers)
+
+        Args:
+            on_promote: Coroutine run when a follower becomes the leader, before
+                its first publish (e.g. reload from MongoDB and start syncing)
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(on_promote))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            self.is_leader = False
+
+    def stats(self) -> Dict:
+        return {"role": "leader" if self.is_leader else "follower", "generation": self.generation,
+                "pending_local_writes": len(self._local)}
@@ -0,0 +1,296 @@
+"""
+Snapshot files of the embedding store for fast cold starts.
+
+Loading every profile from MongoDB on startup is the slowest part of a cold
+start. A snapshot holds the whole store in one memory-mappable file:
+
+    offset 0    header (HEADER struct, 96 bytes)
+                  magic b"EMBSNAP\\0", format version, dtype code (1 = float32 LE),
+                  dim, rows, capacity, high-water mark (ms since the epoch, UTC),
+                  creation time, table offset/length, matrix offset, CRC32 of
+                  the live matrix rows
+    table       UTF-8 JSON {"ids": [...], "profiles": [...]}, one entry per row
+    (padding to a 64-byte boundary)
+    matrices    strengths then weaknesses, each float32 (capacity, dim);
+                rows [rows, capacity) are spare zero rows for later inserts
+
+Loading maps the matrices copy-on-write, so it takes milliseconds whatever the
+roster size. The high-water mark is the time the snapshot was taken: after
+loading, only profiles whose ``updated_at`` is newer (and the id set, for
+deletions) are read back from MongoDB (see ``ProfileSync.catch_up``).
+
+CLI (from the backend directory)::
+
+    python snapshot.py build --out store.snap     # from MongoDB (MONGODB_URL)
+    python snapshot.py inspect store.snap
+    python snapshot.py verify store.snap
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+MAGIC = b"EMBSNAP\0"
+VERSION = 1
+DTYPE_FLOAT32 = 1
+HEADER = struct.Struct("<8sHBxIQQqdQQQI20x")
+ALIGNMENT = 64
+
+
+class SnapshotHeader(NamedTuple):
+    dim: int
+    rows: int
+    capacity: int
+    high_water: Optional[datetime]
+    created_at: float
+    table_offset: int
+    table_length: int
+    matrix_offset: int
+    checksum: int
+
+
+def _to_millis(value: Optional[datetime]) -> int:
+    if value is None:
+        return -1
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def _from_millis(value: int) -> Optional[datetime]:
+    # Naive UTC, like the datetimes Motor returns
+    if value < 0:
+        return None
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _checksum(strengths: np.ndarray, weaknesses: np.ndarray) -> int:
+    crc = zlib.crc32(np.ascontiguousarray(strengths, dtype="<f4").data)
+    return zlib.crc32(np.ascontiguousarray(weaknesses, dtype="<f4").data, crc)
+
+
+def write_snapshot(path: str, ids: List[str], profiles: List[Dict], strengths: np.ndarray,
+                   weaknesses: np.ndarray, high_water: Optional[datetime] = None,
+                   capacity: Optional[int] = None):
+    """
+    Write a snapshot atomically (temporary file + os.replace)
+
+    Args:
+        path: Destination file
+        ids: Student id of each row
+        profiles: Profile fields of each row
+        strengths: Normalized strengths of the live rows, shape (rows, dim)
+        weaknesses: Normalized weaknesses of the live rows, shape (rows, dim)
+        high_water: Time up to which the snapshot reflects MongoDB
+        capacity: Rows allocated in the file (default: exactly the live rows)
+    """
+    rows, dim = strengths.shape
+    capacity = max(capacity or rows, rows, 1)
+    table = json.dumps({"ids": ids, "profiles": profiles}).encode("utf-8")
+    table_offset = HEADER.size
+    matrix_offset = -(-(table_offset + len(table)) // ALIGNMENT) * ALIGNMENT
+    header = HEADER.pack(
+        MAGIC, VERSION, DTYPE_FLOAT32, dim, rows, capacity, _to_millis(high_water),
+        time.time(), table_offset, len(table), matrix_offset, _checksum(strengths, weaknesses),
+    )
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(table)
+        f.write(b"\0" * (matrix_offset - table_offset - len(table)))
+        spare = np.zeros((capacity - rows, dim), dtype="<f4").tobytes()
+        for matrix in (strengths, weaknesses):
+            f.write(np.ascontiguousarray(matrix, dtype="<f4").tobytes())
+            f.write(spare)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_header(path: str) -> SnapshotHeader:
+    """
+    Read and validate a snapshot header
+
+    Raises:
+        ValueError: If the file is not a snapshot of a supported version or has the wrong size
+    """
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError(f"{path} is too short to be a snapshot")
+    (magic, version, dtype_code, dim, rows, capacity, high_water, created_at,
+     table_offset, table_length, matrix_offset, checksum) = HEADER.unpack(raw)
+    if magic != MAGIC or version != VERSION or dtype_code != DTYPE_FLOAT32:
+        raise ValueError(f"{path} is not a supported snapshot (magic={magic!r}, version={version})")
+    try:
+        high_water = _from_millis(high_water)
+    except (OverflowError, OSError) as e:
+        raise ValueError(f"{path} has an invalid high-water mark: {e}") from e
+    header = SnapshotHeader(dim, rows, capacity, high_water, created_at,
+                            table_offset, table_length, matrix_offset, checksum)
+    expected_size = matrix_offset + 2 * capacity * dim * 4
+    if os.path.getsize(path) != expected_size:
+        raise ValueError(f"{path} has the wrong size ({os.path.getsize(path)} bytes, expected {expected_size})")
+    return header
+
+
+def load_snapshot(path: str, mmap_mode: str = "c") -> Tuple[SnapshotHeader, List[str], List[Dict],
+                                                            np.ndarray, np.ndarray]:
+    """
+    Map a snapshot
+
+    Args:
+        path: Snapshot file
+        mmap_mode: "c" (copy-on-write, default) or "r" (read-only)
+
+    Returns:
+        Tuple of (header, ids, profiles, strengths, weaknesses); the matrices
+        have ``capacity`` rows
+
+    Raises:
+        ValueError: If the header or the id table is invalid (any parse error)
+    """
+    header = read_header(path)
+    with open(path, "rb") as f:
+        f.seek(header.table_offset)
+        raw_table = f.read(header.table_length)
+    try:
+        table = json.loads(raw_table.decode("utf-8"))
+        ids, profiles = table["ids"], table["profiles"]
+        valid = (len(ids) == len(profiles) == header.rows
+                 and all(isinstance(profile, dict) and profile.get("id") == student_id
+                         for student_id, profile in zip(ids, profiles)))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"{path}: unreadable id table ({e!r})") from e
+    if not valid:
+        raise ValueError(f"{path}: id table does not match the header rows")
+    if header.matrix_offset < header.table_offset + header.table_length or header.rows > header.capacity:
+        raise ValueError(f"{path}: inconsistent header offsets")
+    shape = (header.capacity, header.dim)
+    strengths = np.memmap(path, dtype="<f4", mode=mmap_mode, offset=header.matrix_offset, shape=shape)
+    weaknesses = np.memmap(path, dtype="<f4", mode=mmap_mode,
+                           offset=header.matrix_offset + header.capacity * header.dim * 4, shape=shape)
+    return header, ids, profiles, strengths, weaknesses
+
+
+def verify_snapshot(path: str) -> List[str]:
+    """Check checksum, id uniqueness and row norms; returns the problems found"""
+    header, ids, profiles, strengths, weaknesses = load_snapshot(path, mmap_mode="r")
+    problems = []
+    if _checksum(strengths[:header.rows], weaknesses[:header.rows]) != header.checksum:
+        problems.append("matrix checksum mismatch")
+    if len(set(ids)) != len(ids):
+        problems.append(f"{len(ids) - len(set(ids))} duplicate ids")
+    for name, matrix in (("strengths", strengths), ("weaknesses", weaknesses)):
+        norms = np.linalg.norm(matrix[:header.rows], axis=1)
+        bad = int(np.sum((np.abs(norms - 1) > 1e-3) & (norms > 0)))
+        if bad:
+            problems.append(f"{bad} {name} rows are not unit length")
+    return problems
+
+
+def capacity_for(rows: int, headroom: float = 0.25) -> int:
+    """Rows to allocate for ``rows`` live profiles plus spare rows for inserts"""
+    return rows + max(int(rows * headroom), 64)
+
+
+def copy_store(store: EmbeddingStore) -> Tuple[List[str], List[Dict], np.ndarray, np.ndarray]:
+    """
+    Consistent copy of a store's contents, safe to write from another thread
+
+    Returns:
+        Tuple of (ids, profiles, strengths, weaknesses) of the live rows
+    """
+    rows = len(store)
+    return (list(store.ids), [store.profile_at(row) for row in range(rows)],
+            store.strengths.copy(), store.weaknesses.copy())
+
+
+def save_store(store: EmbeddingStore, path: str, high_water: Optional[datetime] = None,
+               headroom: float = 0.25):
+    """Write a store to a snapshot file"""
+    write_snapshot(path, *copy_store(store), high_water, capacity=capacity_for(len(store), headroom))
+
+
+def restore_store(store: EmbeddingStore, path: str) -> SnapshotHeader:
+    """
+    Attach a snapshot to a store (copy-on-write mapping)
+
+    Returns:
+        The snapshot header; ``high_water`` tells from when to replay changes
+
+    Raises:
+        ValueError: If the file is invalid or its dimension differs from the store's
+    """
+    header, ids, profiles, strengths, weaknesses = load_snapshot(path)
+    if header.dim != store.dim:
+        raise ValueError(f"Snapshot dimension {header.dim} != store dimension {store.dim}")
+    store.attach(ids, profiles, strengths, weaknesses)
+    return header
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+async def _build(path: str):
+    from database import get_db
+
+    store = EmbeddingStore()
+    # Taken before reading, so changes made during the load are replayed later
+    high_water = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    await store.load(get_db()["profiles"])
+    save_store(store, path, high_water)
+    print(f"Wrote {len(store)} profiles to {path} in {time.perf_counter() - start:.1f}s")
+
+
+def _inspect(path: str):
+    header = read_header(path)
+    _, ids, _, _, _ = load_snapshot(path, mmap_mode="r")
+    print(f"file:        {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"rows:        {header.rows} (capacity {header.capacity}, dim {header.dim})")
+    print(f"high water:  {header.high_water.isoformat() if header.high_water else 'none'}")
+    print(f"created:     {datetime.fromtimestamp(header.created_at, tz=timezone.utc).isoformat()}")
+    print(f"checksum:    {header.checksum:08x}")
+    print(f"first ids:   {ids[:5]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, inspect or verify embedding store snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Write a snapshot of the MongoDB profiles")
+    build.add_argument("--out", required=True, help="Snapshot file to write")
+    commands.add_parser("inspect", help="Print a snapshot header").add_argument("path")
+    commands.add_parser("verify", help="Check a snapshot's integrity").add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        asyncio.run(_build(args.out))
+    elif args.command == "inspect":
+        _inspect(args.path)
+    else:
+        try:
+            problems = verify_snapshot(args.path)
+        except ValueError as e:
+            problems = [str(e)]
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"✅ {args.path} is valid")
+
+
+if __name__ == "__main__":
+    main()
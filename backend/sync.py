@@ -0,0 +1,390 @@
+"""
+Keeps a worker's in-memory ``EmbeddingStore`` in step with MongoDB.
+
+Each uvicorn worker (or instance) holds its own store, so profiles created or
+deleted through one worker must reach the others. ``ProfileSync`` follows the
+``profiles`` collection in one of two ways:
+
+- ``change_stream``: tails a MongoDB change stream (replica sets / Atlas).
+  The resume token is persisted, so a restarted worker continues where it
+  stopped instead of missing changes
+- ``poll``: for standalone servers and test doubles without change streams.
+  Re-reads documents whose ``updated_at`` is newer than the last seen one, and
+  periodically diffs the id sets to catch deletions
+
+A change stream opened without a resume token starts at the cluster time
+captured by ``mark_start`` before the store was loaded, so writes landing
+between the load and the stream opening are replayed rather than lost.
+
+``auto`` tries the change stream and falls back to polling. Applying a change
+is idempotent: documents equal to what the store already holds (e.g. the echo
+of this worker's own write) are skipped.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from bson import json_util
+from pymongo.errors import OperationFailure, PyMongoError
+
+from embedding_store import EmbeddingStore
+
+# fcntl is POSIX-only; without it the state file is not guarded against other workers
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SYNC_MODES = ("auto", "change_stream", "poll", "off")
+
+# Server error codes: change streams unsupported (standalone), resume point gone
+CHANGE_STREAM_UNSUPPORTED = 40573
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# Re-read this far behind the high-water mark to tolerate clock skew between writers
+POLL_OVERLAP = timedelta(seconds=5)
+
+
+class ProfileSync:
+    """
+    Applies inserts, updates and deletes of the profiles collection to a store
+
+    Args:
+        collection: Motor collection holding the profiles
+        store: EmbeddingStore to keep in sync
+        mode: "auto", "change_stream", "poll" or "off"
+        state_path: JSON file persisting the resume token / high-water mark
+            (None: start from "now" on every restart). Only the worker holding
+            the lock on ``<state_path>.lock`` writes it
+        poll_interval: Seconds between polls in poll mode
+        reconcile_interval: Seconds between id-set diffs in poll mode
+        save_interval: Minimum seconds between writes of the state file
+    """
+
+    def __init__(self, collection, store: EmbeddingStore, mode: str = "auto",
+                 state_path: Optional[str] = None, poll_interval: float = 2.0,
+                 reconcile_interval: float = 60.0, save_interval: float = 1.0):
+        if mode not in SYNC_MODES:
+            raise ValueError(f"Unknown sync mode '{mode}', expected one of {SYNC_MODES}")
+        self.collection = collection
+        self.store = store
+        self.mode = mode
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.reconcile_interval = reconcile_interval
+        self.save_interval = save_interval
+        self.active_mode: Optional[str] = None
+        self.applied = 0
+        self._resume_token = None
+        self._start_at = None
+        self._high_water = None
+        self._object_ids: Dict = {}
+        self._rejected: Set[str] = set()
+        self._last_save = 0.0
+        self._state_lock_fd = None
+        self._task: Optional[asyncio.Task] = None
+        self._load_state()
+
+    # ------------------------------------------------------------------
+    # Persisted state
+    # ------------------------------------------------------------------
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json_util.loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable sync state {self.state_path}: {e}")
+            return
+        self._resume_token = state.get("resume_token")
+        self._high_water = state.get("high_water")
+
+    def _claim_state(self) -> bool:
+        """Take the state file's lock so no other worker writes it (kept until stop)"""
+        if self._state_lock_fd is not None or fcntl is None:
+            return True
+        fd = os.open(f"{self.state_path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._state_lock_fd = fd
+        return True
+
+    def _release_state(self):
+        if self._state_lock_fd is not None:
+            os.close(self._state_lock_fd)
+            self._state_lock_fd = None
+
+    @property
+    def owns_state(self) -> bool:
+        return bool(self.state_path) and (fcntl is None or self._state_lock_fd is not None)
+
+    def save_state(self, force: bool = False):
+        """Write the resume token and high-water mark (atomically, throttled)"""
+        if not self.owns_state or (not force and time.monotonic() - self._last_save < self.save_interval):
+            return
+        state = {"resume_token": self._resume_token, "high_water": self._high_water}
+        # Unique temp file: never shared with another writer before the rename
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.state_path)}.",
+                                        suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json_util.dumps(state))
+            os.replace(tmp_path, self.state_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._last_save = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Applying changes
+    # ------------------------------------------------------------------
+    def _apply_upsert(self, doc: Dict):
+        student_id = doc.get("id")
+        if student_id is None:
+            return
+        self._object_ids[doc["_id"]] = student_id
+        self.advance_high_water(doc.get("updated_at"))
+        if self.store.is_current(doc):
+            return
+        if self.store.upsert(doc):
+            self._rejected.discard(student_id)
+            self.applied += 1
+        else:
+            self._rejected.add(student_id)
+
+    def _apply_delete(self, student_id: Optional[str]):
+        if student_id is not None and self.store.remove(student_id):
+            self.applied += 1
+
+    async def _apply_change(self, change: Dict):
+        operation = change.get("operationType")
+        if operation in ("insert", "replace", "update"):
+            # updateLookup returns None if the document is already gone again
+            if change.get("fullDocument") is not None:
+                self._apply_upsert(change["fullDocument"])
+        elif operation == "delete":
+            # Delete events only carry _id
+            object_id = change["documentKey"]["_id"]
+            if object_id in self._object_ids:
+                self._apply_delete(self._object_ids.pop(object_id))
+            else:
+                # A document we never mapped (e.g. created and deleted while
+                # loading): find out what is gone by diffing the id sets
+                await self._reconcile()
+        elif operation in ("drop", "dropDatabase", "invalidate"):
+            logger.warning(f"Profiles collection {operation}; sync restarts from scratch")
+            raise _Resync()
+
+    async def load(self):
+        """Load the whole store, mapping ``_id`` -> ``id`` in the same pass"""
+        self._object_ids = {}
+        return await self.store.load(self.collection, object_ids=self._object_ids)
+
+    async def _index_object_ids(self):
+        self._object_ids = {}
+        async for doc in self.collection.find({}, {"_id": 1, "id": 1}):
+            if "id" in doc:
+                self._object_ids[doc["_id"]] = doc["id"]
+
+    async def mark_start(self):
+        """
+        Remember the cluster time before the store is (re)loaded
+
+        Call right before loading. Without a resume token the change stream
+        then starts at this time instead of at the moment it opens.
+        """
+        self._start_at = None
+        if self.mode not in ("auto", "change_stream") or self._resume_token is not None:
+            return
+        try:
+            reply = await self.collection.database.command("ping")
+        except (PyMongoError, NotImplementedError, AttributeError, TypeError) as e:
+            logger.debug(f"No cluster time for the change stream start: {e}")
+            return
+        # Standalone servers report no operationTime (and have no change streams)
+        self._start_at = reply.get("operationTime")
+
+    async def _resync(self):
+        """Full reload, used when the change history can no longer be replayed"""
+        self._resume_token = None
+        await self.mark_start()
+        await self.load()
+        self.save_state(force=True)
+
+    @property
+    def high_water(self) -> Optional[datetime]:
+        """Newest ``updated_at`` the store reflects (naive UTC), if known"""
+        return self._high_water
+
+    def advance_high_water(self, value: Optional[datetime]):
+        """Record that the store reflects every write up to ``value``"""
+        if value is None:
+            return
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        if self._high_water is None or value > self._high_water:
+            self._high_water = value
+
+    async def catch_up(self, since: Optional[datetime]):
+        """
+        Bring a store restored from a snapshot up to date
+
+        Re-reads profiles written after ``since`` (the snapshot's high-water
+        mark) and diffs the id sets to drop profiles deleted meanwhile.
+        """
+        self._high_water = None
+        self.advance_high_water(since)
+        await self._poll_changes()
+        await self._reconcile()
+
+    # ------------------------------------------------------------------
+    # Change stream
+    # ------------------------------------------------------------------
+    async def _tail_change_stream(self):
+        backoff = 1.0
+        while True:
+            try:
+                start_at = self._start_at if self._resume_token is None else None
+                async with self.collection.watch(
+                    full_document="updateLookup", resume_after=self._resume_token,
+                    start_at_operation_time=start_at,
+                ) as stream:
+                    if self.active_mode is None:
+                        logger.info("Profile sync following the change stream")
+                    self.active_mode = "change_stream"
+                    backoff = 1.0
+                    if self._resume_token is None and start_at is None:
+                        # Nothing to start from: re-read what changed since the load
+                        await self._poll_changes()
+                        await self._reconcile()
+                    async for change in stream:
+                        await self._apply_change(change)
+                        self._resume_token = stream.resume_token
+                        self.save_state()
+            except _Resync:
+                await self._resync()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Change stream resume point is gone; reloading all profiles")
+                    await self._resync()
+                elif self.active_mode is None:
+                    raise
+                else:
+                    logger.warning(f"Change stream failed ({e}); reopening in {backoff:.0f}s")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60.0)
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrupted ({e}); reopening in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    # ------------------------------------------------------------------
+    # Polling fallback
+    # ------------------------------------------------------------------
+    async def _poll_changes(self):
+        if self._high_water is None:
+            query = {"updated_at": {"$ne": None}}
+        else:
+            query = {"updated_at": {"$gt": self._high_water - POLL_OVERLAP}}
+        async for doc in self.collection.find(query).sort("updated_at", 1):
+            self._apply_upsert(doc)
+
+    async def _reconcile(self):
+        """Diff the id sets: drop deleted profiles, fetch ones the store lacks"""
+        stored_ids = set()
+        async for doc in self.collection.find({}, {"_id": 1, "id": 1}):
+            if "id" in doc:
+                stored_ids.add(doc["id"])
+                self._object_ids[doc["_id"]] = doc["id"]
+        for student_id in set(self.store.ids) - stored_ids:
+            self._apply_delete(student_id)
+        missing = stored_ids - set(self.store.ids) - self._rejected
+        if missing:
+            async for doc in self.collection.find({"id": {"$in": list(missing)}}):
+                self._apply_upsert(doc)
+
+    async def _poll(self):
+        self.active_mode = "poll"
+        logger.info(f"Profile sync polling every {self.poll_interval:g}s")
+        last_reconcile = time.monotonic()
+        while True:
+            try:
+                await self._poll_changes()
+                if time.monotonic() - last_reconcile >= self.reconcile_interval:
+                    await self._reconcile()
+                    last_reconcile = time.monotonic()
+                self.save_state()
+            except PyMongoError as e:
+                logger.warning(f"Profile sync poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    async def _run(self):
+        if not self._object_ids:
+            # Not filled by load() or a catch-up reconcile
+            await self._index_object_ids()
+        if self.mode in ("auto", "change_stream"):
+            try:
+                await self._tail_change_stream()
+                return
+            except (OperationFailure, NotImplementedError, AttributeError, TypeError) as e:
+                # Test doubles may lack watch() altogether; anything failing
+                # once the stream was open is a real error
+                code = getattr(e, "code", None)
+                if (self.mode == "change_stream" or self.active_mode is not None
+                        or (code is not None and code != CHANGE_STREAM_UNSUPPORTED)):
+                    raise
+                logger.info(f"Change streams unavailable ({e}); falling back to polling")
+        await self._poll()
+
+    def start(self):
+        """Start following the collection in a background task"""
+        if self.mode == "off" or self._task is not None:
+            return
+        if self.state_path and not self._claim_state():
+            logger.info(f"Another worker owns {self.state_path}; this worker does not persist sync state")
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._on_task_done)
+
+    @staticmethod
+    def _on_task_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Profile sync stopped: {task.exception()!r}")
+
+    async def stop(self):
+        """Stop the background task and persist the final state"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self.save_state(force=True)
+        self._release_state()
+
+    def stats(self) -> Dict:
+        return {
+            "mode": self.active_mode or self.mode,
+            "applied_changes": self.applied,
+            "has_resume_token": self._resume_token is not None,
+            "high_water": self._high_water.isoformat() if self._high_water else None,
+        }
+
+
+class _Resync(Exception):
+    """Internal signal: the change stream can no longer be followed"""
@@ -59,19 +59,17 @@ print(f"Current profiles: {current}")
 needed = max(0, 100 - current)
 print(f"\nGenerating {needed} more profiles...")
 
-profiles = []
+profiles = [gen_profile(i) for i in range(current + 1, current + needed + 1)]
 success = 0
 
-for i in range(current + 1, current + needed + 1):
-    profile = gen_profile(i)
-    profiles.append(profile)
-    
+if profiles:
     try:
-        r = requests.post(f"{API_BASE}/profiles", json=profile)
+        r = requests.post(f"{API_BASE}/profiles/bulk", json=profiles)
         if r.status_code == 201:
-            success += 1
-            if success % 10 == 0:
-                print(f"Created {success}/{needed}...")
+            success = r.json()["inserted"]
+            print(f"Created {success}/{needed}...")
+        else:
+            print(f"Error: {r.status_code} {r.text}")
     except Exception as e:
         print(f"Error: {e}")
 
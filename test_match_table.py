@@ -0,0 +1,147 @@
+"""
+Test script to verify the incrementally maintained match table.
+Applies random creates, updates and deletes to a store followed by a
+``MatchTable`` and checks every lookup against ``find_best_matches_vectorized``,
+then checks the settled table against a fresh build. Runs once without an
+event loop (lists refilled in place) and once with one (large refills run in
+worker threads while changes keep coming).
+
+Runs offline: no MongoDB and no model are needed.
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
+
+from embedding_store import EmbeddingStore
+from match_table import MatchTable
+from matcher import find_best_matches_vectorized
+
+DIM = 32
+PROFILES = 200
+STEPS = 300
+K = 20
+TOP_K = (1, 5, 20)
+
+
+class Churn:
+    """Random changes to a store, with fresh ids for creates"""
+
+    def __init__(self, store, seed):
+        self.store = store
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+        self.next_id = 0
+
+    def profile(self, student_id):
+        return {
+            "id": student_id,
+            "name": f"Student {student_id}",
+            "strengths": "Strengths",
+            "weaknesses": "Weaknesses",
+            "strengths_emb": self.rng.standard_normal(DIM),
+            "weaknesses_emb": self.rng.standard_normal(DIM),
+        }
+
+    def create(self):
+        self.next_id += 1
+        assert self.store.upsert(self.profile(f"s{self.next_id:05d}"))
+
+    def step(self):
+        choice = self.random.random()
+        if choice < 0.4 and len(self.store) > K + 2:
+            assert self.store.remove(self.random.choice(self.store.ids))
+        elif choice < 0.6:
+            assert self.store.upsert(self.profile(self.random.choice(self.store.ids)))
+        else:
+            self.create()
+
+
+def assert_lookups_exact(table, store, student_ids):
+    for student_id in student_ids:
+        for top_k in TOP_K:
+            matches = table.lookup(student_id, top_k)
+            if matches is None:
+                # Only a list cut short by a removal may defer to vectorized scoring
+                assert student_id in table._truncated, f"{student_id}: no table answer"
+                continue
+            expected = find_best_matches_vectorized(student_id, store, top_k)
+            assert [m[0] for m in matches] == [m[0] for m in expected], \
+                f"{student_id} top_k={top_k}: {[m[0] for m in matches]} != {[m[0] for m in expected]}"
+            assert np.allclose([m[2] for m in matches], [m[2] for m in expected], atol=1e-5)
+
+
+def assert_settled(table, store):
+    """The maintained table equals a fresh build, thresholds included"""
+    fresh = MatchTable(EmbeddingStore(dim=DIM), k=K)
+    lists, _ = fresh._compute_all(store.ids, store.strengths, store.weaknesses)
+    assert not table._truncated, f"{len(table._truncated)} lists still truncated"
+    assert set(table._lists) == set(lists)
+    for student_id, (match_ids, match_scores) in lists.items():
+        assert table._lists[student_id][0] == match_ids, student_id
+        assert np.allclose(table._lists[student_id][1], match_scores, atol=1e-5), student_id
+    table._refresh_thresholds()
+    expected = [table._threshold(student_id) for student_id in store.ids]
+    assert np.array_equal(table._thresholds, np.array(expected, dtype=np.float32))
+
+
+def test_in_place():
+    store = EmbeddingStore(dim=DIM)
+    churn = Churn(store, seed=1)
+    for _ in range(PROFILES):
+        churn.create()
+    table = MatchTable(store, k=K)
+    table.build()
+    for _ in range(STEPS):
+        churn.step()
+        assert_lookups_exact(table, store, churn.random.sample(store.ids, 5))
+    assert_settled(table, store)
+    print(f"✅ {STEPS} changes without an event loop: lookups exact, table equals a fresh build")
+
+
+async def test_background_refills():
+    store = EmbeddingStore(dim=DIM)
+    churn = Churn(store, seed=2)
+    for _ in range(PROFILES):
+        churn.create()
+    table = MatchTable(store, k=K)
+    await table.build_async()
+    refills = 0
+    for _ in range(STEPS):
+        churn.step()
+        if table._refill_task is not None and not table._refill_task.done():
+            refills += 1
+        assert_lookups_exact(table, store, churn.random.sample(store.ids, 5))
+        # Let refill threads finish (and their results merge) between changes
+        await asyncio.sleep(0.001)
+    while table._refill_task is not None and not table._refill_task.done():
+        await table._refill_task
+    assert refills, "no removal was large enough to refill in the background"
+    assert_settled(table, store)
+    print(f"✅ {STEPS} changes with background refills ({refills} steps with one running): "
+          f"lookups exact, table equals a fresh build")
+
+
+def test_match_table():
+    """Maintain a match table through random changes and compare it with exact scoring"""
+
+    print("=" * 60)
+    print("Match Table Incremental Maintenance Test")
+    print("=" * 60)
+
+    test_in_place()
+    asyncio.run(test_background_refills())
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_match_table()
@@ -1,6 +1,7 @@
 """
 Test script to verify MongoDB embedding storage and retrieval.
-This script tests that embeddings are properly stored as lists and retrieved correctly.
+This script tests that embeddings are properly stored as packed binary and
+decoded back to the original vectors.
 """
 
 import asyncio
@@ -19,6 +20,8 @@ except ImportError:
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
 from matcher import EmbeddingService
+from embedding_codec import decode_embedding, encode_embedding
+import numpy as np
 
 
 async def test_embedding_storage():
@@ -83,8 +86,8 @@ async def test_embedding_storage():
         "name": "Test Student",
         "strengths": test_strength,
         "weaknesses": test_weakness,
-        "strengths_emb": strengths_emb,
-        "weaknesses_emb": weaknesses_emb,
+        "strengths_emb": encode_embedding(strengths_emb),
+        "weaknesses_emb": encode_embedding(weaknesses_emb),
     }
     
     try:
@@ -119,27 +122,29 @@ async def test_embedding_storage():
     retrieved_weaknesses = retrieved["weaknesses_emb"]
     
     print(f"  - Retrieved strength embedding type: {type(retrieved_strengths)}")
-    print(f"  - Retrieved strength embedding length: {len(retrieved_strengths)}")
+    print(f"  - Retrieved strength embedding size: {len(retrieved_strengths)} bytes")
     print(f"  - Retrieved weakness embedding type: {type(retrieved_weaknesses)}")
-    print(f"  - Retrieved weakness embedding length: {len(retrieved_weaknesses)}")
+    print(f"  - Retrieved weakness embedding size: {len(retrieved_weaknesses)} bytes")
     
-    # Verify they're still lists
-    if not isinstance(retrieved_strengths, list):
-        print(f"❌ ERROR: Retrieved strength embedding is {type(retrieved_strengths)}, expected list")
+    # Verify they're stored as binary
+    if not isinstance(retrieved_strengths, bytes):
+        print(f"❌ ERROR: Retrieved strength embedding is {type(retrieved_strengths)}, expected binary")
         return False
-    if not isinstance(retrieved_weaknesses, list):
-        print(f"❌ ERROR: Retrieved weakness embedding is {type(retrieved_weaknesses)}, expected list")
+    if not isinstance(retrieved_weaknesses, bytes):
+        print(f"❌ ERROR: Retrieved weakness embedding is {type(retrieved_weaknesses)}, expected binary")
         return False
     
-    # Verify lengths match
-    if len(retrieved_strengths) != len(strengths_emb):
-        print(f"❌ ERROR: Strength embedding length mismatch: stored {len(strengths_emb)}, retrieved {len(retrieved_strengths)}")
+    # Verify they decode back to the generated vectors
+    decoded_strengths = decode_embedding(retrieved_strengths)
+    decoded_weaknesses = decode_embedding(retrieved_weaknesses)
+    if not np.allclose(decoded_strengths, strengths_emb, atol=1e-6):
+        print(f"❌ ERROR: Decoded strength embedding does not match the stored vector")
         return False
-    if len(retrieved_weaknesses) != len(weaknesses_emb):
-        print(f"❌ ERROR: Weakness embedding length mismatch: stored {len(weaknesses_emb)}, retrieved {len(retrieved_weaknesses)}")
+    if not np.allclose(decoded_weaknesses, weaknesses_emb, atol=1e-6):
+        print(f"❌ ERROR: Decoded weakness embedding does not match the stored vector")
         return False
     
-    print("✅ Embeddings retrieved correctly as lists with correct lengths")
+    print(f"✅ Embeddings decoded correctly with {len(decoded_strengths)} dimensions")
     
     # Clean up
     await collection.delete_many({})
@@ -148,7 +153,7 @@ async def test_embedding_storage():
     print("\n" + "=" * 60)
     print("✅ ALL TESTS PASSED!")
     print("=" * 60)
-    print("\nMongoDB is correctly storing and retrieving embeddings as lists.")
+    print("\nMongoDB is correctly storing and retrieving embeddings as packed binary.")
     print("The backend should now work properly with the fixes applied.")
     
     return True
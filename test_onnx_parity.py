@@ -0,0 +1,103 @@
+"""
+Test script to verify the ONNX embedding backends against PyTorch.
+Encodes every strengths/weaknesses text of the demo profiles with each backend
+and asserts that the cosine drift from the PyTorch embeddings stays within
+bounds and that nearest-neighbour rankings agree with PyTorch.
+
+Export the ONNX models first: cd backend && python onnx_encoder.py export
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
+
+from matcher import EmbeddingService
+
+# Minimum cosine similarity to the PyTorch embedding, per backend
+MIN_COSINE = {
+    "onnx": 0.9999,
+    "onnx-int8": 0.98,
+}
+MIN_MEAN_COSINE = {
+    "onnx": 0.99999,
+    "onnx-int8": 0.99,
+}
+# Neighbours compared per text, and minimum mean share of them in common with PyTorch
+RANK_K = 5
+MIN_RANK_OVERLAP = {
+    "onnx": 0.99,
+    "onnx-int8": 0.90,
+}
+
+
+def parity_texts():
+    """Unique strengths/weaknesses texts from the demo profile files"""
+    root = os.path.dirname(__file__)
+    texts = set()
+    for path in ("demo_profiles.json", os.path.join("demo", "random_profiles.json")):
+        with open(os.path.join(root, path), "r", encoding="utf-8") as f:
+            for profile in json.load(f):
+                for field in ("strengths", "weaknesses"):
+                    value = profile[field]
+                    texts.add(", ".join(value) if isinstance(value, list) else value)
+    return sorted(t for t in texts if t.strip())
+
+
+def nearest_neighbours(embeddings, k=RANK_K):
+    """Indices of each text's k most similar other texts, best first"""
+    similarity = embeddings @ embeddings.T
+    np.fill_diagonal(similarity, -np.inf)
+    return np.argsort(-similarity, axis=1, kind="stable")[:, :k]
+
+
+def rank_overlap(reference, embeddings, k=RANK_K):
+    """Mean share of the k nearest neighbours both embeddings agree on"""
+    expected, actual = nearest_neighbours(reference, k), nearest_neighbours(embeddings, k)
+    return float(np.mean([len(set(e) & set(a)) / k for e, a in zip(expected, actual)]))
+
+
+def test_onnx_parity():
+    """Compare ONNX fp32 and int8 embeddings with PyTorch"""
+
+    print("=" * 60)
+    print("ONNX Embedding Parity Test")
+    print("=" * 60)
+
+    texts = parity_texts()
+    print(f"✅ Loaded {len(texts)} unique texts")
+
+    reference = np.array(EmbeddingService(backend="torch").embed_batch(texts))
+    print("✅ Generated PyTorch reference embeddings")
+
+    for backend, min_cosine in MIN_COSINE.items():
+        print(f"\n📊 Testing backend: {backend}")
+        # Raises RuntimeError when the model has not been exported
+        embeddings = np.array(EmbeddingService(backend=backend).embed_batch(texts))
+
+        # Both sides are unit length, so the row-wise dot product is the cosine
+        cosines = np.sum(reference * embeddings, axis=1)
+        print(f"  - Mean cosine to PyTorch: {cosines.mean():.6f}")
+        print(f"  - Min cosine to PyTorch:  {cosines.min():.6f} ({texts[int(cosines.argmin())]!r})")
+        assert cosines.min() >= min_cosine, \
+            f"{backend}: min cosine {cosines.min():.6f} < {min_cosine} ({texts[int(cosines.argmin())]!r})"
+        assert cosines.mean() >= MIN_MEAN_COSINE[backend], \
+            f"{backend}: mean cosine {cosines.mean():.6f} < {MIN_MEAN_COSINE[backend]}"
+
+        overlap = rank_overlap(reference, embeddings)
+        print(f"  - Top-{RANK_K} neighbour agreement with PyTorch: {overlap:.4f}")
+        assert overlap >= MIN_RANK_OVERLAP[backend], \
+            f"{backend}: top-{RANK_K} neighbour agreement {overlap:.4f} < {MIN_RANK_OVERLAP[backend]}"
+        print(f"✅ {backend} embeddings within bounds")
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_onnx_parity()
@@ -0,0 +1,170 @@
+"""
+Test script to verify ProfileSync replays deletes correctly after a reload.
+Uses an in-memory stand-in for the profiles collection and its change stream:
+a profile deleted between the load and the stream opening, and a delete for a
+document the sync never mapped, must both leave the store.
+
+Runs offline: no MongoDB and no model are needed.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import numpy as np
+from bson import ObjectId
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
+
+from embedding_codec import encode_embedding
+from embedding_store import EmbeddingStore
+from sync import ProfileSync
+
+DIM = 384
+
+
+def make_profile(student_id, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        "_id": ObjectId(),
+        "id": student_id,
+        "name": f"Student {student_id}",
+        "strengths": "Strengths",
+        "weaknesses": "Weaknesses",
+        "strengths_emb": encode_embedding(rng.standard_normal(DIM)),
+        "weaknesses_emb": encode_embedding(rng.standard_normal(DIM)),
+    }
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in list(self.docs):
+            yield doc
+
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = events
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for event in self.events:
+            self.resume_token = event["_id"]
+            yield event
+        # Keep the stream open like a real one
+        await asyncio.sleep(3600)
+
+
+class FakeDatabase:
+    async def command(self, name):
+        return {"ok": 1, "operationTime": 1}
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for ProfileSync"""
+
+    database = FakeDatabase()
+
+    def __init__(self, docs):
+        self.docs = list(docs)
+        self.events = []
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        if "id" in query:
+            wanted = set(query["id"]["$in"])
+            return FakeCursor([d for d in self.docs if d["id"] in wanted])
+        if "updated_at" in query:
+            return FakeCursor([d for d in self.docs if d.get("updated_at") is not None])
+        return FakeCursor(self.docs)
+
+    def watch(self, full_document=None, resume_after=None, start_at_operation_time=None):
+        return FakeStream(self.events)
+
+    def delete(self, doc):
+        self.docs.remove(doc)
+        self.events.append({"_id": {"_data": str(len(self.events))}, "operationType": "delete",
+                            "documentKey": {"_id": doc["_id"]}})
+
+
+async def run_sync(sync):
+    """Follow the change stream until it has nothing left to replay"""
+    sync.start()
+    await asyncio.sleep(0.1)
+    await sync.stop()
+
+
+async def test_profile_sync():
+    """Replay deletes after a reload and check the store follows them"""
+
+    print("=" * 60)
+    print("Profile Sync Replay Test")
+    print("=" * 60)
+
+    a, b, c = make_profile("a", 1), make_profile("b", 2), make_profile("c", 3)
+    collection = FakeCollection([a, b, c])
+    store = EmbeddingStore(dim=DIM)
+    sync = ProfileSync(collection, store)
+    await sync.mark_start()
+    await sync.load()
+    assert sorted(store.ids) == ["a", "b", "c"]
+    print(f"✅ Loaded {len(store)} profiles")
+
+    # Deleted after the load read it, before the change stream opened
+    collection.delete(c)
+    await run_sync(sync)
+    assert sorted(store.ids) == ["a", "b"], f"store kept a deleted profile: {sorted(store.ids)}"
+    print("✅ Delete replayed after the load removes the profile")
+
+    # The store holds a profile whose _id the sync never mapped
+    ghost = make_profile("ghost", 4)
+    assert store.upsert(ghost)
+    collection.events = []
+    collection.docs.append(ghost)
+    collection.delete(ghost)
+    collection.delete(b)
+    await run_sync(ProfileSync(collection, store))
+    assert sorted(store.ids) == ["a"], f"store kept a deleted profile: {sorted(store.ids)}"
+    print("✅ Delete of an unmapped document falls back to reconciling")
+
+    with tempfile.TemporaryDirectory() as directory:
+        state_path = os.path.join(directory, "sync_state.json")
+        owner = ProfileSync(collection, store, state_path=state_path)
+        other = ProfileSync(collection, store, state_path=state_path)
+        collection.events = []
+        owner.start()
+        other.start()
+        await asyncio.sleep(0.05)
+        assert owner.owns_state and not other.owns_state
+        await other.stop()
+        await owner.stop()
+        assert sorted(os.listdir(directory)) == ["sync_state.json", "sync_state.json.lock"]
+        print("✅ Only one worker writes the sync state, without leftover temp files")
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_profile_sync())
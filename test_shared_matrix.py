@@ -0,0 +1,105 @@
+"""
+Test script to verify a shared matrix follower keeps its own writes.
+A leader and a follower SharedMatrix share a temporary directory in one
+process: profiles the follower creates or deletes must survive attaching a
+generation published before the leader synced them, and be dropped once a
+generation reflects them (or a newer write superseded them).
+
+Runs offline: no MongoDB and no model are needed (requires fcntl).
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
+
+from embedding_store import EmbeddingStore
+from shared_matrix import SharedMatrix
+
+DIM = 384
+
+
+def make_profile(student_id, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        "id": student_id,
+        "name": f"Student {student_id}",
+        "strengths": "Strengths",
+        "weaknesses": "Weaknesses",
+        "strengths_emb": rng.standard_normal(DIM),
+        "weaknesses_emb": rng.standard_normal(DIM),
+    }
+
+
+async def test_shared_matrix():
+    """Publish generations around a follower's local writes"""
+
+    print("=" * 60)
+    print("Shared Matrix Local Writes Test")
+    print("=" * 60)
+
+    if not SharedMatrix.supported:
+        print("⚠️  fcntl unavailable; shared matrices are disabled on this platform")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        high_water = {"value": datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=1)}
+        leader_store = EmbeddingStore(dim=DIM)
+        leader = SharedMatrix(directory, leader_store, high_water=lambda: high_water["value"])
+        assert leader.try_lead()
+        for i in range(50):
+            assert leader_store.upsert(make_profile(f"p{i}", i))
+        await leader.publish()
+
+        follower_store = EmbeddingStore(dim=DIM)
+        follower = SharedMatrix(directory, follower_store)
+        assert not follower.try_lead()
+        assert await follower.wait_for_generation(5)
+        assert len(follower_store) == 50
+        print(f"✅ Follower attached generation {follower.generation}")
+
+        # The follower's own create and delete, not yet synced by the leader
+        assert follower_store.upsert(make_profile("new", 100))
+        assert follower_store.remove("p0")
+        assert leader_store.upsert(make_profile("p50", 50))
+        await leader.publish()
+        assert follower.attach()
+        assert "new" in follower_store and "p0" not in follower_store and "p50" in follower_store
+        assert follower.stats()["pending_local_writes"] == 2
+        print("✅ Local writes survive a generation that lacks them")
+
+        # The leader syncs them: the next generation reflects the follower's writes
+        assert leader_store.upsert(make_profile("new", 100))
+        assert leader_store.remove("p0")
+        await leader.publish()
+        assert follower.attach()
+        assert follower.stats()["pending_local_writes"] == 0
+        assert follower_store.digest == leader_store.digest
+        print("✅ Local writes are dropped once a generation reflects them")
+
+        # A newer write from elsewhere wins over an older local one
+        assert follower_store.upsert(make_profile("p1", 1001))
+        assert leader_store.upsert(make_profile("p1", 2002))
+        high_water["value"] = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=1)
+        await leader.publish()
+        assert follower.attach()
+        assert follower.stats()["pending_local_writes"] == 0
+        assert follower_store.digest == leader_store.digest
+        print("✅ Local writes superseded by the leader's high-water mark are dropped")
+
+        await follower.stop()
+        await leader.stop()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_shared_matrix())
@@ -0,0 +1,163 @@
+"""
+Test script to verify embedding store snapshots.
+Writes a store to a snapshot and restores it into a fresh store, then
+corrupts copies of the file in several ways and checks that the startup
+loader (``main.load_store``) ignores each one and loads the profiles from
+the collection instead.
+
+Runs offline: no MongoDB and no model are needed.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
+# main refuses to import without a connection string; nothing connects to it here
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+
+from snapshot import read_header, restore_store, save_store
+from embedding_store import EmbeddingStore
+from sync import ProfileSync
+import main
+
+DIM = main.embedding_store.dim
+PROFILES = 50
+
+
+def random_profiles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        "_id": f"oid{i}",
+        "id": f"snap{i:03d}",
+        "name": f"Student {i}",
+        "strengths": f"Strengths {i}",
+        "weaknesses": f"Weaknesses {i}",
+        "strengths_emb": rng.standard_normal(DIM),
+        "weaknesses_emb": rng.standard_normal(DIM),
+    } for i in range(n)]
+
+
+class WarningRecorder(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    """Read-only stand-in for the profiles collection (no updated_at: nothing to catch up)"""
+
+    database = None
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query=None, projection=None):
+        if query and "updated_at" in query:
+            return FakeCursor([])
+        if query and "id" in query:
+            wanted = set(query["id"]["$in"])
+            return FakeCursor([doc for doc in self.docs if doc["id"] in wanted])
+        return FakeCursor(self.docs)
+
+
+def corrupt(source, target, how):
+    shutil.copy(source, target)
+    header = read_header(source)
+    with open(target, "r+b") as f:
+        if how == "bad magic":
+            f.write(b"NOTSNAP\0")
+        elif how == "truncated":
+            f.truncate(os.path.getsize(source) // 2)
+        elif how == "garbage table":
+            f.seek(header.table_offset)
+            f.write(b"\xff" * min(header.table_length, 32))
+        elif how == "wrong table shape":
+            f.seek(header.table_offset)
+            f.write(b"[1, 2, 3]".ljust(header.table_length))
+        elif how == "huge high-water mark":
+            # Header field 8: high-water mark in ms, at byte 32
+            f.seek(32)
+            f.write((2 ** 62).to_bytes(8, "little"))
+
+
+async def test_snapshot():
+    """Round-trip a store through a snapshot and fall back on corrupt files"""
+
+    print("=" * 60)
+    print("Embedding Store Snapshot Test")
+    print("=" * 60)
+
+    docs = random_profiles(PROFILES)
+    store = EmbeddingStore(dim=DIM)
+    for doc in docs:
+        assert store.upsert(doc)
+    high_water = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "store.snap")
+        save_store(store, path, high_water)
+        restored = EmbeddingStore(dim=DIM)
+        header = restore_store(restored, path)
+        assert header.high_water == high_water.replace(tzinfo=None)
+        assert restored.ids == store.ids
+        assert [restored.get_profile(i) for i in restored.ids] == [store.get_profile(i) for i in store.ids]
+        assert np.array_equal(restored.strengths, store.strengths)
+        assert np.array_equal(restored.weaknesses, store.weaknesses)
+        assert restored.digest == store.digest
+        assert restored.upsert(random_profiles(PROFILES + 1, seed=1)[-1]), "no room for inserts"
+        print(f"✅ Round trip restores {len(store)} profiles, high-water mark and digest")
+
+        collection = FakeCollection(docs)
+        warnings = WarningRecorder()
+        main.logger.addHandler(warnings)
+        for how in ("bad magic", "truncated", "garbage table", "wrong table shape", "huge high-water mark"):
+            broken = os.path.join(directory, "broken.snap")
+            corrupt(path, broken, how)
+            main.SNAPSHOT_PATH = broken
+            warnings.messages.clear()
+            await main.load_store(collection, ProfileSync(collection, main.embedding_store, mode="off"))
+            assert any(m.startswith("Ignoring snapshot") for m in warnings.messages), f"{how}: not rejected"
+            assert main.embedding_store.digest == store.digest, f"{how}: store differs after fallback"
+            print(f"✅ Snapshot with {how}: ignored, profiles loaded from the collection")
+
+        main.SNAPSHOT_PATH = path
+        warnings.messages.clear()
+        await main.load_store(collection, ProfileSync(collection, main.embedding_store, mode="off"))
+        assert not warnings.messages, warnings.messages
+        assert main.embedding_store.digest == store.digest
+        main.logger.removeHandler(warnings)
+        print("✅ Valid snapshot restored by the startup loader")
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_snapshot())
@@ -0,0 +1,83 @@
+"""
+Test script to verify the vectorized scorers against the per-pair loop scorer.
+Scores random (unnormalized) profiles with ``find_best_matches`` and with the
+matrix-based ``find_best_matches_vectorized`` / ``find_best_matches_batch``
+and checks both return the same students with the same scores.
+
+Runs offline: no MongoDB and no model are needed.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
+
+from embedding_store import EmbeddingStore
+from matcher import find_best_matches, find_best_matches_batch, find_best_matches_vectorized
+
+PROFILES = 300
+QUERIES = 50
+DIM = 384
+TOP_K = (1, 3, 10)
+
+
+def random_profiles(n, dim=DIM, seed=0):
+    """Profiles with random embeddings of varying length, keyed by student id"""
+    rng = np.random.default_rng(seed)
+    profiles = {}
+    for i in range(n):
+        student_id = f"parity{i:04d}"
+        profiles[student_id] = {
+            "id": student_id,
+            "name": f"Student {i}",
+            "strengths": f"Strengths {i}",
+            "weaknesses": f"Weaknesses {i}",
+            "strengths_emb": rng.standard_normal(dim) * rng.uniform(0.1, 10.0),
+            "weaknesses_emb": rng.standard_normal(dim) * rng.uniform(0.1, 10.0),
+        }
+    return profiles
+
+
+def assert_same_matches(expected, actual, context):
+    assert [m[0] for m in actual] == [m[0] for m in expected], \
+        f"{context}: ids differ: {[m[0] for m in actual]} != {[m[0] for m in expected]}"
+    assert np.allclose([m[2] for m in actual], [m[2] for m in expected], atol=1e-5), \
+        f"{context}: scores differ: {[m[2] for m in actual]} != {[m[2] for m in expected]}"
+
+
+def test_vectorized_parity():
+    """Compare the vectorized and batch scorers with the loop scorer"""
+
+    print("=" * 60)
+    print("Vectorized Scoring Parity Test")
+    print("=" * 60)
+
+    profiles = random_profiles(PROFILES)
+    store = EmbeddingStore(dim=DIM)
+    for profile in profiles.values():
+        assert store.upsert(profile), f"Store rejected {profile['id']}"
+    print(f"✅ Stored {len(store)} random profiles")
+
+    queries = list(profiles)[:QUERIES]
+    for top_k in TOP_K:
+        batch = find_best_matches_batch(queries, store, top_k)
+        for student_id in queries:
+            expected = find_best_matches(student_id, profiles, top_k)
+            assert_same_matches(expected, find_best_matches_vectorized(student_id, store, top_k),
+                                f"vectorized {student_id} top_k={top_k}")
+            assert_same_matches(expected, batch[student_id], f"batch {student_id} top_k={top_k}")
+        print(f"✅ top_k={top_k}: {len(queries)} students match the loop scorer")
+
+    assert find_best_matches_vectorized("missing", store) == find_best_matches("missing", profiles) == []
+    print("✅ Unknown students return no matches")
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_vectorized_parity()
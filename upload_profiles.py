@@ -32,7 +32,8 @@ except Exception as e:
     print(f"   ❌ Error loading file: {e}")
     exit(1)
 
-# Upload each profile
+# Upload profiles in chunks through the bulk endpoint
+BATCH_SIZE = 500
 print(f"\n3. Uploading {len(profiles)} profiles...")
 print("   (This may take a minute...)\n")
 
@@ -40,23 +41,26 @@ success = 0
 skipped = 0
 errors = 0
 
-for i, profile in enumerate(profiles, 1):
+for start in range(0, len(profiles), BATCH_SIZE):
+    batch = profiles[start:start + BATCH_SIZE]
     try:
-        r = requests.post(f"{API_BASE}/profiles", json=profile, timeout=10)
-        
+        r = requests.post(f"{API_BASE}/profiles/bulk", json=batch, timeout=120)
+
         if r.status_code == 201:
-            success += 1
-            if success % 10 == 0:
-                print(f"   ✅ Uploaded {success}/{len(profiles)}...")
-        elif r.status_code == 400 and "already exists" in r.text:
-            skipped += 1
+            result = r.json()
+            success += result["inserted"]
+            skipped += len(result["duplicates"])
+            errors += len(result["errors"])
+            for error in result["errors"]:
+                print(f"   ⚠️  Error with {error['id']}: {error['reason']}")
+            print(f"   ✅ Uploaded {success}/{len(profiles)}...")
         else:
-            errors += 1
-            print(f"   ⚠️  Error with {profile['id']}: {r.status_code}")
-            
+            errors += len(batch)
+            print(f"   ⚠️  Error with batch starting at {batch[0]['id']}: {r.status_code}")
+
     except Exception as e:
-        errors += 1
-        print(f"   ❌ Failed to upload {profile.get('id', 'unknown')}: {e}")
+        errors += len(batch)
+        print(f"   ❌ Failed to upload batch starting at {batch[0].get('id', 'unknown')}: {e}")
 
 # Final status
 print("\n" + "=" * 70)